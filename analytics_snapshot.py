@@ -0,0 +1,263 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, create_engine
+
+from database import Base, TRACKED_TABLES, init_db_once
+from query_stats import write_log
+from shards import EXPORT_SKIP_TABLES
+
+# --- Columnar analytics snapshots ---
+# Streams each table from SQLite into typed Parquet files, one row group per
+# batch, so notebooks and dashboards can aggregate millions of interactions
+# without ORM objects and without touching the live database.
+#
+# analytics/
+#   manifest.json                          per-table change_log cursor, max id, rows, files
+#   interactions/part-0003-00000.parquet   written by a full refresh (generation 3)
+#   interactions/part-0003-00001.parquet   rows appended by a later refresh
+#
+# A refresh reads change_log since each table's cursor: nothing new -> skipped;
+# only inserts above the snapshot's max id -> the new rows are appended as one
+# more part file; any update or delete -> the table is rewritten. Each table is
+# read inside its own read transaction, so it is consistent as of its cursor.
+SNAPSHOT_ROOT = "analytics"
+MANIFEST = "manifest.json"
+ROW_GROUP_SIZE = 50000
+COMPRESSION = "zstd"
+SNAPSHOT_TABLES = [t.name for t in Base.metadata.sorted_tables if t.name not in EXPORT_SKIP_TABLES]
+
+def _arrow_type(column):
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column.type, Date):
+        return pa.date32()
+    return pa.string()
+
+def table_schema(table_name: str) -> pa.Schema:
+    table = Base.metadata.tables[table_name]
+    return pa.schema([pa.field(c.name, _arrow_type(c)) for c in table.columns])
+
+def _to_array(values, arrow_type):
+    # SQLite hands back dates and datetimes as text; Arrow parses them in C
+    if pa.types.is_date32(arrow_type) or pa.types.is_timestamp(arrow_type):
+        return pa.array(values, type=pa.string()).cast(arrow_type)
+    if pa.types.is_boolean(arrow_type):
+        return pa.array(values, type=pa.int64()).cast(arrow_type)
+    try:
+        return pa.array(values, type=arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # SQLite does not enforce column types; stringify stray values
+        if pa.types.is_string(arrow_type):
+            return pa.array([None if v is None else str(v) for v in values], type=arrow_type)
+        raise
+
+def _load_manifest(root: str) -> Dict:
+    path = os.path.join(root, MANIFEST)
+    if not os.path.exists(path):
+        return {"tables": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _save_manifest(root: str, manifest: Dict):
+    # Written last and swapped in atomically: readers only ever see listed files
+    tmp = os.path.join(root, MANIFEST + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, os.path.join(root, MANIFEST))
+
+def _plan(conn, table_name: str, state: Optional[Dict], latest: int, columns: List[str]) -> str:
+    if state is None or state["columns"] != columns or latest < state["seq"]:
+        return "full" # New table, migrated schema, or the database was restored
+    if latest == state["seq"]:
+        return "skip"
+    if table_name not in TRACKED_TABLES:
+        return "full" # Derived tables (answer stats) follow any tracked write
+    ops = conn.exec_driver_sql(
+        "SELECT op, MIN(row_id) FROM change_log WHERE seq > ? AND table_name = ? GROUP BY op",
+        (state["seq"], table_name),
+    ).fetchall()
+    if not ops:
+        return "skip"
+    if len(ops) == 1 and ops[0][0] == "insert" and ops[0][1] > (state["max_id"] or 0):
+        return "append"
+    return "full"
+
+def _write_part(conn, table_name: str, path: str, where: str, params: tuple, batch_size: int) -> Dict:
+    table = Base.metadata.tables[table_name]
+    schema = table_schema(table_name)
+    cols = ", ".join(c.name for c in table.columns)
+    order = ", ".join(c.name for c in table.primary_key.columns)
+    # The DBAPI cursor skips SQLAlchemy's per-row Row wrapping, which would
+    # roughly double the scan time of wide tables like interactions
+    cursor = conn.connection.driver_connection.cursor()
+    cursor.execute(f"SELECT {cols} FROM {table_name} {where} ORDER BY {order}", params)
+    rows = 0
+    max_id = None
+    tmp = path + ".tmp"
+    with pq.ParquetWriter(tmp, schema, compression=COMPRESSION) as writer:
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            columns = list(zip(*batch))
+            arrays = [_to_array(values, field.type) for values, field in zip(columns, schema)]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema), row_group_size=batch_size)
+            rows += len(batch)
+            if "id" in table.columns:
+                max_id = batch[-1][schema.get_field_index("id")]
+        if rows == 0:
+            writer.write_table(schema.empty_table()) # Keeps the schema loadable
+    cursor.close()
+    os.replace(tmp, path)
+    return {"rows": rows, "max_id": max_id}
+
+def _refresh_table(conn, root: str, table_name: str, state: Optional[Dict], full: bool,
+                   batch_size: int) -> Dict:
+    columns = [c.name for c in Base.metadata.tables[table_name].columns]
+    latest = conn.exec_driver_sql("SELECT COALESCE(MAX(seq), 0) FROM change_log").scalar()
+    action = "full" if full else _plan(conn, table_name, state, latest, columns)
+    if action != "full":
+        # change_log can lose delete tombstones to compaction; a row count that
+        # no longer matches means the cheap paths cannot be trusted
+        count = conn.exec_driver_sql(f"SELECT COUNT(*) FROM {table_name}").scalar()
+        if action == "skip" and count != state["rows"]:
+            action = "full"
+        elif action == "append" and count <= state["rows"]:
+            action = "full"
+    if action == "skip":
+        return {"action": "skip", "rows_written": 0, "state": dict(state, seq=latest)}
+
+    os.makedirs(os.path.join(root, table_name), exist_ok=True)
+    if action == "append":
+        name = f"part-{state['generation']:04d}-{len(state['files']):05d}.parquet"
+        part = _write_part(conn, table_name, os.path.join(root, table_name, name),
+                           "WHERE id > ?", (state["max_id"] or 0,), batch_size)
+        new_state = dict(state, seq=latest, rows=state["rows"] + part["rows"],
+                         max_id=part["max_id"] or state["max_id"], files=state["files"] + [name])
+        if new_state["rows"] != count:
+            # A row below max_id showed up anyway (e.g. id reuse after deletes)
+            os.remove(os.path.join(root, table_name, name))
+            return _refresh_table(conn, root, table_name, state, True, batch_size)
+    else:
+        generation = (state["generation"] + 1) if state else 1
+        name = f"part-{generation:04d}-00000.parquet"
+        part = _write_part(conn, table_name, os.path.join(root, table_name, name), "", (), batch_size)
+        new_state = {
+            "seq": latest, "rows": part["rows"], "max_id": part["max_id"], "generation": generation,
+            "files": [name], "columns": columns,
+        }
+    new_state["refreshed_at"] = datetime.now().isoformat(timespec="seconds")
+    return {"action": action, "rows_written": part["rows"], "state": new_state}
+
+def refresh_snapshot(bind, root: str=SNAPSHOT_ROOT, tables: Optional[List[str]]=None, full: bool=False,
+                     batch_size: int=ROW_GROUP_SIZE, log: bool=True) -> Dict:
+    init_db_once(bind)
+    os.makedirs(root, exist_ok=True)
+    t0 = time.perf_counter()
+    manifest = _load_manifest(root)
+    old_files = {}
+    report_tables = {}
+    for table_name in tables or SNAPSHOT_TABLES:
+        t1 = time.perf_counter()
+        state = manifest["tables"].get(table_name)
+        # AUTOCOMMIT hands transaction control to us, so BEGIN opens one read
+        # transaction covering both the change_log cursor and the table scan
+        with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("BEGIN")
+            try:
+                result = _refresh_table(conn, root, table_name, state, full, batch_size)
+            finally:
+                conn.exec_driver_sql("COMMIT")
+        if state and result["state"]["generation"] != state["generation"]:
+            old_files[table_name] = state["files"]
+        manifest["tables"][table_name] = result["state"]
+        report_tables[table_name] = {
+            "action": result["action"], "rows_written": result["rows_written"],
+            "rows": result["state"]["rows"], "ms": round((time.perf_counter() - t1) * 1000, 3),
+        }
+    _save_manifest(root, manifest)
+    # Superseded generations go only after the manifest stops listing them
+    for table_name, files in old_files.items():
+        for name in files:
+            try:
+                os.remove(os.path.join(root, table_name, name))
+            except FileNotFoundError:
+                pass
+    report = {
+        "kind": "analytics_snapshot",
+        "duration_ms": round((time.perf_counter() - t0) * 1000, 3),
+        "rows_written": sum(t["rows_written"] for t in report_tables.values()),
+        "tables": report_tables,
+    }
+    if log:
+        write_log(report)
+    return report
+
+def snapshot_info(root: str=SNAPSHOT_ROOT) -> Dict[str, Dict]:
+    info = {}
+    for table_name, state in _load_manifest(root)["tables"].items():
+        size = sum(os.path.getsize(os.path.join(root, table_name, f)) for f in state["files"])
+        info[table_name] = {"rows": state["rows"], "files": len(state["files"]), "bytes": size,
+                            "seq": state["seq"], "refreshed_at": state["refreshed_at"]}
+    return info
+
+# --- Loaders ---
+def read_arrow(table_name: str, root: str=SNAPSHOT_ROOT, columns: Optional[List[str]]=None,
+               filters=None) -> pa.Table:
+    state = _load_manifest(root)["tables"].get(table_name)
+    if state is None:
+        raise KeyError(f"{table_name} is not in the snapshot at {root}; run refresh first")
+    paths = [os.path.join(root, table_name, f) for f in state["files"]]
+    dataset = pq.ParquetDataset(paths, filters=filters, memory_map=True)
+    return dataset.read(columns=columns)
+
+def load_table(table_name: str, root: str=SNAPSHOT_ROOT, columns: Optional[List[str]]=None,
+               filters=None, arrow_dtypes: bool=True) -> pd.DataFrame:
+    # With arrow_dtypes the DataFrame columns wrap the Arrow buffers as they are
+    # (no copy, nulls kept as nulls). Pass False for classic NumPy dtypes.
+    table = read_arrow(table_name, root, columns, filters)
+    if arrow_dtypes:
+        return table.to_pandas(types_mapper=pd.ArrowDtype)
+    return table.to_pandas(self_destruct=True, split_blocks=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Columnar (Parquet) snapshots of the CRM for analysis")
+    parser.add_argument("--db", default="human_crm.db")
+    parser.add_argument("--root", default=SNAPSHOT_ROOT)
+    sub = parser.add_subparsers(dest="command", required=True)
+    refresh = sub.add_parser("refresh")
+    refresh.add_argument("--full", action="store_true", help="Rewrite every table")
+    refresh.add_argument("--tables", nargs="+", default=None, choices=SNAPSHOT_TABLES)
+    refresh.add_argument("--batch-size", type=int, default=ROW_GROUP_SIZE)
+    sub.add_parser("info")
+    args = parser.parse_args(argv)
+
+    if args.command == "refresh":
+        bind = create_engine(f"sqlite:///{args.db}")
+        r = refresh_snapshot(bind, args.root, args.tables, args.full, args.batch_size)
+        for table_name, t in r["tables"].items():
+            print(f"{table_name:<24} {t['action']:<6} {t['rows_written']:>9} written  {t['rows']:>9} rows  {t['ms']:>8.1f} ms")
+        print(f"{r['rows_written']} rows written in {r['duration_ms']:.0f} ms")
+    elif args.command == "info":
+        for table_name, t in snapshot_info(args.root).items():
+            print(f"{table_name:<24} {t['rows']:>9} rows  {t['files']:>3} files  {t['bytes'] / 1024:>10.1f} KB  "
+                  f"seq {t['seq']}  {t['refreshed_at']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
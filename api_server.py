@@ -0,0 +1,618 @@
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+import crud
+from change_log import get_changes, data_version, CHANGE_BATCH_SIZE
+from database import Person, Interaction, Relationship, ProfilingQuestion, engine as default_engine, init_db_once
+from intro_routes import find_introduction_routes
+from name_index import search_person_names, SEARCH_LIMIT as SUGGEST_LIMIT
+
+# --- Local JSON API over crud ---
+# asyncio handles sockets and HTTP parsing; every request's SQLAlchemy work
+# runs on a bounded thread pool with its own Session.
+# Usage:
+#   python api_server.py serve [--port 8765] [--db sqlite:///human_crm.db]
+#   python api_server.py loadtest [--url http://127.0.0.1:8765] [--concurrency 8]
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 4
+MAX_PENDING = 256 # Requests queued for the pool beyond this get 503
+MAX_BODY_BYTES = 10 * 1024 * 1024
+MAX_PAGE_SIZE = 500
+BULK_LIMIT = 10000
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+def _row_dict(obj) -> Dict:
+    return {c.key: getattr(obj, c.key) for c in obj.__table__.columns}
+
+def _interaction_dict(i: Interaction) -> Dict:
+    d = _row_dict(i)
+    d["answers"] = [{"question_id": a.question_id, "answer_value": a.answer_value} for a in i.answers]
+    return d
+
+def _parse_date(value, field: str) -> Optional[date]:
+    if value in (None, ""):
+        return None
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"{field}: expected YYYY-MM-DD")
+
+def _int_param(query: Dict, name: str, default: Optional[int]=None, maximum: Optional[int]=None) -> Optional[int]:
+    raw = query.get(name)
+    if raw is None or raw == "":
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ApiError(400, f"{name}: expected an integer")
+    if maximum is not None:
+        value = min(value, maximum)
+    return value
+
+def _timeline_cursor(raw: Optional[str]) -> Optional[tuple]:
+    # "YYYY-MM-DD_<id>", as returned in next_cursor
+    if not raw:
+        return None
+    try:
+        d, i = raw.rsplit("_", 1)
+        return date.fromisoformat(d), int(i)
+    except ValueError:
+        raise ApiError(400, "cursor: malformed")
+
+def _require_object(body, name: str) -> Dict:
+    if not isinstance(body, dict):
+        raise ApiError(400, f"{name}: expected a JSON object")
+    return body
+
+def _require_int(body: Dict, field: str) -> int:
+    # Ids may come as numbers or digit strings
+    value = body.get(field)
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ApiError(400, f"{field}: expected an integer")
+    return value
+
+def _require_scalars(fields: Dict, skip=()):
+    for name, value in fields.items():
+        if name not in skip and isinstance(value, (dict, list)):
+            raise ApiError(400, f"{name}: expected a string, number or null")
+
+def _person_fields(body) -> Dict:
+    columns = {c.key for c in Person.__table__.columns} - {"id"}
+    unknown = set(_require_object(body, "person")) - columns
+    if unknown:
+        raise ApiError(400, f"unknown fields: {', '.join(sorted(unknown))}")
+    _require_scalars(body)
+    fields = dict(body)
+    for name in ("birth_date", "first_met_date"):
+        if name in fields:
+            fields[name] = _parse_date(fields[name], name)
+    return fields
+
+def _interaction_fields(body) -> Dict:
+    columns = {c.key for c in Interaction.__table__.columns} - {"id", "start_key", "end_key", "date_precision"}
+    unknown = set(_require_object(body, "interaction")) - columns - {"answers"}
+    if unknown:
+        raise ApiError(400, f"unknown fields: {', '.join(sorted(unknown))}")
+    if "person_id" not in body:
+        raise ApiError(400, "person_id is required")
+    _require_scalars(body, skip=("answers",))
+    fields = dict(body)
+    fields["person_id"] = _require_int(body, "person_id")
+    fields["entry_date"] = _parse_date(fields.get("entry_date"), "entry_date") or date.today()
+    answers = fields.get("answers") or []
+    if not isinstance(answers, list):
+        raise ApiError(400, "answers: expected a JSON array")
+    fields["answers"] = [_answer_fields(a) for a in answers]
+    return fields
+
+def _answer_fields(body) -> Dict:
+    _require_object(body, "answer")
+    if "answer_value" not in body:
+        raise ApiError(400, "answer_value is required")
+    _require_scalars(body)
+    return {"question_id": _require_int(body, "question_id"), "answer_value": body["answer_value"]}
+
+def _relationship_fields(body) -> Dict:
+    # upsert_relationships_bulk's edge dicts
+    fields = dict(_require_object(body, "relationship"))
+    _require_scalars(fields)
+    fields["person_a"] = _require_int(fields, "person_a")
+    fields["person_b"] = _require_int(fields, "person_b")
+    return fields
+
+def _require_list(body, name: str):
+    if not isinstance(body, list):
+        raise ApiError(400, f"{name}: expected a JSON array")
+    if len(body) > BULK_LIMIT:
+        raise ApiError(413, f"{name}: at most {BULK_LIMIT} items per request")
+    return body
+
+class ApiApp:
+    # Routing and crud calls; dispatch() is synchronous and runs on the pool
+    def __init__(self, bind=None):
+        self.bind = bind or default_engine
+        self.Session = sessionmaker(autocommit=False, autoflush=False, bind=self.bind)
+        self.routes = [
+            ("GET", ("people",), self.list_people),
+            ("POST", ("people",), self.create_person),
+            ("POST", ("people", "bulk"), self.create_people_bulk),
+            ("POST", ("people", "bulk_delete"), self.delete_people_bulk),
+            ("GET", ("people", "suggest"), self.suggest_people),
+            ("GET", ("people", int), self.get_person),
+            ("PATCH", ("people", int), self.update_person),
+            ("DELETE", ("people", int), self.delete_person),
+            ("GET", ("people", int, "interactions"), self.person_interactions),
+            ("GET", ("people", int, "relationships"), self.person_relationships),
+            ("GET", ("people", int, "routes"), self.person_routes),
+            ("POST", ("interactions",), self.create_interaction),
+            ("POST", ("interactions", "bulk"), self.create_interactions_bulk),
+            ("GET", ("relationships",), self.list_relationships),
+            ("POST", ("relationships",), self.create_relationship),
+            ("POST", ("relationships", "bulk"), self.upsert_relationships_bulk),
+            ("GET", ("questions",), self.list_questions),
+            ("GET", ("search",), self.search),
+            ("GET", ("version",), self.version),
+            ("GET", ("changes",), self.changes),
+        ]
+
+    # --- versioning for conditional GETs ---
+    def data_version(self) -> str:
+        # Every crud write appends to change_log and bulk writes bump the
+        # generation, so together they version the whole database, from any process
+        with self.bind.connect() as conn:
+            return data_version(conn)
+
+    def _match(self, method: str, segments: list):
+        allowed = False
+        for m, pattern, handler in self.routes:
+            if len(pattern) != len(segments):
+                continue
+            args = []
+            for want, got in zip(pattern, segments):
+                if want is int:
+                    if not got.isdigit():
+                        break
+                    args.append(int(got))
+                elif want != got:
+                    break
+            else:
+                if m == method:
+                    return handler, args
+                allowed = True
+        raise ApiError(405 if allowed else 404, "method not allowed" if allowed else "not found")
+
+    def dispatch(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        try:
+            parts = urlsplit(target)
+            segments = [s for s in parts.path.split("/") if s]
+            if not segments or segments[0] != "api":
+                raise ApiError(404, "not found")
+            handler, args = self._match(method, segments[1:])
+            query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+
+            if method == "GET":
+                # Conditional GET: a matching version answers 304 without running the query
+                etag = f'W/"{self.data_version()}"'
+                if etag in [t.strip() for t in headers.get("if-none-match", "").split(",")]:
+                    return 304, {"ETag": etag}, b""
+                payload = self._run(handler, args, query, None)
+                return self._json(200, payload, {"ETag": etag, "Cache-Control": "no-cache"})
+
+            data = None
+            if body:
+                try:
+                    data = json.loads(body)
+                except ValueError:
+                    raise ApiError(400, "invalid JSON body")
+            payload = self._run(handler, args, query, data)
+            return self._json(201 if method == "POST" else 200, payload)
+        except ApiError as e:
+            return self._json(e.status, {"error": e.message})
+        except Exception as e:
+            return self._json(500, {"error": f"{type(e).__name__}: {e}"})
+
+    def _run(self, handler, args, query, data):
+        db = self.Session()
+        # Request bodies are validated by the handlers (ApiError 400); anything
+        # else raised here is a server bug and dispatch answers 500
+        try:
+            return handler(db, *args, query=query, data=data)
+        except IntegrityError as e:
+            db.rollback()
+            raise ApiError(409, f"constraint failed: {e.orig}")
+        finally:
+            db.close()
+
+    def _json(self, status: int, payload, headers: Optional[Dict]=None):
+        body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode("utf-8")
+        out = {"Content-Type": "application/json; charset=utf-8"}
+        out.update(headers or {})
+        return status, out, body
+
+    # --- people ---
+    def list_people(self, db, query, data):
+        limit = _int_param(query, "limit", crud.PEOPLE_PAGE_SIZE, MAX_PAGE_SIZE)
+        people, next_after = crud.get_people_page(db, _int_param(query, "after"), limit)
+        return {"items": [_row_dict(p) for p in people], "next_cursor": next_after}
+
+    def get_person(self, db, person_id, query, data):
+        person = crud.get_person(db, person_id)
+        if person is None:
+            raise ApiError(404, "person not found")
+        return _row_dict(person)
+
+    def create_person(self, db, query, data):
+        fields = _person_fields(data)
+        if not fields.get("last_name") or not fields.get("first_name"):
+            raise ApiError(400, "last_name and first_name are required")
+        ids = crud.create_people_bulk(db, [fields])
+        return {"id": ids[0]}
+
+    def create_people_bulk(self, db, query, data):
+        rows = [_person_fields(r) for r in _require_list(data, "people")]
+        return {"ids": crud.create_people_bulk(db, rows)}
+
+    def update_person(self, db, person_id, query, data):
+        person = crud.update_person(db, person_id, **_person_fields(data))
+        if person is None:
+            raise ApiError(404, "person not found")
+        return _row_dict(person)
+
+    def delete_person(self, db, person_id, query, data):
+        deleted = crud.delete_people_bulk(db, [person_id])
+        if not deleted:
+            raise ApiError(404, "person not found")
+        return {"deleted": deleted}
+
+    def delete_people_bulk(self, db, query, data):
+        ids = _require_list(_require_object(data, "body").get("ids"), "ids")
+        if any(isinstance(i, bool) or not isinstance(i, int) for i in ids):
+            raise ApiError(400, "ids: expected integers")
+        return {"deleted": crud.delete_people_bulk(db, ids)}
+
+    def person_interactions(self, db, person_id, query, data):
+        limit = _int_param(query, "limit", crud.TIMELINE_PAGE_SIZE, MAX_PAGE_SIZE)
+        rows, next_cursor = crud.get_interaction_timeline(
+            db, person_id, search=query.get("search"), category=query.get("category"),
+            channel=query.get("channel"), cursor=_timeline_cursor(query.get("cursor")), limit=limit
+        )
+        return {
+            "items": [_interaction_dict(i) for i in rows],
+            "next_cursor": f"{next_cursor[0].isoformat()}_{next_cursor[1]}" if next_cursor else None,
+        }
+
+    def person_relationships(self, db, person_id, query, data):
+        return {"items": [_row_dict(r) for r in crud.get_relationships_for_person(db, person_id)]}
+
+    def person_routes(self, db, person_id, query, data):
+        routes = find_introduction_routes(
+            db, person_id, k=_int_param(query, "k", 3, 10),
+            exclude_caution=query.get("exclude_caution", "1") != "0",
+            source_id=_int_param(query, "source")
+        )
+        return {"items": routes}
+
+    # --- interactions ---
+    def create_interaction(self, db, query, data):
+        ids = crud.create_interactions_bulk(db, [_interaction_fields(data)])
+        return {"id": ids[0]}
+
+    def create_interactions_bulk(self, db, query, data):
+        rows = [_interaction_fields(r) for r in _require_list(data, "interactions")]
+        return {"ids": crud.create_interactions_bulk(db, rows)}
+
+    # --- relationships ---
+    def list_relationships(self, db, query, data):
+        limit = _int_param(query, "limit", crud.PEOPLE_PAGE_SIZE, MAX_PAGE_SIZE)
+        after = _int_param(query, "after", 0)
+        rows = db.query(Relationship).filter(Relationship.id > after).order_by(Relationship.id).limit(limit + 1).all()
+        next_after = rows[limit - 1].id if len(rows) > limit else None
+        return {"items": [_row_dict(r) for r in rows[:limit]], "next_cursor": next_after}
+
+    def create_relationship(self, db, query, data):
+        e = _relationship_fields(data)
+        rel = crud.create_relationship(
+            db, e["person_a"], e["person_b"], e.get("rel_type"), e.get("quality"),
+            e.get("position_a_to_b"), e.get("position_b_to_a"), e.get("caution_flag", False)
+        )
+        return _row_dict(rel)
+
+    def upsert_relationships_bulk(self, db, query, data):
+        edges = [_relationship_fields(e) for e in _require_list(data, "relationships")]
+        return {"upserted": crud.upsert_relationships_bulk(db, edges)}
+
+    # --- questions / search ---
+    def list_questions(self, db, query, data):
+        return {"items": [_row_dict(q) for q in db.query(ProfilingQuestion).order_by(ProfilingQuestion.id).all()]}
+
+    def search(self, db, query, data):
+        keyword = (query.get("q") or "").strip()
+        if not keyword:
+            raise ApiError(400, "q is required")
+        limit = _int_param(query, "limit", crud.SEARCH_LIMIT, MAX_PAGE_SIZE)
+        return {
+            "people": [_row_dict(p) for p in crud.search_people(db, keyword, limit)],
+            "interactions": [_interaction_dict(i) for i in crud.search_interactions(db, keyword, limit)],
+        }
+
+    def suggest_people(self, db, query, data):
+        # Name autocomplete: kana/romaji-normalized prefix, then substring matches
+        keyword = (query.get("q") or "").strip()
+        limit = _int_param(query, "limit", SUGGEST_LIMIT, MAX_PAGE_SIZE)
+        return {"items": search_person_names(db, keyword, limit) if keyword else []}
+
+    def version(self, db, query, data):
+        return {"version": self.data_version()}
+
+    def changes(self, db, query, data):
+        # Incremental polling: pass next_cursor back as since
+        tables = query.get("tables")
+        rows, next_cursor = get_changes(
+            db, _int_param(query, "since", 0), _int_param(query, "limit", CHANGE_BATCH_SIZE, MAX_PAGE_SIZE * 10),
+            tables.split(",") if tables else None
+        )
+        return {"items": [_row_dict(c) for c in rows], "next_cursor": next_cursor}
+
+# --- asyncio HTTP/1.1 front end ---
+REASONS = {200: "OK", 201: "Created", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+class ApiServer:
+    def __init__(self, app: ApiApp, host: str=DEFAULT_HOST, port: int=DEFAULT_PORT, workers: int=DEFAULT_WORKERS):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+        self.pending = 0
+        self.server = None
+        self.loop = None
+        self.thread = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        await self.start()
+        print(f"Serving on http://{self.host}:{self.port}/api/")
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        self.pool.shutdown(wait=True)
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise ApiError(400, "malformed request line")
+        headers = {}
+        while True:
+            h = await reader.readline()
+            if h in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = h.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise ApiError(400, "bad Content-Length")
+        if length < 0:
+            raise ApiError(400, "bad Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise ApiError(413, "request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, version, headers, body
+
+    async def _handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except ApiError as e:
+                    await self._write(writer, *self.app._json(e.status, {"error": e.message}), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close" and version != "HTTP/1.0"
+                if self.pending >= MAX_PENDING:
+                    response = self.app._json(503, {"error": "server busy"}, {"Retry-After": "1"})
+                else:
+                    self.pending += 1
+                    try:
+                        response = await loop.run_in_executor(self.pool, self.app.dispatch, method, target, headers, body)
+                    finally:
+                        self.pending -= 1
+                await self._write(writer, *response, keep_alive=keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _write(self, writer, status, headers, body, keep_alive=True):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+        headers = dict(headers, **{"Content-Length": str(len(body)), "Connection": "keep-alive" if keep_alive else "close"})
+        lines.extend(f"{k}: {v}" for k, v in headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+def run_in_thread(app: ApiApp, host: str=DEFAULT_HOST, port: int=0, workers: int=DEFAULT_WORKERS) -> ApiServer:
+    # Starts the server on a background event loop (tests, load test). Returns once listening.
+    server = ApiServer(app, host, port, workers)
+    ready = threading.Event()
+
+    def _run():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        server.loop = loop
+        loop.run_until_complete(server.start())
+        ready.set()
+        loop.run_forever()
+        # Stopped: let open connections' handlers finish their cleanup
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.close()
+
+    server.thread = threading.Thread(target=_run, daemon=True)
+    server.thread.start()
+    ready.wait()
+    return server
+
+def stop_thread_server(server: ApiServer):
+    server.loop.call_soon_threadsafe(server.server.close)
+    server.loop.call_soon_threadsafe(server.loop.stop)
+    server.thread.join()
+    server.pool.shutdown(wait=True)
+
+# --- load test ---
+def load_test(host: str, port: int, paths, concurrency: int=8, duration: float=5.0, etag: bool=False) -> Dict:
+    # Keep-alive clients hammer the paths round-robin; reports requests/sec and latency
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def _client(offset):
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        tags = {}
+        local, local_status = [], {}
+        n = offset
+        while time.perf_counter() < deadline:
+            path = paths[n % len(paths)]
+            n += 1
+            headers = {"If-None-Match": tags[path]} if etag and path in tags else {}
+            t0 = time.perf_counter()
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            local.append((time.perf_counter() - t0) * 1000)
+            local_status[resp.status] = local_status.get(resp.status, 0) + 1
+            if resp.getheader("ETag"):
+                tags[path] = resp.getheader("ETag")
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            for k, v in local_status.items():
+                statuses[k] = statuses.get(k, 0) + v
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=_client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 3) if latencies else None,
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3) if latencies else None,
+        "statuses": statuses,
+    }
+
+def _load_test_main(args):
+    tmpdir = None
+    server = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        # Self-contained run against a freshly generated database
+        from seed_data import generate_data
+        tmpdir = tempfile.TemporaryDirectory()
+        bind = create_engine(f"sqlite:///{os.path.join(tmpdir.name, 'api_load.db')}")
+        generate_data(bind, args.scale, interactions_per_person=20, verbose=False)
+        server = run_in_thread(ApiApp(bind), workers=args.workers)
+        host, port = DEFAULT_HOST, server.port
+    paths = ["/api/people?limit=50", "/api/people/1", "/api/people/1/interactions",
+             "/api/relationships?limit=100", "/api/search?q=%E5%85%83%E6%B0%97"]
+    try:
+        for label, etag in (("plain GET", False), ("conditional GET (If-None-Match)", True)):
+            r = load_test(host, port, paths, args.concurrency, args.duration, etag=etag)
+            print(f"{label:<34} {r['requests_per_sec']:>9.1f} req/s  p50 {r['p50_ms']} ms  p95 {r['p95_ms']} ms  {r['statuses']}")
+    finally:
+        if server is not None:
+            stop_thread_server(server)
+        if tmpdir is not None:
+            tmpdir.cleanup()
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local JSON API over the CRM database")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve")
+    serve.add_argument("--host", default=DEFAULT_HOST)
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    serve.add_argument("--db", default=None, help="SQLAlchemy URL (default: the app database)")
+    serve.add_argument("--account", default=None, help="Serve one account's shard under account/<id>/")
+    load = sub.add_parser("loadtest")
+    load.add_argument("--url", default=None, help="Running server; omit to start one on generated data")
+    load.add_argument("--scale", type=int, default=1000)
+    load.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    load.add_argument("--concurrency", type=int, default=8)
+    load.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    if args.command == "loadtest":
+        return _load_test_main(args)
+    if args.account:
+        from shards import ShardRouter
+        bind = ShardRouter().engine(args.account)
+    else:
+        bind = create_engine(args.db) if args.db else default_engine
+        init_db_once(bind)
+    server = ApiServer(ApiApp(bind), args.host, args.port, args.workers)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Dict, Optional, Tuple
+
+# --- Avatar image pipeline ---
+# Uploads are decoded, EXIF-rotated and downscaled to a bounded working size
+# once, in a worker process, and the working image is cached by the upload's
+# content hash. Cropper reruns then only hash the upload and reuse the cached
+# image instead of decoding a full-resolution photo on the script thread.
+# Cropping, the final resize and PNG encoding also run in the pool.
+#
+# Images cross the process boundary as raw pixels (mode, size, bytes), which
+# is cheaper than encoding an intermediate format.
+WORKING_SIZE = 1024 # Longest side of the image shown in the cropper
+AVATAR_SIZE = 200
+POOL_WORKERS = 2
+CACHE_ENTRIES = 8 # Working images kept (about 3 MB each at WORKING_SIZE)
+
+RawImage = Tuple[str, Tuple[int, int], bytes]
+
+def _open_working(data: bytes, max_side: int):
+    from PIL import Image, ImageOps
+    img = Image.open(BytesIO(data))
+    # JPEG can decode at 1/2, 1/4 or 1/8 scale directly, so a phone photo is
+    # never fully decoded; exif_transpose still sees the original orientation
+    img.draft("RGB", (max_side, max_side))
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "transparency" in img.info or img.mode in ("LA", "PA") else "RGB")
+    img.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    return img
+
+def prepare_raw(data: bytes, max_side: int=WORKING_SIZE) -> RawImage:
+    img = _open_working(data, max_side)
+    return img.mode, img.size, img.tobytes()
+
+def finalize_raw(raw: RawImage, box: Optional[Dict]=None, size: int=AVATAR_SIZE) -> bytes:
+    # box: {"left", "top", "width", "height"} in working-image pixels (the
+    # st_cropper return_type="box" format); None uses the whole image
+    from PIL import Image
+    img = Image.frombytes(*raw)
+    if box:
+        img = img.crop((box["left"], box["top"], box["left"] + box["width"], box["top"] + box["height"]))
+    img = img.resize((size, size), Image.Resampling.LANCZOS)
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _submit(fn, *args):
+    # Runs fn in the shared process pool, or inline when no pool can be used
+    # (a worker died, or HRCRM_IMAGE_WORKERS=0)
+    global _pool
+    workers = int(os.environ.get("HRCRM_IMAGE_WORKERS", POOL_WORKERS))
+    if workers <= 0:
+        return fn(*args)
+    with _pool_lock:
+        if _pool is None:
+            # Not fork: the Streamlit server has other threads (and the job
+            # scheduler's SQLite connections) that a forked child would inherit.
+            # forkserver is not available on Windows, which spawns anyway
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+        pool = _pool
+    try:
+        return pool.submit(fn, *args).result()
+    except BrokenProcessPool:
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        return fn(*args)
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+# content hash -> PIL working image, least recently used first
+_working_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+def upload_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def get_working_image(data: bytes, digest: Optional[str]=None):
+    # Returns (digest, PIL image no larger than WORKING_SIZE), reusing the
+    # cached image when the same upload is seen again
+    from PIL import Image
+    digest = digest or upload_hash(data)
+    with _cache_lock:
+        img = _working_cache.get(digest)
+        if img is not None:
+            _working_cache.move_to_end(digest)
+            return digest, img
+    img = Image.frombytes(*_submit(prepare_raw, data))
+    with _cache_lock:
+        _working_cache[digest] = img
+        while len(_working_cache) > CACHE_ENTRIES:
+            _working_cache.popitem(last=False)
+    return digest, img
+
+def make_avatar(working, box: Optional[Dict]=None, size: int=AVATAR_SIZE) -> bytes:
+    # PNG avatar bytes from a working image and an optional crop box
+    return _submit(finalize_raw, (working.mode, working.size, working.tobytes()), box, size)
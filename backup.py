@@ -0,0 +1,314 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine
+
+from change_log import bump_generation, data_generation
+from database import SyncMeta
+from query_stats import write_log
+from shards import SHARD_ROOT, SHARD_DB_NAME, ShardRouter
+
+# --- Online backups ---
+# Databases are copied with the SQLite online backup API a few pages at a
+# time, so writers get the lock between steps and never see a torn copy.
+# Avatar files go into a content-addressed object store (backups/objects/<hash>)
+# and are hard-linked into each snapshot: unchanged images cost no extra space.
+#
+# backups/
+#   objects/ab/abcdef...          one copy per distinct file content
+#   20250101-120000/
+#     manifest.json
+#     human_crm.db
+#     account/<id>/human_crm.db   per-account shards
+#     media/account/23/icon_imag/icon.png -> hard link into objects/
+BACKUP_ROOT = "backups"
+MAIN_DB = "human_crm.db"
+MEDIA_DIRS = [SHARD_ROOT, os.path.join("assets", "avatars")]
+PAGES_PER_STEP = 256
+STEP_SLEEP = 0.005 # Seconds between steps; lets writers in
+DEFAULT_KEEP = 7
+MANIFEST = "manifest.json"
+
+_DB_SUFFIXES = (".db", ".db-wal", ".db-shm", ".db-journal")
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _snapshot_dirs(root: str) -> List[str]:
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name for name in os.listdir(root)
+        if os.path.exists(os.path.join(root, name, MANIFEST))
+    )
+
+def _load_manifest(snapshot_dir: str) -> Dict:
+    with open(os.path.join(snapshot_dir, MANIFEST), encoding="utf-8") as f:
+        return json.load(f)
+
+def _database_paths(base_dir: str) -> List[str]:
+    # Relative paths of the main database and every account shard
+    paths = []
+    if os.path.exists(os.path.join(base_dir, MAIN_DB)):
+        paths.append(MAIN_DB)
+    router = ShardRouter(os.path.join(base_dir, SHARD_ROOT))
+    paths.extend(os.path.join(SHARD_ROOT, a, SHARD_DB_NAME) for a in router.accounts())
+    return paths
+
+def _online_copy(src_path: str, dst_path: str) -> int:
+    # Returns the number of pages copied
+    pages = 0
+    def _progress(status, remaining, total):
+        nonlocal pages
+        pages = total
+    os.makedirs(os.path.dirname(dst_path) or ".", exist_ok=True)
+    src = sqlite3.connect(src_path)
+    dst = sqlite3.connect(dst_path)
+    try:
+        src.backup(dst, pages=PAGES_PER_STEP, progress=_progress, sleep=STEP_SLEEP)
+    finally:
+        dst.close()
+        src.close()
+    return pages
+
+def _generation(path: str) -> int:
+    bind = create_engine(f"sqlite:///{path}")
+    try:
+        with bind.begin() as conn:
+            SyncMeta.__table__.create(conn, checkfirst=True)
+            return data_generation(conn)
+    finally:
+        bind.dispose()
+
+def _bump_generation(path: str, at_least: int) -> int:
+    bind = create_engine(f"sqlite:///{path}")
+    try:
+        with bind.begin() as conn:
+            return bump_generation(conn, at_least)
+    finally:
+        bind.dispose()
+
+def _link_or_copy(src: str, dst: str):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Different filesystem, or no hard link support
+        shutil.copy2(src, dst)
+
+def _backup_media(base_dir: str, root: str, snapshot_dir: str, previous: Optional[Dict]) -> Dict:
+    known = (previous or {}).get("media", {})
+    media = {}
+    new_bytes = 0
+    for media_dir in MEDIA_DIRS:
+        top = os.path.join(base_dir, media_dir)
+        for dirpath, _, filenames in os.walk(top):
+            for name in filenames:
+                if name.endswith(_DB_SUFFIXES):
+                    continue
+                path = os.path.join(dirpath, name)
+                rel = os.path.relpath(path, base_dir)
+                st = os.stat(path)
+                prev = known.get(rel)
+                if prev and prev["size"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns:
+                    digest = prev["sha256"] # Unchanged since the last snapshot; skip hashing
+                else:
+                    digest = _sha256(path)
+                obj = os.path.join(root, "objects", digest[:2], digest)
+                if not os.path.exists(obj):
+                    os.makedirs(os.path.dirname(obj), exist_ok=True)
+                    shutil.copy2(path, obj)
+                    new_bytes += st.st_size
+                _link_or_copy(obj, os.path.join(snapshot_dir, "media", rel))
+                media[rel] = {"sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    return {"files": media, "new_bytes": new_bytes}
+
+def create_backup(base_dir: str=".", root: Optional[str]=None, include_media: bool=True,
+                  keep: int=DEFAULT_KEEP, log: bool=True) -> Dict:
+    root = root or os.path.join(base_dir, BACKUP_ROOT)
+    t0 = time.perf_counter()
+    name = datetime.now().strftime("%Y%m%d-%H%M%S")
+    snapshot_dir = os.path.join(root, name)
+    suffix = 1
+    while os.path.exists(snapshot_dir):
+        suffix += 1
+        snapshot_dir = os.path.join(root, f"{name}-{suffix}")
+    os.makedirs(snapshot_dir)
+
+    previous = None
+    existing = [d for d in _snapshot_dirs(root) if d != os.path.basename(snapshot_dir)]
+    if existing:
+        previous = _load_manifest(os.path.join(root, existing[-1]))
+
+    databases = {}
+    for rel in _database_paths(base_dir):
+        d0 = time.perf_counter()
+        dst = os.path.join(snapshot_dir, rel)
+        pages = _online_copy(os.path.join(base_dir, rel), dst)
+        databases[rel] = {
+            "sha256": _sha256(dst), "bytes": os.path.getsize(dst), "pages": pages,
+            "ms": round((time.perf_counter() - d0) * 1000, 3),
+        }
+
+    media = {"files": {}, "new_bytes": 0}
+    if include_media:
+        media = _backup_media(base_dir, root, snapshot_dir, previous)
+
+    manifest = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "databases": databases,
+        "media": media["files"],
+    }
+    manifest["duration_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+    with open(os.path.join(snapshot_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    removed = apply_retention(root, keep)
+    report = {
+        "kind": "backup",
+        "snapshot": os.path.basename(snapshot_dir),
+        "duration_ms": manifest["duration_ms"],
+        "db_bytes": sum(d["bytes"] for d in databases.values()),
+        "databases": len(databases),
+        "media_files": len(media["files"]),
+        "media_bytes": sum(m["size"] for m in media["files"].values()),
+        "media_new_bytes": media["new_bytes"],
+        "removed": removed,
+    }
+    if log:
+        write_log(report)
+    return report
+
+def list_backups(root: str=BACKUP_ROOT) -> List[Dict]:
+    out = []
+    for name in _snapshot_dirs(root):
+        m = _load_manifest(os.path.join(root, name))
+        out.append({
+            "snapshot": name, "created_at": m["created_at"], "duration_ms": m.get("duration_ms"),
+            "db_bytes": sum(d["bytes"] for d in m["databases"].values()), "media_files": len(m["media"]),
+        })
+    return out
+
+def apply_retention(root: str, keep: int) -> List[str]:
+    # Keeps the newest `keep` snapshots, then drops objects no snapshot references
+    snapshots = _snapshot_dirs(root)
+    removed = snapshots[:-keep] if keep > 0 else []
+    for name in removed:
+        shutil.rmtree(os.path.join(root, name))
+    referenced = set()
+    for name in _snapshot_dirs(root):
+        referenced.update(m["sha256"] for m in _load_manifest(os.path.join(root, name))["media"].values())
+    objects = os.path.join(root, "objects")
+    if os.path.isdir(objects):
+        for dirpath, _, filenames in os.walk(objects):
+            for digest in filenames:
+                if digest not in referenced:
+                    os.remove(os.path.join(dirpath, digest))
+    return removed
+
+def verify_backup(snapshot_dir: str) -> List[str]:
+    # Returns a list of problems; empty means the snapshot is intact
+    problems = []
+    manifest = _load_manifest(snapshot_dir)
+    for rel, info in manifest["databases"].items():
+        path = os.path.join(snapshot_dir, rel)
+        if not os.path.exists(path):
+            problems.append(f"{rel}: missing")
+            continue
+        if _sha256(path) != info["sha256"]:
+            problems.append(f"{rel}: checksum mismatch")
+            continue
+        conn = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            conn.close()
+        if result != "ok":
+            problems.append(f"{rel}: integrity_check {result}")
+    for rel, info in manifest["media"].items():
+        path = os.path.join(snapshot_dir, "media", rel)
+        if not os.path.exists(path):
+            problems.append(f"media/{rel}: missing")
+        elif _sha256(path) != info["sha256"]:
+            problems.append(f"media/{rel}: checksum mismatch")
+    return problems
+
+def restore_backup(snapshot_dir: str, base_dir: str=".", include_media: bool=False) -> Dict:
+    # Verifies first, then writes each database back through the backup API,
+    # so a running app sees either the old or the restored contents.
+    problems = verify_backup(snapshot_dir)
+    if problems:
+        raise ValueError("snapshot failed verification: " + "; ".join(problems))
+    t0 = time.perf_counter()
+    manifest = _load_manifest(snapshot_dir)
+    for rel in manifest["databases"]:
+        dst = os.path.join(base_dir, rel)
+        before = _generation(dst) if os.path.exists(dst) else 0
+        _online_copy(os.path.join(snapshot_dir, rel), dst)
+        # The restored file's change_log seq is older than what API clients
+        # may have seen; move data_version past the replaced file's
+        _bump_generation(dst, before)
+    restored_media = 0
+    if include_media:
+        for rel in manifest["media"]:
+            dst = os.path.join(base_dir, rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copy2(os.path.join(snapshot_dir, "media", rel), dst)
+            restored_media += 1
+    return {
+        "snapshot": os.path.basename(snapshot_dir),
+        "databases": len(manifest["databases"]),
+        "media_files": restored_media,
+        "duration_ms": round((time.perf_counter() - t0) * 1000, 3),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Online backups of the CRM databases and avatars")
+    parser.add_argument("--root", default=BACKUP_ROOT)
+    sub = parser.add_subparsers(dest="command", required=True)
+    create = sub.add_parser("create")
+    create.add_argument("--no-media", action="store_true", help="Databases only")
+    create.add_argument("--keep", type=int, default=DEFAULT_KEEP, help="Snapshots to retain")
+    sub.add_parser("list")
+    verify = sub.add_parser("verify")
+    verify.add_argument("snapshot")
+    restore = sub.add_parser("restore")
+    restore.add_argument("snapshot")
+    restore.add_argument("--media", action="store_true", help="Also restore avatar files")
+    args = parser.parse_args(argv)
+
+    if args.command == "create":
+        r = create_backup(".", args.root, include_media=not args.no_media, keep=args.keep)
+        print(f"{r['snapshot']}: {r['duration_ms']:.0f} ms, {r['databases']} db ({r['db_bytes'] / 1024:.1f} KB), "
+              f"{r['media_files']} media files ({r['media_new_bytes'] / 1024:.1f} KB new)")
+        for name in r["removed"]:
+            print(f"removed {name}")
+    elif args.command == "list":
+        for b in list_backups(args.root):
+            print(f"{b['snapshot']:<20} {b['created_at']}  {b['db_bytes'] / 1024:>10.1f} KB  "
+                  f"{b['media_files']:>5} media  {b['duration_ms']:.0f} ms")
+    elif args.command == "verify":
+        problems = verify_backup(os.path.join(args.root, args.snapshot))
+        for p in problems:
+            print(p)
+        print("OK" if not problems else f"{len(problems)} problem(s)")
+        return 1 if problems else 0
+    elif args.command == "restore":
+        r = restore_backup(os.path.join(args.root, args.snapshot), ".", include_media=args.media)
+        print(f"restored {r['snapshot']}: {r['databases']} db, {r['media_files']} media files in {r['duration_ms']:.0f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,337 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker, undefer_group
+
+from database import Person, Interaction, PERSON_TEXT_GROUP, set_change_capture
+from contact_cadence import get_cadence, get_contact_summary, get_overdue_people, monthly_contact_counts
+from crud import (
+    create_person, get_people, get_people_summary, get_person, update_person, delete_person, delete_people_bulk,
+    create_interaction, get_interactions_by_person, get_interaction_timeline, get_interactions_in_period,
+    get_interaction_facets, search_interactions, SEARCH_LIMIT,
+    create_relationship, upsert_relationships_bulk, get_relationships_for_person, get_all_relationships,
+    get_relationship_edges, get_all_questions, get_question_stats, get_person_history
+)
+from graph_clusters import BY_TAG, get_cluster_graph, load_members
+from intro_routes import find_introduction_routes, invalidate_route_cache
+from jobs import compute_digest, get_daily_digest
+from name_index import get_name_index
+from question_recommender import recommend_questions
+from seed_data import generate_data
+from views.people_list import HEATMAP_PEOPLE
+from views.search import find_people
+
+# --- crud / page workload benchmarks ---
+# Usage:
+#   python benchmark.py --scales 100 1000 --save-baseline
+#   python benchmark.py --scales 100 1000            (compares to the baseline)
+DEFAULT_SCALES = [100, 1000]
+DEFAULT_OUTPUT = "bench_results.json"
+DEFAULT_BASELINE = "bench_baseline.json"
+REGRESSION_RATIO = 1.5
+REGRESSION_MIN_MS = 1.0
+
+def _time(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return {"median_ms": statistics.median(samples), "min_ms": min(samples), "runs": repeat}
+
+# Page workloads: the data access each page does per rerun, through the same
+# functions the views call (views/*.py), so a slower page shows up here
+def page_people_list(db):
+    get_name_index(db)
+    get_daily_digest(db)
+    overdue = get_overdue_people(db, limit=HEATMAP_PEOPLE)
+    monthly_contact_counts(db, person_ids=list(overdue.index))
+    people = get_people_summary(db)
+    cadence = get_cadence(db)
+    overdue_ids = set(cadence.index[cadence["status"] == "overdue"])
+    return len(people) + len(overdue_ids)
+
+def page_global_search(db, keyword="元気"):
+    people = find_people(db, keyword)
+    interactions = search_interactions(db, keyword, limit=SEARCH_LIMIT)
+    return len(people) + len(interactions)
+
+def page_dashboard(db, person_id):
+    name_index = get_name_index(db)
+    get_person(db, person_id)
+    get_person_history(db, person_id)
+    get_contact_summary(db, person_id)
+    facets = get_interaction_facets(db, person_id)
+    items, _ = get_interaction_timeline(db, person_id)
+    if facets["category"]:
+        get_interaction_timeline(db, person_id, category=facets["category"][0])
+    for r in get_relationships_for_person(db, person_id):
+        name_index.label(r.person_b_id if r.person_a_id == person_id else r.person_a_id)
+    get_question_stats(db, person_id)
+    get_all_questions(db)
+    return len(items)
+
+def page_graph_build(db):
+    people = get_people_summary(db)
+    rels = get_relationship_edges(db)
+    ids = {p.id for p in people}
+    edges = [(r.person_a_id, r.person_b_id) for r in rels if r.person_a_id in ids and r.person_b_id in ids]
+    return len(edges)
+
+def page_cluster_graph(db):
+    # Cluster overview plus the largest cluster expanded
+    graph = get_cluster_graph(db, BY_TAG)
+    ordered = graph.ordered()
+    people, edges = load_members(db, graph, [c.key for c in ordered[:1]])
+    return len(ordered) + len(people) + len(edges)
+
+def run_scale(scale, interactions_per_person, repeat, workdir):
+    db_path = os.path.join(workdir, f"bench_{scale}.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    bind = create_engine(f"sqlite:///{db_path}")
+    t0 = time.perf_counter()
+    generate_data(bind, scale, interactions_per_person=interactions_per_person, verbose=False)
+    gen_ms = (time.perf_counter() - t0) * 1000
+
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=bind)
+    db = Session()
+    # The busiest contact makes per-person reads representative of the worst case
+    busy_id = db.query(Interaction.person_id, func.count(Interaction.id)).group_by(Interaction.person_id) \
+        .order_by(func.count(Interaction.id).desc()).first()[0]
+    ids = [r[0] for r in db.query(Person.id).order_by(Person.id).all()]
+    target_id = ids[-1]
+
+    results = {"_generate": {"median_ms": gen_ms, "min_ms": gen_ms, "runs": 1}}
+    # The people list reads the digest the daily_digest job writes
+    compute_digest(db)
+
+    def route_cold():
+        invalidate_route_cache(db)
+        find_introduction_routes(db, target_id, k=3)
+
+    reads = {
+        "get_people": lambda: get_people(db),
+        "get_person": lambda: get_person(db, busy_id),
+        "get_interactions_by_person": lambda: get_interactions_by_person(db, busy_id),
+        "get_interaction_timeline": lambda: get_interaction_timeline(db, busy_id),
+        "get_interaction_timeline_search": lambda: get_interaction_timeline(db, busy_id, search="元気"),
+        "get_interactions_in_period": lambda: get_interactions_in_period(db, "2023/04", person_id=busy_id),
+        "get_relationships_for_person": lambda: get_relationships_for_person(db, busy_id),
+        "get_all_relationships": lambda: get_all_relationships(db),
+        "get_all_questions": lambda: get_all_questions(db),
+        "get_question_stats": lambda: get_question_stats(db, busy_id),
+        "recommend_questions": lambda: recommend_questions(db, busy_id),
+        "get_person_history": lambda: get_person_history(db, busy_id),
+        "find_introduction_routes_cold": route_cold,
+        "find_introduction_routes_warm": lambda: find_introduction_routes(db, target_id, k=3),
+    }
+    for name, fn in reads.items():
+        db.expire_all()
+        results[name] = _time(fn, repeat)
+
+    pages = {
+        "page_people_list": lambda: page_people_list(db),
+        "page_global_search": lambda: page_global_search(db),
+        "page_dashboard": lambda: page_dashboard(db, busy_id),
+        "page_graph_build": lambda: page_graph_build(db),
+        "page_cluster_graph": lambda: page_cluster_graph(db),
+    }
+    for name, fn in pages.items():
+        db.expire_all()
+        results[name] = _time(fn, repeat)
+
+    created = []
+    def write_person():
+        created.append(create_person(db, "計測", "太郎", "けいそく", "たろう", None, None, None, None, "知人", None, "bench").id)
+
+    writes = {
+        "create_person": write_person,
+        "update_person": lambda: update_person(db, created[-1], notes="updated"),
+        "create_interaction": lambda: create_interaction(db, busy_id, "会話", "bench", "", "", date.today(),
+                                                         answers=[{"question_id": 1, "answer_value": "3"}]),
+        "create_relationship": lambda: create_relationship(db, busy_id, created[-1], "友人", "良好"),
+        "upsert_relationships_bulk_1000": lambda: upsert_relationships_bulk(db, [
+            {"person_a": ids[i], "person_b": ids[(i * 7 + 1) % len(ids)], "rel_type": "友人", "quality": "普通"}
+            for i in range(min(1000, len(ids)))
+        ]),
+        "delete_person": lambda: delete_person(db, created.pop()),
+    }
+    for name, fn in writes.items():
+        results[name] = _time(fn, repeat)
+
+    bulk_ids = ids[1:1 + max(1, len(ids) // 10)]
+    results["delete_people_bulk_10pct"] = _time(lambda: delete_people_bulk(db, bulk_ids), 1)
+
+    db.close()
+    bind.dispose()
+    os.remove(db_path)
+    return results
+
+def run_change_log_overhead(scale, repeat, workdir):
+    # Same write workload with change capture on and off
+    db_path = os.path.join(workdir, f"bench_changelog_{scale}.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    bind = create_engine(f"sqlite:///{db_path}")
+    generate_data(bind, scale, interactions_per_person=5, verbose=False)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=bind)
+    db = Session()
+    ids = [r[0] for r in db.query(Person.id).order_by(Person.id).all()]
+
+    def workload():
+        p = create_person(db, "計測", "花子", None, None, None, None, None, None, "知人", None, None)
+        update_person(db, p.id, notes="updated")
+        create_interaction(db, p.id, "会話", "bench", "", "", date.today(), answers=[{"question_id": 1, "answer_value": "3"}])
+        upsert_relationships_bulk(db, [
+            {"person_a": p.id, "person_b": ids[i], "rel_type": "友人", "quality": "普通"} for i in range(min(100, len(ids)))
+        ])
+        delete_person(db, p.id)
+
+    results = {}
+    try:
+        for label, enabled in (("without_log", False), ("with_log", True)):
+            set_change_capture(enabled)
+            workload() # warm up
+            results[label] = _time(workload, repeat)
+    finally:
+        set_change_capture(True)
+        db.close()
+        bind.dispose()
+        os.remove(db_path)
+    base = results["without_log"]["median_ms"]
+    results["overhead_pct"] = (results["with_log"]["median_ms"] - base) / base * 100 if base else 0.0
+    return results
+
+def run_projection_benchmark(scale, repeat, workdir):
+    # Time and memory to load every person for a list view: full ORM objects
+    # (what get_people returned before the text columns were deferred), ORM
+    # objects with deferred text, and the PersonSummary projection
+    db_path = os.path.join(workdir, f"bench_projection_{scale}.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    bind = create_engine(f"sqlite:///{db_path}")
+    generate_data(bind, scale, interactions_per_person=1, verbose=False)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=bind)
+    loaders = {
+        "orm_full": lambda db: db.query(Person).options(undefer_group(PERSON_TEXT_GROUP)).order_by(Person.name_sort_key, Person.id).all(),
+        "orm_deferred": get_people,
+        "summary": get_people_summary,
+    }
+    results = {}
+    try:
+        for label, load in loaders.items():
+            def run():
+                with Session() as db: # Fresh identity map each time
+                    load(db)
+            run() # warm up
+            timing = _time(run, repeat)
+            with Session() as db:
+                tracemalloc.start()
+                rows = load(db)
+                retained, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                del rows
+            timing.update({"retained_kb": retained / 1024, "peak_kb": peak / 1024})
+            results[label] = timing
+    finally:
+        bind.dispose()
+        os.remove(db_path)
+    return results
+
+def compare(results, baseline):
+    regressions = []
+    for scale, ops in results["scales"].items():
+        base_ops = baseline.get("scales", {}).get(scale, {})
+        for op, r in ops.items():
+            b = base_ops.get(op)
+            if not b:
+                continue
+            ratio = r["median_ms"] / b["median_ms"] if b["median_ms"] > 0 else 1.0
+            r["baseline_ms"] = b["median_ms"]
+            r["ratio"] = ratio
+            if ratio >= REGRESSION_RATIO and r["median_ms"] - b["median_ms"] >= REGRESSION_MIN_MS:
+                regressions.append((scale, op, b["median_ms"], r["median_ms"], ratio))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark crud and page workloads at several data scales")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="People counts, e.g. 100 1000 10000 100000")
+    parser.add_argument("--interactions-per-person", type=float, default=20)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--change-log-overhead", action="store_true", help="Also measure the cost of change capture on writes")
+    parser.add_argument("--projections", action="store_true", help="Also measure time/memory of list-view person loads")
+    args = parser.parse_args(argv)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "interactions_per_person": args.interactions_per_person,
+            "repeat": args.repeat,
+        },
+        "scales": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for scale in args.scales:
+            print(f"== scale {scale} ==")
+            results["scales"][str(scale)] = run_scale(scale, args.interactions_per_person, args.repeat, workdir)
+        if args.change_log_overhead:
+            results["change_log_overhead"] = {
+                str(scale): run_change_log_overhead(scale, args.repeat, workdir) for scale in args.scales
+            }
+        if args.projections:
+            results["projections"] = {
+                str(scale): run_projection_benchmark(scale, args.repeat, workdir) for scale in args.scales
+            }
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f))
+
+    for scale, ops in results["scales"].items():
+        print(f"\n[scale {scale}]")
+        for op, r in ops.items():
+            extra = f"  (baseline {r['baseline_ms']:.2f} ms, x{r['ratio']:.2f})" if "baseline_ms" in r else ""
+            print(f"  {op:<36} {r['median_ms']:>10.2f} ms{extra}")
+
+    for scale, r in results.get("change_log_overhead", {}).items():
+        print(f"\n[change log overhead, scale {scale}] write workload {r['without_log']['median_ms']:.2f} ms -> "
+              f"{r['with_log']['median_ms']:.2f} ms ({r['overhead_pct']:+.1f}%)")
+
+    for scale, r in results.get("projections", {}).items():
+        print(f"\n[list-view person loads, scale {scale}]")
+        for label, t in r.items():
+            print(f"  {label:<14} {t['median_ms']:>9.2f} ms  retained {t['retained_kb']:>9.0f} KB  peak {t['peak_kb']:>9.0f} KB")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if regressions:
+        print("\nRegressions:")
+        for scale, op, base_ms, now_ms, ratio in regressions:
+            print(f"  scale {scale} {op}: {base_ms:.2f} -> {now_ms:.2f} ms (x{ratio:.2f})")
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
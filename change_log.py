@@ -0,0 +1,95 @@
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database import ChangeLog, SyncMeta
+
+# --- Change log consumers ---
+# Every crud write appends (table, row id, op, version) to change_log in the
+# same transaction. A consumer remembers the last seq it processed and asks for
+# what came after it, e.g. to update a search index or cache incrementally:
+#
+#   cursor = load_my_cursor()
+#   for batch in iter_change_batches(db, cursor):
+#       apply(batch)
+#       cursor = batch[-1].seq
+#       save_my_cursor(cursor)
+CHANGE_BATCH_SIZE = 500
+
+def high_water_seq(conn) -> int:
+    # The highest seq ever handed out, even if compaction has since deleted
+    # it (seq is AUTOINCREMENT, so sqlite_sequence remembers it)
+    return conn.exec_driver_sql(
+        "SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'change_log'), 0), "
+        "COALESCE((SELECT MAX(seq) FROM change_log), 0))"
+    ).scalar()
+
+def latest_seq(db: Session) -> int:
+    return high_water_seq(db.connection())
+
+# Writes that bypass change_log (bulk generation, restoring a backup) bump a
+# generation counter instead, so data_version still changes for them
+GENERATION_KEY = "data_generation"
+
+def data_generation(conn) -> int:
+    value = conn.execute(text("SELECT value FROM sync_meta WHERE key = :key"), {"key": GENERATION_KEY}).scalar()
+    return int(value or 0)
+
+def bump_generation(conn, at_least: int=0) -> int:
+    # at_least: a generation the database must move past (e.g. the one the
+    # file had before a restore replaced it)
+    SyncMeta.__table__.create(conn, checkfirst=True)
+    value = max(data_generation(conn), at_least) + 1
+    conn.execute(text(
+        "INSERT INTO sync_meta (key, value) VALUES (:key, :value) ON CONFLICT (key) DO UPDATE SET value = excluded.value"
+    ), {"key": GENERATION_KEY, "value": str(value)})
+    return value
+
+def data_version(conn) -> str:
+    # Strictly increasing version for the whole database: the generation plus
+    # the highest change_log seq ever used
+    return f"{data_generation(conn)}.{high_water_seq(conn)}"
+
+def table_version(db: Session, table_name: str) -> Tuple:
+    # Cheap fingerprint for caches built from one table: its latest change_log
+    # entry plus max id and row count, so rows written without change capture
+    # (bulk generators, older versions) still move it
+    return tuple(db.connection().exec_driver_sql(
+        f"SELECT (SELECT seq FROM change_log WHERE table_name = '{table_name}' ORDER BY seq DESC LIMIT 1), "
+        f"(SELECT MAX(id) FROM {table_name}), (SELECT COUNT(*) FROM {table_name})"
+    ).fetchone())
+
+def get_changes(db: Session, since: int=0, limit: int=CHANGE_BATCH_SIZE,
+                tables: Optional[List[str]]=None) -> Tuple[List[ChangeLog], int]:
+    # Changes with seq > since, oldest first. Returns (changes, next_cursor);
+    # next_cursor == since when there is nothing new.
+    query = db.query(ChangeLog).filter(ChangeLog.seq > since)
+    if tables:
+        query = query.filter(ChangeLog.table_name.in_(tables))
+    rows = query.order_by(ChangeLog.seq).limit(limit).all()
+    return rows, rows[-1].seq if rows else since
+
+def iter_change_batches(db: Session, since: int=0, batch_size: int=CHANGE_BATCH_SIZE,
+                        tables: Optional[List[str]]=None):
+    while True:
+        rows, since = get_changes(db, since, batch_size, tables)
+        if not rows:
+            return
+        yield rows
+
+def compact(db: Session, upto_seq: Optional[int]=None, drop_deletes: bool=False) -> int:
+    # Drops entries up to upto_seq that a later entry for the same row supersedes,
+    # keeping each row's latest op/version. With drop_deletes, delete tombstones up
+    # to upto_seq go too -- pass the slowest consumer's cursor so none miss them.
+    upto = latest_seq(db) if upto_seq is None else upto_seq
+    removed = db.execute(text(
+        "DELETE FROM change_log WHERE seq <= :upto AND seq NOT IN "
+        "(SELECT MAX(seq) FROM change_log GROUP BY table_name, row_id)"
+    ), {"upto": upto}).rowcount
+    if drop_deletes:
+        removed += db.execute(text(
+            "DELETE FROM change_log WHERE seq <= :upto AND op = 'delete'"
+        ), {"upto": upto}).rowcount
+    db.commit()
+    return removed
@@ -0,0 +1,153 @@
+import threading
+import weakref
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from change_log import table_version
+
+# --- 接触リズム (contact cadence) ---
+# Every person's contact days are loaded in one query and analysed as flat
+# NumPy arrays sorted by (person, day): gaps, per-person median and EWMA come
+# from array ops, not a Python loop per person. A person is overdue when the
+# time since the last contact exceeds their own rhythm by OVERDUE_FACTOR;
+# people with too little history fall back to the old fixed 90-day rule.
+PASSIVE_CHANNELS = ("観測 (Passive)",) # Observing someone is not contact
+EWMA_ALPHA = 0.3 # Weight of the most recent gap
+MIN_GAPS = 3 # Gaps needed before a personal rhythm is trusted
+OVERDUE_FACTOR = 1.5
+DUE_SOON_FACTOR = 1.0
+FALLBACK_GAP_DAYS = 90
+MIN_EXPECTED_GAP = 7 # Daily chats should not turn into "overdue" after two days
+
+_DAY_BITS = 20 # key = person_id << 20 | day offset; ~2800 years of days
+_DAY_OFFSET = 100000 # Keeps pre-1970 days positive
+
+# Per engine: (version, today, arrays, frame). Checked against table_version on
+# every call, so inserts from the API, sync or bulk tools are seen too.
+_cadence_cache = weakref.WeakKeyDictionary()
+_cache_lock = threading.Lock()
+
+def _load_contact_days(db: Session):
+    # Returns (person_ids, days) sorted by person then day, one entry per contact
+    # day. SQLite turns dates into day numbers (days since 1970-01-01) and the
+    # rows go through the DBAPI cursor straight into one int64 array.
+    placeholders = ", ".join("?" for _ in PASSIVE_CHANNELS)
+    cursor = db.connection().connection.driver_connection.cursor()
+    try:
+        rows = cursor.execute(
+            "SELECT person_id, CAST(julianday(entry_date) - 2440587.5 AS INTEGER) FROM interactions "
+            f"WHERE julianday(entry_date) IS NOT NULL AND (channel IS NULL OR channel NOT IN ({placeholders}))",
+            PASSIVE_CHANNELS,
+        ).fetchall()
+    finally:
+        cursor.close()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    pairs = np.array(rows, dtype=np.int64)
+    # One sort+dedupe over a packed key instead of ORDER BY/DISTINCT in SQLite
+    keys = np.unique((pairs[:, 0] << _DAY_BITS) | (pairs[:, 1] + _DAY_OFFSET))
+    return keys >> _DAY_BITS, (keys & ((1 << _DAY_BITS) - 1)) - _DAY_OFFSET
+
+def _build_frame(person_ids: np.ndarray, days: np.ndarray, today: date) -> pd.DataFrame:
+    columns = ["contacts", "first_contact", "last_contact", "median_gap", "ewma_gap",
+               "days_since", "expected_gap", "next_contact", "overdue_ratio", "status"]
+    if len(person_ids) == 0:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name="person_id"))
+    starts = np.flatnonzero(np.r_[True, person_ids[1:] != person_ids[:-1]])
+    ends = np.r_[starts[1:], len(person_ids)]
+    people = person_ids[starts]
+
+    # Gaps between consecutive contact days of the same person
+    same = person_ids[1:] == person_ids[:-1]
+    gaps = pd.Series(np.diff(days)[same], dtype="float64")
+    owners = person_ids[1:][same]
+    grouped = gaps.groupby(owners, sort=False)
+    n_gaps = grouped.size().reindex(people, fill_value=0).to_numpy()
+    median_gap = grouped.median().reindex(people).to_numpy()
+    # EWMA of each person's gap series evaluated at its last gap, in closed form:
+    # sum(w_i * gap_i) / sum(w_i) with w_i = (1 - alpha) ** (gaps after i)
+    weights = (1 - EWMA_ALPHA) ** grouped.cumcount(ascending=False).to_numpy()
+    weighted = pd.DataFrame({"wx": weights * gaps.to_numpy(), "w": weights}).groupby(owners, sort=False).sum()
+    ewma_gap = (weighted["wx"] / weighted["w"]).reindex(people).to_numpy()
+
+    today_day = np.datetime64(today, "D").astype(np.int64)
+    last = days[ends - 1]
+    days_since = today_day - last
+    has_rhythm = n_gaps >= MIN_GAPS
+    expected = np.where(has_rhythm, np.maximum(np.nan_to_num(ewma_gap), MIN_EXPECTED_GAP), FALLBACK_GAP_DAYS)
+    # The fallback rule fires at 90 days, the personal rule at 1.5x the rhythm
+    overdue_after = np.where(has_rhythm, expected * OVERDUE_FACTOR, FALLBACK_GAP_DAYS)
+    ratio = days_since / overdue_after
+    status = np.select(
+        [ratio >= 1, days_since >= expected * DUE_SOON_FACTOR],
+        ["overdue", "due_soon"], "ok",
+    )
+    return pd.DataFrame({
+        "contacts": ends - starts,
+        "first_contact": days[starts].astype("datetime64[D]"),
+        "last_contact": last.astype("datetime64[D]"),
+        "median_gap": median_gap,
+        "ewma_gap": ewma_gap,
+        "days_since": days_since,
+        "expected_gap": expected,
+        "next_contact": (last + np.round(expected).astype(np.int64)).astype("datetime64[D]"),
+        "overdue_ratio": ratio,
+        "status": status,
+    }, index=pd.Index(people, name="person_id"))
+
+def _cached(db: Session, today: date):
+    bind = db.get_bind()
+    version = table_version(db, "interactions")
+    with _cache_lock:
+        entry = _cadence_cache.get(bind)
+    if entry is not None and entry[0] == version:
+        if entry[1] == today:
+            return entry[2], entry[3]
+        arrays = entry[2] # Only the date moved on; the contact days are still current
+    else:
+        arrays = _load_contact_days(db)
+    frame = _build_frame(arrays[0], arrays[1], today)
+    with _cache_lock:
+        _cadence_cache[bind] = (version, today, arrays, frame)
+    return arrays, frame
+
+def get_cadence(db: Session, today: Optional[date]=None) -> pd.DataFrame:
+    # One row per person with at least one contact, indexed by person_id.
+    # The frame is shared by callers; copy it before modifying.
+    return _cached(db, today or date.today())[1]
+
+def get_overdue_people(db: Session, limit: Optional[int]=None, today: Optional[date]=None) -> pd.DataFrame:
+    frame = get_cadence(db, today)
+    overdue = frame[frame["status"] == "overdue"].sort_values("overdue_ratio", ascending=False)
+    return overdue if limit is None else overdue.head(limit)
+
+def get_contact_summary(db: Session, person_id: int, today: Optional[date]=None) -> Optional[Dict]:
+    frame = get_cadence(db, today)
+    if person_id not in frame.index:
+        return None
+    return frame.loc[person_id].to_dict()
+
+def monthly_contact_counts(db: Session, months: int=12, person_ids: Optional[List[int]]=None,
+                           today: Optional[date]=None) -> pd.DataFrame:
+    # Contact days per person per month for the last `months` months:
+    # rows are person_ids, columns "YYYY-MM", oldest first.
+    today = today or date.today()
+    person_arr, days = _cached(db, today)[0]
+    month_of = days.astype("datetime64[D]").astype("datetime64[M]")
+    this_month = np.datetime64(today, "M")
+    window = np.arange(this_month - (months - 1), this_month + 1)
+    mask = month_of >= window[0]
+    if person_ids is not None:
+        mask &= np.isin(person_arr, person_ids)
+    counts = pd.crosstab(person_arr[mask], month_of[mask].astype(str))
+    labels = window.astype(str)
+    counts = counts.reindex(columns=labels, fill_value=0)
+    if person_ids is not None:
+        counts = counts.reindex(person_ids, fill_value=0)
+    counts.index.name = "person_id"
+    counts.columns.name = "month"
+    return counts
@@ -1,9 +1,14 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from database import Person, Interaction, ProfilingData, Relationship, ProfilingQuestion, InteractionAnswer, PersonHistory
+from dataclasses import dataclass, fields
+from sqlalchemy.orm import Session, selectinload, undefer_group
+from sqlalchemy import or_, and_, case, func, text, column, Integer, select, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from database import Person, Interaction, ProfilingData, Relationship, ProfilingQuestion, InteractionAnswer, PersonHistory, PersonQuestionStat, has_interaction_fts, log_changes, parse_numeric, content_uuid, relationship_uuid, PERSON_TEXT_GROUP
 from datetime import datetime, date
-from typing import List, Optional, Dict
+from typing import Callable, List, Optional, Dict
 import random
+from intro_routes import invalidate_route_cache
+from fuzzy_date import parse_fuzzy_date
+from unit_of_work import unit_of_work
 
 # --- Person CRUD ---
 def create_person(db: Session, last_name: str, first_name: str, yomigana_last: Optional[str], yomigana_first: Optional[str],
@@ -41,6 +46,30 @@ def create_person(db: Session, last_name: str, first_name: str, yomigana_last: O
     db.refresh(new_person)
     return new_person
 
+def save_person(db: Session, fields: Dict, person_id: Optional[int]=None, history: Optional[List[Dict]]=None,
+                avatar: Optional[bytes]=None, avatar_name: str="icon.png",
+                avatar_dir: Optional[Callable[[int], str]]=None) -> Optional[Person]:
+    # Creates (person_id=None) or updates a person together with an avatar
+    # image and history entries in one transaction with a single commit.
+    # fields: Person column names; history: [{"date_str": .., "content": ..}];
+    # avatar_dir(person_id) -> folder the image is written to on commit.
+    with unit_of_work(db) as files:
+        if person_id is None:
+            person = Person(**fields)
+            db.add(person)
+            db.flush() # Assigns the id the media folder and history need
+        else:
+            person = get_person(db, person_id)
+            if person is None:
+                return None
+            for key, value in fields.items():
+                setattr(person, key, value)
+        if avatar is not None:
+            person.avatar_path = files.stage(avatar_dir(person.id), avatar_name, avatar)
+        for entry in history or []:
+            db.add(PersonHistory(person_id=person.id, date_str=entry.get("date_str"), content=entry["content"]))
+    return person
+
 def create_person_history(db: Session, person_id: int, date_str: str, content: str) -> PersonHistory:
     new_history = PersonHistory(
         person_id=person_id,
@@ -53,9 +82,26 @@ def create_person_history(db: Session, person_id: int, date_str: str, content: s
     return new_history
 
 def get_person_history(db: Session, person_id: int) -> List[PersonHistory]:
-    # Try to sort by date_str if possible, but it's string.
-    # We rely on user input format for sorting.
-    return db.query(PersonHistory).filter(PersonHistory.person_id == person_id).order_by(PersonHistory.date_str).all()
+    # Sorted by the parsed date key; unparseable date_str entries go last
+    return db.query(PersonHistory).filter(PersonHistory.person_id == person_id).order_by(
+        PersonHistory.start_key.is_(None), PersonHistory.start_key, PersonHistory.end_key, PersonHistory.date_str
+    ).all()
+
+def _period_range(start: str, end: Optional[str]=None):
+    # "2023" -> (20230101, 20231231); "2010", "2015" -> (20100101, 20151231)
+    start_parsed = parse_fuzzy_date(start)
+    end_parsed = parse_fuzzy_date(end) if end else start_parsed
+    if start_parsed is None or end_parsed is None:
+        raise ValueError(f"Unrecognized date: {start if start_parsed is None else end}")
+    return start_parsed[0], end_parsed[1]
+
+def get_person_history_in_period(db: Session, person_id: int, start: str, end: Optional[str]=None) -> List[PersonHistory]:
+    lo, hi = _period_range(start, end)
+    return db.query(PersonHistory).filter(
+        PersonHistory.person_id == person_id,
+        PersonHistory.start_key <= hi,
+        PersonHistory.end_key >= lo
+    ).order_by(PersonHistory.start_key, PersonHistory.end_key).all()
 
 def delete_person_history(db: Session, history_id: int):
     history = db.query(PersonHistory).filter(PersonHistory.id == history_id).first()
@@ -64,24 +110,96 @@ def delete_person_history(db: Session, history_id: int):
         db.commit()
 
 def get_people(db: Session) -> List[Person]:
-    # Sort by yomigana if available, else kanji
-    return db.query(Person).order_by(
-        Person.yomigana_last, Person.yomigana_first, Person.last_name, Person.first_name
-    ).all()
+    # Reading order: name_sort_key is the kana-normalized yomigana, else the name
+    return db.query(Person).order_by(Person.name_sort_key, Person.id).all()
+
+# --- Read-only projections for list, picker and graph views ---
+# Plain slotted rows with only the columns those views show: no ORM identity
+# map, change tracking or deferred long text per row.
+@dataclass(frozen=True, slots=True)
+class PersonSummary:
+    id: int
+    last_name: str
+    first_name: str
+    nickname: Optional[str]
+    gender: Optional[str]
+    status: Optional[str]
+    tags: Optional[str]
+    birth_date: Optional[date]
+    birth_year: Optional[int]
+    birth_month: Optional[int]
+    birth_day: Optional[int]
+    avatar_path: Optional[str]
+    is_self: bool
+
+    @property
+    def name(self):
+        return f"{self.last_name} {self.first_name}"
+
+@dataclass(frozen=True, slots=True)
+class RelationshipEdge:
+    id: int
+    person_a_id: int
+    person_b_id: int
+    relation_type: Optional[str]
+    quality: Optional[str]
+    position_a_to_b: Optional[str]
+    position_b_to_a: Optional[str]
+    caution_flag: bool
+
+def _projection(db: Session, row_type, model, *order_by, where=None):
+    columns = [getattr(model, f.name) for f in fields(row_type)]
+    stmt = select(*columns).order_by(*order_by)
+    if where is not None:
+        stmt = stmt.where(where)
+    return [row_type(*r) for r in db.execute(stmt)]
+
+def get_people_summary(db: Session, person_ids: Optional[List[int]]=None) -> List[PersonSummary]:
+    # Same order as get_people; person_ids limits the result to those people
+    where = Person.id.in_(person_ids) if person_ids is not None else None
+    return _projection(db, PersonSummary, Person, Person.name_sort_key, Person.id, where=where)
+
+def get_relationship_edges(db: Session, person_ids: Optional[List[int]]=None) -> List[RelationshipEdge]:
+    # person_ids: only relationships with at least one end among them
+    where = None
+    if person_ids is not None:
+        where = or_(Relationship.person_a_id.in_(person_ids), Relationship.person_b_id.in_(person_ids))
+    return _projection(db, RelationshipEdge, Relationship, Relationship.id, where=where)
 
 def get_person(db: Session, person_id: int) -> Optional[Person]:
-    return db.query(Person).filter(Person.id == person_id).first()
+    # The full record, including the deferred notes/strategy/prediction text
+    return db.query(Person).options(undefer_group(PERSON_TEXT_GROUP)).filter(Person.id == person_id).first()
 
 def delete_person(db: Session, person_id: int):
-    person = get_person(db, person_id)
-    if person:
-        # Manually delete relationships where this person is involved
-        db.query(Relationship).filter(
-            or_(Relationship.person_a_id == person_id, Relationship.person_b_id == person_id)
-        ).delete(synchronize_session=False)
+    delete_people_bulk(db, [person_id])
 
-        db.delete(person)
-        db.commit()
+def _delete_logged(db: Session, model, condition) -> int:
+    # Set-based delete that records the removed ids in the change log
+    table = model.__table__
+    rows = db.execute(delete(table).where(condition).returning(table.c.id, table.c.uuid)).all()
+    log_changes(db.connection(), [(table.name, row_id, "delete", row_uuid) for row_id, row_uuid in rows])
+    return len(rows)
+
+def delete_people_bulk(db: Session, person_ids: List[int], chunk_size: int=500) -> int:
+    # Set-based delete of people and everything hanging off them. The schema
+    # also cascades, but explicit statements keep older databases (created
+    # before ON DELETE CASCADE) working, never load rows into the session, and
+    # let every removed row reach the change log.
+    ids = list({int(pid) for pid in person_ids})
+    deleted = 0
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        interaction_ids = select(Interaction.id).where(Interaction.person_id.in_(chunk)).scalar_subquery()
+        _delete_logged(db, InteractionAnswer, InteractionAnswer.interaction_id.in_(interaction_ids))
+        _delete_logged(db, Interaction, Interaction.person_id.in_(chunk))
+        _delete_logged(db, PersonHistory, PersonHistory.person_id.in_(chunk))
+        _delete_logged(db, ProfilingData, ProfilingData.person_id.in_(chunk))
+        db.query(PersonQuestionStat).filter(PersonQuestionStat.person_id.in_(chunk)).delete(synchronize_session=False)
+        _delete_logged(db, Relationship, or_(Relationship.person_a_id.in_(chunk), Relationship.person_b_id.in_(chunk)))
+        deleted += _delete_logged(db, Person, Person.id.in_(chunk))
+    db.commit()
+    invalidate_route_cache(db)
+    return deleted
 
 def update_person(db: Session, person_id: int, **kwargs) -> Optional[Person]:
     person = get_person(db, person_id)
@@ -92,6 +210,28 @@ def update_person(db: Session, person_id: int, **kwargs) -> Optional[Person]:
         db.refresh(person)
     return person
 
+PEOPLE_PAGE_SIZE = 50
+
+def get_people_page(db: Session, after_id: Optional[int]=None, limit: int=PEOPLE_PAGE_SIZE):
+    # Keyset page of people in id order. Returns (people, next_after_id).
+    query = db.query(Person).options(undefer_group(PERSON_TEXT_GROUP)) # API pages return every column
+    if after_id is not None:
+        query = query.filter(Person.id > after_id)
+    rows = query.order_by(Person.id).limit(limit + 1).all()
+    next_after = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_after = rows[-1].id
+    return rows, next_after
+
+def create_people_bulk(db: Session, rows: List[Dict]) -> List[int]:
+    # rows: [{"last_name": .., "first_name": .., ...}] with Person column names.
+    # One transaction for the whole batch.
+    people = [Person(**row) for row in rows]
+    db.add_all(people)
+    db.commit()
+    return [p.id for p in people]
+
 # --- Interaction CRUD ---
 def create_interaction(db: Session, person_id: int, category: str, content: str, tags: str, user_feeling: str,
                        entry_date: date, start_date_str: Optional[str]=None, end_date_str: Optional[str]=None,
@@ -107,25 +247,162 @@ def create_interaction(db: Session, person_id: int, category: str, content: str,
         end_date_str=end_date_str,
         channel=channel
     )
-    db.add(new_int)
-    db.commit()
-    db.refresh(new_int)
-
-    if answers:
-        for ans in answers:
-            new_ans = InteractionAnswer(
-                interaction_id=new_int.id,
-                question_id=ans['question_id'],
-                answer_value=ans['answer_value']
-            )
-            db.add(new_ans)
-        db.commit()
+    # The interaction, its answers and the question stats commit together
+    with unit_of_work(db):
+        db.add(new_int)
+        if answers:
+            db.flush()
+            db.add_all(InteractionAnswer(interaction_id=new_int.id, question_id=a['question_id'], answer_value=a['answer_value'])
+                       for a in answers)
+            _update_question_stats(db, person_id, entry_date, answers)
 
     return new_int
 
+def create_interactions_bulk(db: Session, rows: List[Dict]) -> List[int]:
+    # rows: create_interaction keyword arguments, e.g.
+    # [{"person_id": 1, "category": "会話", "content": "..", "entry_date": date(..), "answers": [..]}]
+    # Everything is written in one transaction.
+    created = []
+    for row in rows:
+        row = dict(row)
+        answers = row.pop("answers", None) or []
+        new_int = Interaction(**row)
+        db.add(new_int)
+        created.append((new_int, answers))
+    db.flush()
+    for new_int, answers in created:
+        if not answers:
+            continue
+        db.add_all(InteractionAnswer(interaction_id=new_int.id, question_id=a['question_id'], answer_value=a['answer_value'])
+                   for a in answers)
+        _update_question_stats(db, new_int.person_id, new_int.entry_date, answers)
+    db.commit()
+    return [i.id for i, _ in created]
+
+def _update_question_stats(db: Session, person_id: int, answered_on: Optional[date], answers: List[Dict]):
+    table = PersonQuestionStat.__table__
+    stmt = sqlite_insert(table)
+    excluded = stmt.excluded
+    # A backdated answer counts, but does not replace the latest value
+    is_latest = or_(table.c.last_answered_on == None, excluded.last_answered_on >= table.c.last_answered_on)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.person_id, table.c.question_id],
+        set_={
+            "answer_count": table.c.answer_count + 1,
+            "value_changes": table.c.value_changes + case((and_(is_latest, table.c.last_value != excluded.last_value), 1), else_=0),
+            "last_value": case((is_latest, excluded.last_value), else_=table.c.last_value),
+            "last_answered_on": case((is_latest, excluded.last_answered_on), else_=table.c.last_answered_on),
+            "numeric_count": table.c.numeric_count + excluded.numeric_count,
+            "numeric_sum": table.c.numeric_sum + excluded.numeric_sum,
+            "numeric_sq_sum": table.c.numeric_sq_sum + excluded.numeric_sq_sum,
+        }
+    )
+    params = []
+    for ans in answers:
+        num = parse_numeric(ans['answer_value'])
+        params.append({
+            "person_id": person_id,
+            "question_id": ans['question_id'],
+            "answer_count": 1,
+            "value_changes": 0,
+            "last_value": ans['answer_value'],
+            "last_answered_on": answered_on or date.today(),
+            "numeric_count": 1 if num is not None else 0,
+            "numeric_sum": num or 0.0,
+            "numeric_sq_sum": (num or 0.0) ** 2,
+        })
+    # Executed one by one so repeated questions in the same log accumulate
+    for p in params:
+        db.execute(stmt, p)
+
+def get_question_stats(db: Session, person_id: int) -> Dict[int, PersonQuestionStat]:
+    stats = db.query(PersonQuestionStat).filter(PersonQuestionStat.person_id == person_id).all()
+    return {s.question_id: s for s in stats}
+
 def get_interactions_by_person(db: Session, person_id: int) -> List[Interaction]:
     return db.query(Interaction).filter(Interaction.person_id == person_id).order_by(Interaction.entry_date.desc()).all()
 
+TIMELINE_PAGE_SIZE = 20
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+def _like_any(columns, term: str):
+    # Substring match on any of the columns; \, % and _ in the term are literal
+    pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    return or_(*(c.like(pattern, escape="\\") for c in columns))
+
+def get_interaction_timeline(db: Session, person_id: int, search: Optional[str]=None,
+                             category: Optional[str]=None, channel: Optional[str]=None,
+                             cursor: Optional[tuple]=None, limit: int=TIMELINE_PAGE_SIZE):
+    # One page of a person's interactions, newest first.
+    # cursor is the (entry_date, id) of the last row of the previous page.
+    # Returns (interactions, next_cursor); next_cursor is None on the last page.
+    query = db.query(Interaction).filter(Interaction.person_id == person_id)
+    if category:
+        query = query.filter(Interaction.category == category)
+    if channel:
+        query = query.filter(Interaction.channel == channel)
+    if search:
+        # Trigram FTS needs at least 3 characters; shorter terms use LIKE
+        if len(search) >= 3 and has_interaction_fts(db.get_bind()):
+            match = f"{{content tags category}} : {_fts_phrase(search)}"
+            fts_ids = text("SELECT rowid FROM interactions_fts WHERE interactions_fts MATCH :match").bindparams(match=match)
+            query = query.filter(Interaction.id.in_(fts_ids.columns(column("rowid", Integer))))
+        else:
+            query = query.filter(_like_any((Interaction.content, Interaction.tags, Interaction.category), search))
+    if cursor is not None:
+        c_date, c_id = cursor
+        query = query.filter(or_(
+            Interaction.entry_date < c_date,
+            and_(Interaction.entry_date == c_date, Interaction.id < c_id)
+        ))
+
+    rows = query.options(
+        selectinload(Interaction.answers).joinedload(InteractionAnswer.question)
+    ).order_by(Interaction.entry_date.desc(), Interaction.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1].entry_date, rows[-1].id)
+    return rows, next_cursor
+
+def get_interaction_facets(db: Session, person_id: int) -> Dict[str, List[str]]:
+    # Distinct categories / channels for the timeline filters
+    cats = db.query(Interaction.category).filter(Interaction.person_id == person_id, Interaction.category != None).distinct().all()
+    chans = db.query(Interaction.channel).filter(Interaction.person_id == person_id, Interaction.channel != None).distinct().all()
+    return {"category": sorted(c[0] for c in cats), "channel": sorted(c[0] for c in chans)}
+
+def get_interactions_in_period(db: Session, start: str, end: Optional[str]=None, person_id: Optional[int]=None) -> List[Interaction]:
+    # Interactions whose period overlaps [start, end], e.g. ("2023") or ("2010", "2015/03")
+    lo, hi = _period_range(start, end)
+    query = db.query(Interaction).filter(Interaction.start_key <= hi, Interaction.end_key >= lo)
+    if person_id is not None:
+        query = query.filter(Interaction.person_id == person_id)
+    return query.order_by(Interaction.start_key, Interaction.id).all()
+
+SEARCH_LIMIT = 50
+
+def search_people(db: Session, keyword: str, limit: int=SEARCH_LIMIT) -> List[Person]:
+    return db.query(Person).options(undefer_group(PERSON_TEXT_GROUP)).filter(_like_any((
+        Person.last_name, Person.first_name, Person.yomigana_last, Person.yomigana_first,
+        Person.nickname, Person.tags, Person.status, Person.notes, Person.prediction_notes
+    ), keyword)).order_by(Person.id).limit(limit).all()
+
+def search_interactions(db: Session, keyword: str, limit: int=SEARCH_LIMIT) -> List[Interaction]:
+    # Across all people, newest first; same FTS / LIKE split as the timeline
+    query = db.query(Interaction)
+    if len(keyword) >= 3 and has_interaction_fts(db.get_bind()):
+        match = f"{{content tags category}} : {_fts_phrase(keyword)}"
+        fts_ids = text("SELECT rowid FROM interactions_fts WHERE interactions_fts MATCH :match").bindparams(match=match)
+        query = query.filter(Interaction.id.in_(fts_ids.columns(column("rowid", Integer))))
+    else:
+        query = query.filter(_like_any((Interaction.content, Interaction.tags, Interaction.category), keyword))
+    return query.options(selectinload(Interaction.answers)).order_by(
+        Interaction.entry_date.desc(), Interaction.id.desc()
+    ).limit(limit).all()
+
 # --- Profiling CRUD (Legacy/Additional) ---
 def create_profiling_data(db: Session, person_id: int, framework: str, result: str, confidence: str, evidence: str) -> ProfilingData:
     new_data = ProfilingData(
@@ -144,50 +421,81 @@ def get_profiling_data_by_person(db: Session, person_id: int) -> List[ProfilingD
     return db.query(ProfilingData).filter(ProfilingData.person_id == person_id).all()
 
 # --- Relationship CRUD ---
+def _relationship_upsert_stmt():
+    # One statement per edge: insert, or update the existing canonical pair.
+    # Positions are stored relative to the row's own A/B, so flip them when the
+    # incoming edge is the reverse orientation.
+    table = Relationship.__table__
+    stmt = sqlite_insert(table)
+    same_orientation = table.c.person_a_id == stmt.excluded.person_a_id
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.pair_min_id, table.c.pair_max_id],
+        set_={
+            "relation_type": stmt.excluded.relation_type,
+            "quality": stmt.excluded.quality,
+            "caution_flag": stmt.excluded.caution_flag,
+            "position_a_to_b": case((same_orientation, stmt.excluded.position_a_to_b), else_=stmt.excluded.position_b_to_a),
+            "position_b_to_a": case((same_orientation, stmt.excluded.position_b_to_a), else_=stmt.excluded.position_a_to_b),
+            "uuid": func.coalesce(table.c.uuid, stmt.excluded.uuid),
+        }
+    )
+
+def _relationship_params(person_a: int, person_b: int, rel_type: str, quality: str,
+                         position_a_to_b: Optional[str]=None, position_b_to_a: Optional[str]=None,
+                         caution_flag: bool=False) -> Dict:
+    return {
+        "person_a_id": person_a,
+        "person_b_id": person_b,
+        "pair_min_id": min(person_a, person_b),
+        "pair_max_id": max(person_a, person_b),
+        "relation_type": rel_type,
+        "quality": quality,
+        "position_a_to_b": position_a_to_b,
+        "position_b_to_a": position_b_to_a,
+        "caution_flag": bool(caution_flag),
+    }
+
+def _set_relationship_uuids(db: Session, params: List[Dict]):
+    # The stable pair id from the two people's uuids (as ensure_uuids derives
+    # it), so every write and its change_log entry carry it
+    ids = {p[k] for p in params for k in ("person_a_id", "person_b_id")}
+    uuids = dict(db.query(Person.id, Person.uuid).filter(Person.id.in_(ids)).all())
+    for p in params:
+        a, b = uuids.get(p["person_a_id"]), uuids.get(p["person_b_id"])
+        p["uuid"] = relationship_uuid(a, b) if a and b else None
+
 def create_relationship(db: Session, person_a: int, person_b: int, rel_type: str, quality: str,
                         position_a_to_b: Optional[str]=None, position_b_to_a: Optional[str]=None,
                         caution_flag: bool=False) -> Relationship:
-    # Check if exists
-    existing = db.query(Relationship).filter(
-        or_(
-            (Relationship.person_a_id == person_a) & (Relationship.person_b_id == person_b),
-            (Relationship.person_a_id == person_b) & (Relationship.person_b_id == person_a)
-        )
-    ).first()
-
-    if existing:
-        # Update existing
-        if existing.person_a_id == person_a:
-            existing.relation_type = rel_type
-            existing.quality = quality
-            existing.position_a_to_b = position_a_to_b
-            existing.position_b_to_a = position_b_to_a
-            existing.caution_flag = caution_flag
-        else:
-            # Found as A=b, B=a
-            existing.relation_type = rel_type
-            existing.quality = quality
-            existing.position_a_to_b = position_b_to_a # Flip
-            existing.position_b_to_a = position_a_to_b # Flip
-            existing.caution_flag = caution_flag
+    params = _relationship_params(person_a, person_b, rel_type, quality, position_a_to_b, position_b_to_a, caution_flag)
+    _set_relationship_uuids(db, [params])
+    table = Relationship.__table__
+    rel_id, rel_uuid = db.execute(_relationship_upsert_stmt().returning(table.c.id, table.c.uuid), params).one()
+    log_changes(db.connection(), [("relationships", rel_id, "upsert", rel_uuid)])
+    db.commit()
+    invalidate_route_cache(db)
+    return db.get(Relationship, rel_id)
 
-        db.commit()
-        db.refresh(existing)
-        return existing
-
-    new_rel = Relationship(
-        person_a_id=person_a,
-        person_b_id=person_b,
-        relation_type=rel_type,
-        quality=quality,
-        position_a_to_b=position_a_to_b,
-        position_b_to_a=position_b_to_a,
-        caution_flag=caution_flag
-    )
-    db.add(new_rel)
+def upsert_relationships_bulk(db: Session, edges: List[Dict]) -> int:
+    # edges: [{"person_a": .., "person_b": .., "rel_type": .., "quality": .., ...}]
+    # Everything is written in one transaction with a single executemany.
+    params = [
+        _relationship_params(
+            int(e["person_a"]), int(e["person_b"]), e.get("rel_type"), e.get("quality"),
+            e.get("position_a_to_b"), e.get("position_b_to_a"), e.get("caution_flag", False)
+        )
+        for e in edges
+        if int(e["person_a"]) != int(e["person_b"])
+    ]
+    if not params:
+        return 0
+    _set_relationship_uuids(db, params)
+    table = Relationship.__table__
+    rows = db.execute(_relationship_upsert_stmt().returning(table.c.id, table.c.uuid), params).all()
+    log_changes(db.connection(), [("relationships", rel_id, "upsert", rel_uuid) for rel_id, rel_uuid in rows])
     db.commit()
-    db.refresh(new_rel)
-    return new_rel
+    invalidate_route_cache(db)
+    return len(params)
 
 def get_relationships_for_person(db: Session, person_id: int) -> List[Relationship]:
     return db.query(Relationship).filter(
@@ -224,6 +532,9 @@ def update_question(db: Session, question_id: int, **kwargs) -> Optional[Profili
 def delete_question(db: Session, question_id: int):
     q = db.query(ProfilingQuestion).filter(ProfilingQuestion.id == question_id).first()
     if q:
+        # Deleting a question deletes its answers too (the UI says so). Done here,
+        # not by a cascade, so older databases behave the same and the deletes are logged
+        _delete_logged(db, InteractionAnswer, InteractionAnswer.question_id == question_id)
         db.delete(q)
         db.commit()
 
@@ -238,6 +549,8 @@ def seed_questions(db: Session):
         ]
         for q in questions:
             db.add(ProfilingQuestion(
+                # Same uuid in every database, so synced copies don't duplicate the defaults
+                uuid=content_uuid("profiling_questions", "seed", q["text"]),
                 category=q["category"],
                 question_text=q["text"],
                 judgment_criteria=q["criteria"],
@@ -248,11 +561,12 @@ def seed_questions(db: Session):
         db.commit()
 
 def get_random_question(db: Session) -> Optional[ProfilingQuestion]:
-    count = db.query(ProfilingQuestion).count()
-    if count == 0:
+    # Random id in [min, max] then an index seek, instead of COUNT + OFFSET
+    min_id, max_id = db.query(func.min(ProfilingQuestion.id), func.max(ProfilingQuestion.id)).one()
+    if min_id is None:
         return None
-    offset = random.randint(0, count - 1)
-    return db.query(ProfilingQuestion).offset(offset).first()
+    pick = random.randint(min_id, max_id)
+    return db.query(ProfilingQuestion).filter(ProfilingQuestion.id >= pick).order_by(ProfilingQuestion.id).first()
 
 def get_all_questions(db: Session) -> List[ProfilingQuestion]:
     return db.query(ProfilingQuestion).all()
@@ -263,8 +577,4 @@ def get_interaction_answers(db: Session, person_id: int) -> List[InteractionAnsw
 
 def get_question_answer_counts(db: Session, person_id: int) -> Dict[int, int]:
     # Returns {question_id: count}
-    answers = get_interaction_answers(db, person_id)
-    counts = {}
-    for a in answers:
-        counts[a.question_id] = counts.get(a.question_id, 0) + 1
-    return counts
+    return {qid: s.answer_count for qid, s in get_question_stats(db, person_id).items()}
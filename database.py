@@ -1,12 +1,34 @@
-from sqlalchemy import create_engine, Column, Integer, String, Date, DateTime, ForeignKey, Text, Boolean
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+from sqlalchemy import create_engine, bindparam, Column, Integer, String, Date, DateTime, ForeignKey, Text, Boolean, Float, Index, event, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import declarative_base, deferred, relationship, sessionmaker, Session
+from sqlalchemy.exc import OperationalError
+import math
+import sqlite3
+import threading
+import weakref
+from typing import Optional
+from fuzzy_date import period_keys
+from kana import person_name_keys
 from datetime import datetime, date
+from uuid import uuid4, uuid5, NAMESPACE_URL
 
 Base = declarative_base()
 
+PERSON_TEXT_GROUP = "person_text"
+
+def new_uuid() -> str:
+    # Stable row identity across database copies (see sync.py)
+    return uuid4().hex
+
+def content_uuid(*parts) -> str:
+    # Deterministic uuid for rows that two copies should agree on without
+    # talking to each other (backfilled rows, seeded questions, relationship pairs)
+    return uuid5(NAMESPACE_URL, "hrcrm:" + ":".join(str(p) for p in parts)).hex
+
 class Person(Base):
     __tablename__ = 'people'
     id = Column(Integer, primary_key=True)
+    uuid = Column(String, default=new_uuid, index=True, unique=True)
     last_name = Column(String, nullable=False)
     first_name = Column(String, nullable=False)
     yomigana_last = Column(String)
@@ -27,38 +49,64 @@ class Person(Base):
     first_met_month = Column(Integer)
     first_met_day = Column(Integer)
 
-    notes = Column(Text)
-    strategy = Column(Text) # 攻略方法
+    # Long free text is deferred: list queries skip it, get_person loads it
+    # (undefer_group(PERSON_TEXT_GROUP)), other access loads it on demand
+    notes = deferred(Column(Text), group=PERSON_TEXT_GROUP)
+    strategy = deferred(Column(Text), group=PERSON_TEXT_GROUP) # 攻略方法
 
     # New columns
     tags = Column(String) # Chunking/Group
 
     avatar_path = Column(String)
     is_self = Column(Boolean, default=False)
-    prediction_notes = Column(Text) # Personality based prediction
+    prediction_notes = deferred(Column(Text), group=PERSON_TEXT_GROUP) # Personality based prediction
+
+    # Kana-normalized name keys (kana.person_name_keys), kept in sync on write
+    name_sort_key = Column(String, index=True) # Reading order for lists and pickers
+    name_search_key = Column(Text) # Tokens the name index matches against
 
     # Relationships
-    interactions = relationship("Interaction", back_populates="person", cascade="all, delete-orphan")
-    profiling_data = relationship("ProfilingData", back_populates="person", cascade="all, delete-orphan")
-    history = relationship("PersonHistory", back_populates="person", cascade="all, delete-orphan")
+    # Dependents are removed by ON DELETE CASCADE, so the ORM never loads them on delete
+    interactions = relationship("Interaction", back_populates="person", cascade="all, delete-orphan", passive_deletes=True)
+    profiling_data = relationship("ProfilingData", back_populates="person", cascade="all, delete-orphan", passive_deletes=True)
+    history = relationship("PersonHistory", back_populates="person", cascade="all, delete-orphan", passive_deletes=True)
 
     @property
     def name(self):
         return f"{self.last_name} {self.first_name}"
 
+@event.listens_for(Person, "before_insert")
+@event.listens_for(Person, "before_update")
+def _set_person_name_keys(mapper, connection, target):
+    target.name_sort_key, target.name_search_key = person_name_keys(
+        target.last_name, target.first_name, target.yomigana_last, target.yomigana_first, target.nickname
+    )
+
 class PersonHistory(Base):
     __tablename__ = 'person_history'
     id = Column(Integer, primary_key=True)
-    person_id = Column(Integer, ForeignKey('people.id'), nullable=False)
+    uuid = Column(String, default=new_uuid, index=True, unique=True)
+    person_id = Column(Integer, ForeignKey('people.id', ondelete='CASCADE'), nullable=False, index=True)
     date_str = Column(String) # e.g. 1999/04, 2020 Summer
     content = Column(Text)
 
+    # Derived from date_str by fuzzy_date (YYYYMMDD keys)
+    start_key = Column(Integer)
+    end_key = Column(Integer)
+    date_precision = Column(String)
+
     person = relationship("Person", back_populates="history")
 
+    __table_args__ = (
+        Index("ix_person_history_person_start", "person_id", "start_key"),
+        Index("ix_person_history_start_end", "start_key", "end_key"),
+    )
+
 class Interaction(Base):
     __tablename__ = 'interactions'
     id = Column(Integer, primary_key=True)
-    person_id = Column(Integer, ForeignKey('people.id'), nullable=False)
+    uuid = Column(String, default=new_uuid, index=True, unique=True)
+    person_id = Column(Integer, ForeignKey('people.id', ondelete='CASCADE'), nullable=False, index=True)
 
     entry_date = Column(Date, default=date.today)
 
@@ -66,6 +114,11 @@ class Interaction(Base):
     start_date_str = Column(String) # e.g., 2024/00/00
     end_date_str = Column(String)   # e.g., Present, None
 
+    # Derived from the period strings (or entry_date) by fuzzy_date
+    start_key = Column(Integer)
+    end_key = Column(Integer)
+    date_precision = Column(String)
+
     category = Column(String)  # Conversation, Meal, Event, Observation, Contact, Gift, Collaboration
     channel = Column(String)   # In Person, Call, Text, Passive
     tags = Column(String)  # Comma separated tags
@@ -73,13 +126,33 @@ class Interaction(Base):
     user_feeling = Column(Text)
 
     person = relationship("Person", back_populates="interactions")
-    answers = relationship("InteractionAnswer", back_populates="interaction", cascade="all, delete-orphan")
+    answers = relationship("InteractionAnswer", back_populates="interaction", cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        Index("ix_interactions_start_end", "start_key", "end_key"),
+        Index("ix_interactions_person_entry", "person_id", "entry_date", "id"),
+    )
+
+@event.listens_for(PersonHistory, "before_insert")
+@event.listens_for(PersonHistory, "before_update")
+def _set_history_date_keys(mapper, connection, target):
+    target.start_key, target.end_key, target.date_precision = period_keys(target.date_str)
+
+@event.listens_for(Interaction, "before_insert")
+@event.listens_for(Interaction, "before_update")
+def _set_interaction_date_keys(mapper, connection, target):
+    target.start_key, target.end_key, target.date_precision = period_keys(
+        target.start_date_str, target.end_date_str, fallback=target.entry_date or date.today()
+    )
 
 class InteractionAnswer(Base):
     __tablename__ = 'interaction_answers'
     id = Column(Integer, primary_key=True)
-    interaction_id = Column(Integer, ForeignKey('interactions.id'))
-    question_id = Column(Integer, ForeignKey('profiling_questions.id'))
+    uuid = Column(String, default=new_uuid, index=True, unique=True)
+    interaction_id = Column(Integer, ForeignKey('interactions.id', ondelete='CASCADE'), index=True)
+    # No cascade: existing databases keep the plain key (SQLite cannot alter it),
+    # so delete_question removes the answers itself on every schema
+    question_id = Column(Integer, ForeignKey('profiling_questions.id'), index=True)
     answer_value = Column(String) # Can be numeric (0,1,3,5) or text
 
     interaction = relationship("Interaction", back_populates="answers")
@@ -88,7 +161,8 @@ class InteractionAnswer(Base):
 class ProfilingData(Base):
     __tablename__ = 'profiling_data'
     id = Column(Integer, primary_key=True)
-    person_id = Column(Integer, ForeignKey('people.id'), nullable=False)
+    uuid = Column(String, default=new_uuid, index=True, unique=True)
+    person_id = Column(Integer, ForeignKey('people.id', ondelete='CASCADE'), nullable=False, index=True)
     framework = Column(String)  # MBTI, Big5, etc.
     result = Column(String)
     confidence_level = Column(String)  # S, A, B, C
@@ -99,8 +173,9 @@ class ProfilingData(Base):
 class Relationship(Base):
     __tablename__ = 'relationships'
     id = Column(Integer, primary_key=True)
-    person_a_id = Column(Integer, ForeignKey('people.id'), nullable=False)
-    person_b_id = Column(Integer, ForeignKey('people.id'), nullable=False)
+    uuid = Column(String, index=True, unique=True) # Derived from the two people's uuids
+    person_a_id = Column(Integer, ForeignKey('people.id', ondelete='CASCADE'), nullable=False, index=True)
+    person_b_id = Column(Integer, ForeignKey('people.id', ondelete='CASCADE'), nullable=False, index=True)
     relation_type = Column(String)  # e.g., Spouse, Colleague
     quality = Column(String)  # e.g., Good, Bad
 
@@ -109,9 +184,24 @@ class Relationship(Base):
 
     caution_flag = Column(Boolean, default=False) # Red dashed line in graph
 
+    # Canonical pair key (min id, max id) so A-B and B-A are the same row
+    pair_min_id = Column(Integer)
+    pair_max_id = Column(Integer)
+
+    __table_args__ = (
+        Index("ix_relationships_pair", "pair_min_id", "pair_max_id", unique=True),
+    )
+
+@event.listens_for(Relationship, "before_insert")
+@event.listens_for(Relationship, "before_update")
+def _set_relationship_pair_key(mapper, connection, target):
+    target.pair_min_id = min(target.person_a_id, target.person_b_id)
+    target.pair_max_id = max(target.person_a_id, target.person_b_id)
+
 class ProfilingQuestion(Base):
     __tablename__ = 'profiling_questions'
     id = Column(Integer, primary_key=True)
+    uuid = Column(String, default=new_uuid, index=True, unique=True)
     category = Column(String) # MBTI, Physiognomy, Personal Info, etc.
     question_text = Column(Text)
     judgment_criteria = Column(Text)
@@ -119,13 +209,391 @@ class ProfilingQuestion(Base):
     options = Column(Text) # Comma separated options for 'selection' type
     target_trait = Column(String) # Keep for backward compat or specific traits
 
+class PersonQuestionStat(Base):
+    # Per person/question answer summary, maintained when answers are written
+    __tablename__ = 'person_question_stats'
+    person_id = Column(Integer, ForeignKey('people.id', ondelete='CASCADE'), primary_key=True)
+    question_id = Column(Integer, ForeignKey('profiling_questions.id', ondelete='CASCADE'), primary_key=True)
+    answer_count = Column(Integer, default=0)
+    value_changes = Column(Integer, default=0) # How often the answer differed from the previous one
+    last_value = Column(String)
+    last_answered_on = Column(Date)
+    numeric_count = Column(Integer, default=0)
+    numeric_sum = Column(Float, default=0.0)
+    numeric_sq_sum = Column(Float, default=0.0)
+
+class ChangeLog(Base):
+    # One row per write to a tracked table, appended in the writing transaction.
+    # seq is the consumer cursor; version counts writes per (table, row).
+    # AUTOINCREMENT: compaction deletes rows, and a plain rowid would hand
+    # their seq numbers out again behind consumers' cursors.
+    __tablename__ = 'change_log'
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String, nullable=False)
+    row_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False) # insert, update, upsert, delete
+    version = Column(Integer, nullable=False)
+    changed_at = Column(DateTime, nullable=False)
+    row_uuid = Column(String) # Needed to replay deletes elsewhere
+    origin = Column(String) # Peer instance id when written by sync, else NULL
+
+    __table_args__ = (
+        Index("ix_change_log_row", "table_name", "row_id", "version"),
+        {"sqlite_autoincrement": True},
+    )
+
+class SyncState(Base):
+    # Per peer database: how far this side's change_log has been sent
+    __tablename__ = 'sync_state'
+    peer_id = Column(String, primary_key=True)
+    sent_seq = Column(Integer, default=0)
+    last_synced_at = Column(DateTime)
+
+class SyncMeta(Base):
+    __tablename__ = 'sync_meta'
+    key = Column(String, primary_key=True)
+    value = Column(String)
+
+class JobState(Base):
+    # One row per background job (scheduler.py): status, timing and the lease
+    # that keeps a job to one running instance across threads and processes
+    __tablename__ = 'job_state'
+    name = Column(String, primary_key=True)
+    status = Column(String, default="idle") # idle, running, ok, failed
+    lease_owner = Column(String)
+    lease_expires_at = Column(Float) # Unix time; an expired lease may be taken over
+    last_started_at = Column(DateTime)
+    last_finished_at = Column(DateTime)
+    last_duration_ms = Column(Float)
+    run_count = Column(Integer, default=0)
+    fail_count = Column(Integer, default=0)
+    last_error = Column(Text)
+    last_result = Column(Text) # JSON returned by the job
+    last_version = Column(Text) # Watched tables' table_version at the last run
+
+class DailyDigest(Base):
+    # Precomputed by the daily_digest job (jobs.py), read by the pages
+    __tablename__ = 'daily_digest'
+    id = Column(Integer, primary_key=True)
+    digest_date = Column(Date, nullable=False, index=True)
+    kind = Column(String, nullable=False) # birthday, overdue
+    person_id = Column(Integer, ForeignKey('people.id', ondelete='CASCADE'), nullable=False)
+    days = Column(Integer) # birthday: days until it; overdue: days since last contact
+    detail = Column(String)
+
+# Tables whose writes are captured (person_question_stats is derived from answers)
+TRACKED_TABLES = {
+    'people', 'person_history', 'interactions', 'interaction_answers',
+    'profiling_data', 'relationships', 'profiling_questions',
+}
+CHANGE_CAPTURE = True # Switched off only to measure its overhead
+
+def set_change_capture(enabled: bool):
+    global CHANGE_CAPTURE
+    CHANGE_CAPTURE = enabled
+
+_CHANGE_LOG_INSERT = (
+    "INSERT INTO change_log (table_name, row_id, op, version, changed_at, row_uuid, origin) VALUES (?, ?, ?, "
+    "(SELECT COALESCE(MAX(version), 0) + 1 FROM change_log WHERE table_name = ? AND row_id = ?), ?, ?, ?)"
+)
+
+def log_changes(connection, entries, origin: Optional[str]=None):
+    # entries: [(table_name, row_id, op, row_uuid)]; runs on the caller's connection so it
+    # commits or rolls back together with the write itself. Plain DBAPI
+    # executemany: this runs on every write, so skip SQLAlchemy's per-row
+    # parameter processing.
+    if not CHANGE_CAPTURE or not entries:
+        return
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f") # SQLAlchemy's SQLite DateTime format
+    connection.exec_driver_sql(_CHANGE_LOG_INSERT, [
+        (table_name, row_id, op, table_name, row_id, now, row_uuid, origin) for table_name, row_id, op, row_uuid in entries
+    ])
+
+@event.listens_for(Session, "after_flush")
+def _capture_orm_changes(session, flush_context):
+    # new/dirty/deleted still describe the flush that just ran
+    if not CHANGE_CAPTURE:
+        return
+    entries = []
+    for obj in session.new:
+        if obj.__table__.name in TRACKED_TABLES:
+            entries.append((obj.__table__.name, obj.id, "insert", obj.uuid))
+    for obj in session.dirty:
+        if obj.__table__.name in TRACKED_TABLES and session.is_modified(obj, include_collections=False):
+            entries.append((obj.__table__.name, obj.id, "update", obj.uuid))
+    for obj in session.deleted:
+        if obj.__table__.name in TRACKED_TABLES:
+            entries.append((obj.__table__.name, obj.id, "delete", obj.uuid))
+    log_changes(session.connection(), entries)
+
+@event.listens_for(Engine, "connect")
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores ON DELETE CASCADE unless this is set per connection
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
 # Database Setup
 DATABASE_URL = "sqlite:///human_crm.db"
 engine = create_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def init_db():
-    Base.metadata.create_all(bind=engine)
+def _add_missing_columns(bind):
+    # create_all does not alter existing tables, so add new columns by hand
+    insp = inspect(bind)
+    existing_tables = set(insp.get_table_names())
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_cols = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in existing_cols:
+                    col_type = col.type.compile(dialect=bind.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}"))
+
+def _backfill_relationship_pairs(bind):
+    with bind.begin() as conn:
+        conn.execute(text(
+            "UPDATE relationships SET "
+            "pair_min_id = MIN(person_a_id, person_b_id), pair_max_id = MAX(person_a_id, person_b_id) "
+            "WHERE pair_min_id IS NULL OR pair_max_id IS NULL"
+        ))
+        # Older versions could store the same pair twice; keep the oldest row
+        conn.execute(text(
+            "DELETE FROM relationships WHERE id NOT IN ("
+            "SELECT MIN(id) FROM relationships GROUP BY pair_min_id, pair_max_id)"
+        ))
+
+def parse_numeric(value) -> Optional[float]:
+    # The numeric value of an answer for person_question_stats, or None.
+    # "nan", "inf" and overflowing values like "1e400" would poison the sums.
+    try:
+        num = float(value)
+    except (TypeError, ValueError):
+        return None
+    return num if math.isfinite(num) else None
+
+def rebuild_question_stats(bind, person_id=None, person_ids=None):
+    # Recompute person_question_stats from interaction_answers in one pass,
+    # for everyone or just the given people.
+    # value_changes is approximated by (distinct answers - 1) here.
+    if person_id is not None:
+        person_ids = [person_id]
+    if person_ids is not None:
+        person_ids = list(person_ids)
+        for start in range(0, len(person_ids), 500):
+            _rebuild_question_stats(bind, person_ids[start:start + 500])
+    else:
+        _rebuild_question_stats(bind, None)
+
+def _rebuild_question_stats(bind, person_ids):
+    where = "WHERE i.person_id IN :ids" if person_ids is not None else ""
+    params = {"ids": person_ids} if person_ids is not None else {}
+    def _stmt(sql):
+        return text(sql).bindparams(bindparam("ids", expanding=True)) if person_ids is not None else text(sql)
+    with bind.begin() as conn:
+        # Same rule as the incremental update in crud
+        conn.connection.driver_connection.create_function("parse_numeric", 1, parse_numeric, deterministic=True)
+        conn.execute(_stmt(f"DELETE FROM person_question_stats {'WHERE person_id IN :ids' if person_ids is not None else ''}"), params)
+        conn.execute(_stmt(
+            "INSERT INTO person_question_stats (person_id, question_id, answer_count, value_changes, last_value, "
+            "last_answered_on, numeric_count, numeric_sum, numeric_sq_sum) "
+            "SELECT person_id, question_id, COUNT(*), COUNT(DISTINCT answer_value) - 1, "
+            "MAX(CASE WHEN rn = 1 THEN answer_value END), MAX(entry_date), "
+            "COUNT(num), COALESCE(SUM(num), 0), COALESCE(SUM(num * num), 0) "
+            "FROM (SELECT i.person_id, a.question_id, a.answer_value, i.entry_date, "
+            "      parse_numeric(a.answer_value) AS num, "
+            "      ROW_NUMBER() OVER (PARTITION BY i.person_id, a.question_id ORDER BY i.entry_date DESC, a.id DESC) AS rn "
+            "      FROM interaction_answers a JOIN interactions i ON i.id = a.interaction_id "
+            f"      {where}) s "
+            "WHERE question_id IS NOT NULL "
+            "GROUP BY person_id, question_id"
+        ), params)
+
+def _backfill_question_stats(bind):
+    with bind.connect() as conn:
+        has_stats = conn.execute(text("SELECT 1 FROM person_question_stats LIMIT 1")).first()
+        has_answers = conn.execute(text("SELECT 1 FROM interaction_answers LIMIT 1")).first()
+    if has_answers and not has_stats:
+        rebuild_question_stats(bind)
+
+def _backfill_date_keys(bind, batch_size=1000):
+    # Walk rows without keys in id order and update them a batch at a time
+    jobs = [
+        ("interactions", "start_date_str, end_date_str, entry_date",
+         lambda r: period_keys(r[1], r[2], fallback=date.fromisoformat(str(r[3])) if r[3] else None)),
+        ("person_history", "date_str", lambda r: period_keys(r[1])),
+    ]
+    for table_name, cols, derive in jobs:
+        last_id = 0
+        while True:
+            with bind.begin() as conn:
+                rows = conn.execute(text(
+                    f"SELECT id, {cols} FROM {table_name} "
+                    f"WHERE start_key IS NULL AND id > :last_id ORDER BY id LIMIT :limit"
+                ), {"last_id": last_id, "limit": batch_size}).all()
+                if not rows:
+                    break
+                updates = []
+                for r in rows:
+                    start_key, end_key, precision = derive(r)
+                    if start_key is not None:
+                        updates.append({"id": r[0], "s": start_key, "e": end_key, "p": precision})
+                if updates:
+                    conn.execute(text(
+                        f"UPDATE {table_name} SET start_key = :s, end_key = :e, date_precision = :p WHERE id = :id"
+                    ), updates)
+                last_id = rows[-1][0]
+
+def _ensure_change_log_autoincrement(bind):
+    # change_log tables created before seq was AUTOINCREMENT are rebuilt once.
+    # The sequence starts above every seq a sync peer may already have as
+    # its cursor, because compaction may have removed the highest rows.
+    with bind.begin() as conn:
+        sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'change_log'").scalar()
+        if sql is None or "AUTOINCREMENT" in sql.upper():
+            return
+        conn.exec_driver_sql("ALTER TABLE change_log RENAME TO change_log_old")
+        for (name,) in conn.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'change_log_old' AND sql IS NOT NULL"
+        ).fetchall():
+            conn.exec_driver_sql(f"DROP INDEX {name}")
+        ChangeLog.__table__.create(conn)
+        cols = ", ".join(c.name for c in ChangeLog.__table__.columns)
+        conn.exec_driver_sql(f"INSERT INTO change_log ({cols}) SELECT {cols} FROM change_log_old ORDER BY seq")
+        conn.exec_driver_sql("DROP TABLE change_log_old")
+        high = conn.exec_driver_sql(
+            "SELECT MAX(COALESCE((SELECT MAX(seq) FROM change_log), 0), COALESCE((SELECT MAX(sent_seq) FROM sync_state), 0))"
+        ).scalar()
+        conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = 'change_log'")
+        conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES ('change_log', ?)", (high,))
+
+def _backfill_name_keys(bind, batch_size=1000):
+    last_id = 0
+    while True:
+        with bind.begin() as conn:
+            rows = conn.execute(text(
+                "SELECT id, last_name, first_name, yomigana_last, yomigana_first, nickname FROM people "
+                "WHERE name_sort_key IS NULL AND id > :last_id ORDER BY id LIMIT :limit"
+            ), {"last_id": last_id, "limit": batch_size}).all()
+            if not rows:
+                break
+            conn.execute(text("UPDATE people SET name_sort_key = :s, name_search_key = :k WHERE id = :id"), [
+                dict(zip(("s", "k"), person_name_keys(*r[1:])), id=r[0]) for r in rows
+            ])
+            last_id = rows[-1][0]
+
+UUID_TABLES = ['people', 'profiling_questions', 'person_history', 'interactions', 'profiling_data', 'interaction_answers']
+
+def ensure_uuids(bind, batch_size: int=1000):
+    # Rows written without the ORM (older versions, bulk generators) have no uuid.
+    # Backfilled uuids hash the row's content, so two copies of the same file
+    # derive the same identities independently.
+    with bind.begin() as conn:
+        for table_name in UUID_TABLES:
+            last_id = 0
+            while True:
+                rows = conn.execute(text(
+                    f"SELECT * FROM {table_name} WHERE uuid IS NULL AND id > :last_id ORDER BY id LIMIT :limit"
+                ), {"last_id": last_id, "limit": batch_size}).mappings().all()
+                if not rows:
+                    break
+                conn.execute(text(f"UPDATE {table_name} SET uuid = :uuid WHERE id = :id"), [
+                    {"id": r["id"], "uuid": content_uuid(table_name, *(v for k, v in r.items() if k != "uuid"))}
+                    for r in rows
+                ])
+                last_id = rows[-1]["id"]
+        # A relationship is identified by its (unordered) pair of people
+        rows = conn.execute(text(
+            "SELECT r.id, a.uuid, b.uuid FROM relationships r "
+            "JOIN people a ON a.id = r.person_a_id JOIN people b ON b.id = r.person_b_id WHERE r.uuid IS NULL"
+        )).all()
+        if rows:
+            conn.execute(text("UPDATE relationships SET uuid = :uuid WHERE id = :id"), [
+                {"id": rid, "uuid": relationship_uuid(a, b)} for rid, a, b in rows
+            ])
+
+def relationship_uuid(person_a_uuid: str, person_b_uuid: str) -> str:
+    return content_uuid("relationships", *sorted([person_a_uuid, person_b_uuid]))
+
+INTERACTION_FTS_COLUMNS = ["content", "tags", "category", "user_feeling"]
+_fts_available = weakref.WeakKeyDictionary()
+
+def _ensure_interaction_fts(bind):
+    # Optional trigram FTS5 index over interactions (substring search works for Japanese).
+    # Older SQLite builds without fts5/trigram simply skip it.
+    cols = ", ".join(INTERACTION_FTS_COLUMNS)
+    new_cols = ", ".join(f"new.{c}" for c in INTERACTION_FTS_COLUMNS)
+    old_cols = ", ".join(f"old.{c}" for c in INTERACTION_FTS_COLUMNS)
+    try:
+        with bind.begin() as conn:
+            exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'interactions_fts'")).first()
+            if exists:
+                return
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE interactions_fts USING fts5({cols}, "
+                f"content='interactions', content_rowid='id', tokenize='trigram')"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER interactions_fts_ai AFTER INSERT ON interactions BEGIN "
+                f"INSERT INTO interactions_fts(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER interactions_fts_ad AFTER DELETE ON interactions BEGIN "
+                f"INSERT INTO interactions_fts(interactions_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER interactions_fts_au AFTER UPDATE ON interactions BEGIN "
+                f"INSERT INTO interactions_fts(interactions_fts, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+                f"INSERT INTO interactions_fts(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+            ))
+            conn.execute(text("INSERT INTO interactions_fts(interactions_fts) VALUES ('rebuild')"))
+    except OperationalError:
+        pass
+    _fts_available.pop(bind, None)
+
+def has_interaction_fts(bind) -> bool:
+    available = _fts_available.get(bind)
+    if available is None:
+        with bind.connect() as conn:
+            available = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'interactions_fts'")).first() is not None
+        _fts_available[bind] = available
+    return available
+
+def migrate_db(bind=None):
+    bind = bind or engine
+    _add_missing_columns(bind)
+    _ensure_change_log_autoincrement(bind)
+    _backfill_relationship_pairs(bind)
+    _backfill_question_stats(bind)
+    _backfill_date_keys(bind)
+    _backfill_name_keys(bind)
+    _ensure_interaction_fts(bind)
+    ensure_uuids(bind)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+def init_db(bind=None):
+    bind = bind or engine
+    Base.metadata.create_all(bind=bind)
+    migrate_db(bind)
+
+_initialized = weakref.WeakSet()
+_init_lock = threading.Lock()
+
+def init_db_once(bind=None) -> bool:
+    # create_all + migrations reflect the schema; do it once per engine per process.
+    # Returns True if this call did the work.
+    bind = bind or engine
+    with _init_lock:
+        if bind in _initialized:
+            return False
+        init_db(bind)
+        _initialized.add(bind)
+        return True
 
 def get_db():
     db = SessionLocal()
@@ -0,0 +1,101 @@
+import calendar
+import re
+import unicodedata
+from datetime import date
+from typing import Optional, Tuple
+
+# --- Fuzzy date strings -> sortable integer keys ---
+# Keys are YYYYMMDD integers. A fuzzy value covers a range, so parsing gives
+# (start_key, end_key, precision), e.g. "2020 Summer" -> (20200601, 20200831, "season").
+PRECISION_DAY = "day"
+PRECISION_MONTH = "month"
+PRECISION_SEASON = "season"
+PRECISION_YEAR = "year"
+PRECISION_PRESENT = "present"
+
+OPEN_END_KEY = 99991231
+
+SEASONS = {
+    "spring": (3, 5), "春": (3, 5),
+    "summer": (6, 8), "夏": (6, 8),
+    "autumn": (9, 11), "fall": (9, 11), "秋": (9, 11),
+    "winter": (12, 2), "冬": (12, 2),
+}
+PRESENT_WORDS = {"present", "now", "current", "現在", "今", "いま", "継続中"}
+
+_YMD = re.compile(r"^(\d{4})\s*[/\-.年]\s*(\d{1,2})\s*(?:[/\-.月]\s*(\d{1,2})\s*日?)?\s*月?$")
+_Y = re.compile(r"^(\d{4})\s*年?$")
+_SEASON = re.compile(r"^(?:(\d{4})\s*年?\s*(?:の)?\s*([a-z春夏秋冬]+)|([a-z春夏秋冬]+)\s*(\d{4})\s*年?)$")
+
+def date_key(y: int, m: int, d: int) -> int:
+    return y * 10000 + m * 100 + d
+
+def key_to_date(key: int) -> Optional[date]:
+    if key is None or key >= OPEN_END_KEY:
+        return None
+    return date(key // 10000, key // 100 % 100, key % 100)
+
+def _month_end(y: int, m: int) -> int:
+    return calendar.monthrange(y, m)[1]
+
+def _year_range(y: int) -> Tuple[int, int, str]:
+    return date_key(y, 1, 1), date_key(y, 12, 31), PRECISION_YEAR
+
+def _month_range(y: int, m: int) -> Tuple[int, int, str]:
+    return date_key(y, m, 1), date_key(y, m, _month_end(y, m)), PRECISION_MONTH
+
+def _season_range(y: int, season: str) -> Optional[Tuple[int, int, str]]:
+    months = SEASONS.get(season)
+    if not months:
+        return None
+    first, last = months
+    end_year = y + 1 if last < first else y
+    return date_key(y, first, 1), date_key(end_year, last, _month_end(end_year, last)), PRECISION_SEASON
+
+def parse_fuzzy_date(value: Optional[str]) -> Optional[Tuple[int, int, str]]:
+    # Returns (start_key, end_key, precision) or None if not understood
+    if not value:
+        return None
+    s = unicodedata.normalize("NFKC", str(value)).strip().lower()
+    if not s:
+        return None
+    if s in PRESENT_WORDS:
+        today = date.today()
+        return date_key(today.year, today.month, today.day), OPEN_END_KEY, PRECISION_PRESENT
+
+    m = _YMD.match(s)
+    if m:
+        y, mo, d = int(m.group(1)), int(m.group(2)), m.group(3)
+        d = int(d) if d else 0
+        # "2024/00/00" style: zero means unknown
+        if mo < 1 or mo > 12:
+            return _year_range(y)
+        if d < 1 or d > _month_end(y, mo):
+            return _month_range(y, mo)
+        k = date_key(y, mo, d)
+        return k, k, PRECISION_DAY
+
+    m = _Y.match(s)
+    if m:
+        return _year_range(int(m.group(1)))
+
+    m = _SEASON.match(s)
+    if m:
+        if m.group(1):
+            return _season_range(int(m.group(1)), m.group(2))
+        return _season_range(int(m.group(4)), m.group(3))
+
+    return None
+
+def period_keys(start: Optional[str], end: Optional[str]=None,
+                fallback: Optional[date]=None) -> Tuple[Optional[int], Optional[int], Optional[str]]:
+    # Keys for a "start 〜 end" period. The end defaults to the end of start's range.
+    start_parsed = parse_fuzzy_date(start)
+    if start_parsed is None and fallback is not None:
+        k = date_key(fallback.year, fallback.month, fallback.day)
+        start_parsed = (k, k, PRECISION_DAY)
+    if start_parsed is None:
+        return None, None, None
+    end_parsed = parse_fuzzy_date(end)
+    end_key = end_parsed[1] if end_parsed else start_parsed[1]
+    return start_parsed[0], max(end_key, start_parsed[0]), start_parsed[2]
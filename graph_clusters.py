@@ -0,0 +1,153 @@
+import random
+import threading
+import weakref
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from change_log import table_version
+from crud import get_people_summary, get_relationship_edges
+
+# --- Cluster-level relationship graph ---
+# The overview graph shows one node per cluster instead of one per person, and
+# one edge per pair of connected clusters whose weight is the number of
+# relationships between them. Clusters are either
+#   BY_TAG:       the person's first group tag (no tag -> UNGROUPED)
+#   BY_COMMUNITY: communities found by label propagation over relationships
+#                 ("混ぜるな危険" edges do not pull people together); people
+#                 without relationships share one UNGROUPED cluster
+# Only cluster ids, sizes and counts are kept in memory. Members of a cluster
+# the user expands are loaded with a query for just those people
+# (load_members), so the full graph is never built at once.
+BY_TAG = "tag"
+BY_COMMUNITY = "community"
+UNGROUPED = "_none"
+PROPAGATION_ROUNDS = 20
+PROPAGATION_SEED = 0
+
+@dataclass
+class Cluster:
+    key: str
+    label: str
+    members: List[int] = field(default_factory=list) # person ids
+    internal_edges: int = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.members)
+
+@dataclass
+class ClusterGraph:
+    by: str
+    clusters: Dict[str, Cluster]
+    assignment: Dict[int, str] # person id -> cluster key
+    edges: Dict[Tuple[str, str], Tuple[int, int]] # (key, key) sorted -> (relationships, caution ones)
+
+    def ordered(self) -> List[Cluster]:
+        # Largest first, ungrouped last
+        return sorted(self.clusters.values(), key=lambda c: (c.key == UNGROUPED, -c.size, c.label))
+
+def _first_tag(tags: Optional[str]) -> Optional[str]:
+    for tag in (tags or "").split(","):
+        if tag.strip():
+            return tag.strip()
+    return None
+
+def _label_propagation(ids: List[int], pairs: List[Tuple[int, int]]) -> Dict[int, int]:
+    # Each person repeatedly takes the most common label among their
+    # neighbours until nothing changes. People are visited in a shuffled but
+    # seeded order (id order lets the lowest ids flood everything), so the
+    # result is the same on every run. On a tie a person keeps
+    # their current label if it is among the best (otherwise the smallest),
+    # which stops one label from flooding weakly connected groups
+    neighbours = defaultdict(list)
+    for a, b in pairs:
+        neighbours[a].append(b)
+        neighbours[b].append(a)
+    label = {pid: pid for pid in ids}
+    order = sorted(ids)
+    random.Random(PROPAGATION_SEED).shuffle(order)
+    for _ in range(PROPAGATION_ROUNDS):
+        changed = False
+        for pid in order:
+            nbrs = neighbours.get(pid)
+            if not nbrs:
+                continue
+            counts = Counter(label[n] for n in nbrs)
+            top = max(counts.values())
+            if counts.get(label[pid]) == top:
+                continue
+            best = min(lab for lab, n in counts.items() if n == top)
+            if best != label[pid]:
+                label[pid] = best
+                changed = True
+        if not changed:
+            break
+    return label
+
+def _build(db: Session, by: str) -> ClusterGraph:
+    conn = db.connection()
+    people = conn.exec_driver_sql("SELECT id, last_name, first_name, tags FROM people ORDER BY id").fetchall()
+    rels = conn.exec_driver_sql("SELECT person_a_id, person_b_id, caution_flag FROM relationships").fetchall()
+    names = {pid: f"{last} {first}" for pid, last, first, _ in people}
+    rels = [(a, b, bool(c)) for a, b, c in rels if a in names and b in names and a != b]
+
+    if by == BY_TAG:
+        assignment = {pid: _first_tag(tags) or UNGROUPED for pid, _, _, tags in people}
+        labels = {key: key for key in set(assignment.values())}
+    else:
+        ids = [pid for pid, _, _, _ in people]
+        community = _label_propagation(ids, [(a, b) for a, b, caution in rels if not caution])
+        degree = Counter()
+        for a, b, _ in rels:
+            degree[a] += 1
+            degree[b] += 1
+        assignment = {pid: f"c{community[pid]}" if degree[pid] else UNGROUPED for pid in ids}
+        # A community is named after its best-connected member
+        hubs = {}
+        for pid in ids:
+            key = assignment[pid]
+            if key != UNGROUPED and (key not in hubs or degree[pid] > degree[hubs[key]]):
+                hubs[key] = pid
+        labels = {key: f"{names[pid]} 周辺" for key, pid in hubs.items()}
+    labels[UNGROUPED] = "未分類" if by == BY_TAG else "つながりなし"
+
+    clusters = {}
+    for pid, key in assignment.items():
+        clusters.setdefault(key, Cluster(key, labels[key])).members.append(pid)
+    edges = {}
+    for a, b, caution in rels:
+        ka, kb = assignment[a], assignment[b]
+        if ka == kb:
+            clusters[ka].internal_edges += 1
+            continue
+        pair = (ka, kb) if ka < kb else (kb, ka)
+        count, cautions = edges.get(pair, (0, 0))
+        edges[pair] = (count + 1, cautions + caution)
+    return ClusterGraph(by, clusters, assignment, edges)
+
+# Per engine and grouping: (version, ClusterGraph), validated on each call
+_graph_cache = weakref.WeakKeyDictionary()
+_cache_lock = threading.Lock()
+
+def get_cluster_graph(db: Session, by: str=BY_TAG) -> ClusterGraph:
+    bind = db.get_bind()
+    version = (table_version(db, "people"), table_version(db, "relationships"))
+    with _cache_lock:
+        entry = _graph_cache.get(bind, {}).get(by)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    graph = _build(db, by)
+    with _cache_lock:
+        _graph_cache.setdefault(bind, {})[by] = (version, graph)
+    return graph
+
+def load_members(db: Session, graph: ClusterGraph, keys: List[str]):
+    # People in the given clusters and every relationship touching them,
+    # queried for those ids only. Returns (people, edges).
+    ids = [pid for key in keys if key in graph.clusters for pid in graph.clusters[key].members]
+    if not ids:
+        return [], []
+    return get_people_summary(db, person_ids=ids), get_relationship_edges(db, person_ids=ids)
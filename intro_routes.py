@@ -0,0 +1,183 @@
+import heapq
+import threading
+import weakref
+from typing import List, Optional, Dict, Tuple, Set
+
+from sqlalchemy.orm import Session
+
+from change_log import table_version
+from database import Person, Relationship
+
+# --- 紹介ルート (introduction paths) ---
+# Edge cost by relationship quality. Lower is a better introduction.
+QUALITY_WEIGHTS = {
+    "良好": 1.0,
+    "普通": 2.0,
+    "複雑": 4.0,
+    "険悪": 8.0,
+}
+DEFAULT_WEIGHT = 2.0
+CAUTION_PENALTY = 20.0
+
+# Adjacency per engine: (version, {person_id: {other_id: (weight, caution_flag)}}).
+# Checked against table_version on every call, so writes from the API server,
+# sync or another process are seen too.
+_adjacency_cache = weakref.WeakKeyDictionary()
+_cache_lock = threading.Lock()
+
+def invalidate_route_cache(db: Optional[Session]=None):
+    # Drops the cached adjacency right away (crud calls it after its writes)
+    with _cache_lock:
+        if db is None:
+            _adjacency_cache.clear()
+        else:
+            _adjacency_cache.pop(db.get_bind(), None)
+
+def _build_adjacency(db: Session) -> Dict[int, Dict[int, Tuple[float, bool]]]:
+    adj = {}
+    rows = db.query(
+        Relationship.person_a_id, Relationship.person_b_id, Relationship.quality, Relationship.caution_flag
+    ).all()
+    for a, b, quality, caution in rows:
+        if a == b:
+            continue
+        w = QUALITY_WEIGHTS.get(quality, DEFAULT_WEIGHT)
+        caution = bool(caution)
+        # Keep the cheapest edge if a pair was stored twice
+        for u, v in ((a, b), (b, a)):
+            nbrs = adj.setdefault(u, {})
+            if v not in nbrs or w < nbrs[v][0]:
+                nbrs[v] = (w, caution)
+    return adj
+
+def get_adjacency(db: Session) -> Dict[int, Dict[int, Tuple[float, bool]]]:
+    bind = db.get_bind()
+    version = table_version(db, "relationships")
+    with _cache_lock:
+        entry = _adjacency_cache.get(bind)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    adj = _build_adjacency(db)
+    with _cache_lock:
+        _adjacency_cache[bind] = (version, adj)
+    return adj
+
+def _edge_cost(weight: float, caution: bool, exclude_caution: bool) -> Optional[float]:
+    if caution:
+        if exclude_caution:
+            return None
+        return weight + CAUTION_PENALTY
+    return weight
+
+def _bidirectional_dijkstra(adj, source: int, target: int, exclude_caution: bool,
+                            banned_nodes: Set[int]=frozenset(), banned_edges: Set[Tuple[int, int]]=frozenset()):
+    # Returns (cost, [node ids]) or None. The graph is undirected, so the
+    # backward search walks the same adjacency.
+    if source == target:
+        return 0.0, [source]
+    if source in banned_nodes or target in banned_nodes:
+        return None
+
+    dist = [{source: 0.0}, {target: 0.0}]
+    prev = [{source: None}, {target: None}]
+    done = [set(), set()]
+    heaps = [[(0.0, source)], [(0.0, target)]]
+    best = float("inf")
+    meet = None
+
+    while heaps[0] and heaps[1]:
+        if heaps[0][0][0] + heaps[1][0][0] >= best:
+            break
+        # Expand the side with the smaller frontier
+        side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+        d, u = heapq.heappop(heaps[side])
+        if u in done[side]:
+            continue
+        done[side].add(u)
+        for v, (w, caution) in adj.get(u, {}).items():
+            if v in banned_nodes:
+                continue
+            if (u, v) in banned_edges or (v, u) in banned_edges:
+                continue
+            cost = _edge_cost(w, caution, exclude_caution)
+            if cost is None:
+                continue
+            nd = d + cost
+            if nd < dist[side].get(v, float("inf")):
+                dist[side][v] = nd
+                prev[side][v] = u
+                heapq.heappush(heaps[side], (nd, v))
+            other = dist[1 - side].get(v)
+            if other is not None and nd + other < best:
+                best = nd + other
+                meet = v
+
+    if meet is None:
+        return None
+
+    path = []
+    node = meet
+    while node is not None:
+        path.append(node)
+        node = prev[0][node]
+    path.reverse()
+    node = prev[1][meet]
+    while node is not None:
+        path.append(node)
+        node = prev[1][node]
+    return best, path
+
+def _path_cost(adj, path: List[int], exclude_caution: bool) -> float:
+    total = 0.0
+    for u, v in zip(path, path[1:]):
+        w, caution = adj[u][v]
+        total += _edge_cost(w, caution, exclude_caution)
+    return total
+
+def find_routes(adj, source: int, target: int, k: int=3, exclude_caution: bool=True) -> List[Dict]:
+    # Yen's k-shortest loopless paths on top of bidirectional Dijkstra
+    first = _bidirectional_dijkstra(adj, source, target, exclude_caution)
+    if first is None:
+        return []
+
+    found = [first]
+    candidates = []
+    seen = {tuple(first[1])}
+
+    while len(found) < k:
+        last_path = found[-1][1]
+        for i in range(len(last_path) - 1):
+            spur = last_path[i]
+            root = last_path[:i + 1]
+
+            banned_edges = set()
+            for _, p in found:
+                if p[:i + 1] == root and len(p) > i + 1:
+                    banned_edges.add((p[i], p[i + 1]))
+            banned_nodes = set(root[:-1])
+
+            spur_result = _bidirectional_dijkstra(adj, spur, target, exclude_caution, banned_nodes, banned_edges)
+            if spur_result is None:
+                continue
+            full = root[:-1] + spur_result[1]
+            key = tuple(full)
+            if key in seen:
+                continue
+            seen.add(key)
+            heapq.heappush(candidates, (_path_cost(adj, full, exclude_caution), full))
+
+        if not candidates:
+            break
+        found.append(heapq.heappop(candidates))
+
+    return [{"cost": cost, "path": path, "edges": list(zip(path, path[1:]))} for cost, path in found]
+
+def find_introduction_routes(db: Session, target_id: int, k: int=3, exclude_caution: bool=True,
+                             source_id: Optional[int]=None) -> List[Dict]:
+    # Best chains of introductions from the is_self person (or source_id) to target_id
+    if source_id is None:
+        me = db.query(Person.id).filter(Person.is_self == True).first()
+        if me is None:
+            return []
+        source_id = me[0]
+    return find_routes(get_adjacency(db), source_id, target_id, k=k, exclude_caution=exclude_caution)
@@ -0,0 +1,151 @@
+import argparse
+import json
+import sys
+from datetime import date
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from database import DailyDigest, JobState, Person, init_db_once
+from name_index import get_name_index
+from scheduler import JOBS, Scheduler, get_job_states, register_job, run_job, start_background
+
+# --- Registered background jobs ---
+# Imported by app.py (in-process scheduler) and run as `python jobs.py worker`.
+#   daily_digest: upcoming birthdays and overdue contacts for today, written
+#                 to daily_digest so the people list reads rows instead of
+#                 checking every person on each rerun
+#   warm_caches:  rebuilds the per-engine caches (name index, cadence,
+#                 cluster graphs) after writes, before a page asks for them
+# contact_cadence and graph_clusters (NumPy/pandas) are imported inside the
+# jobs, so importing this module from app.py keeps a cold start light.
+BIRTHDAY_WINDOW_DAYS = 30
+DIGEST_OVERDUE_LIMIT = 50
+
+def _next_birthday(month: int, day: int, today: date) -> Optional[date]:
+    # Feb 29 birthdays fall on Feb 28 in other years
+    for year in (today.year, today.year + 1):
+        try:
+            candidate = date(year, month, day)
+        except ValueError:
+            if (month, day) != (2, 29):
+                return None
+            candidate = date(year, 2, 28)
+        if candidate >= today:
+            return candidate
+    return None
+
+def compute_digest(db: Session, today: Optional[date]=None) -> Dict:
+    today = today or date.today()
+    rows = []
+    people = db.query(Person.id, Person.birth_month, Person.birth_day, Person.birth_date).all()
+    for pid, month, day, legacy in people:
+        if not (month and day) and legacy:
+            month, day = legacy.month, legacy.day
+        if not (month and day):
+            continue
+        upcoming = _next_birthday(month, day, today)
+        if upcoming is None:
+            continue
+        days = (upcoming - today).days
+        if days <= BIRTHDAY_WINDOW_DAYS:
+            rows.append(DailyDigest(digest_date=today, kind="birthday", person_id=pid, days=days,
+                                    detail=f"{month}月{day}日"))
+    from contact_cadence import get_overdue_people
+    overdue = get_overdue_people(db, limit=DIGEST_OVERDUE_LIMIT, today=today)
+    for pid, r in overdue.iterrows():
+        rows.append(DailyDigest(digest_date=today, kind="overdue", person_id=int(pid), days=int(r["days_since"]),
+                                detail=f"目安 {r['expected_gap']:.0f}日"))
+
+    # Only the latest digest is kept
+    db.query(DailyDigest).delete()
+    db.add_all(rows)
+    db.commit()
+    return {"date": today.isoformat(), "birthdays": sum(r.kind == "birthday" for r in rows),
+            "overdue": sum(r.kind == "overdue" for r in rows)}
+
+@register_job("daily_digest", interval=600, on_change=("people", "interactions"))
+def daily_digest(db: Session):
+    # The interval picks up the date change at midnight
+    return compute_digest(db)
+
+@register_job("warm_caches", on_change=("people", "interactions", "relationships"))
+def warm_caches(db: Session):
+    from contact_cadence import get_cadence
+    from graph_clusters import BY_COMMUNITY, BY_TAG, get_cluster_graph
+    return {
+        "people": len(get_name_index(db).labels),
+        "cadence": len(get_cadence(db)),
+        "tag_clusters": len(get_cluster_graph(db, BY_TAG).clusters),
+        "communities": len(get_cluster_graph(db, BY_COMMUNITY).clusters),
+    }
+
+def start_jobs(bind):
+    # The in-process scheduler (scheduler.start_background) running the jobs
+    # registered above; importing from here is what registers them
+    return start_background(bind)
+
+def get_daily_digest(db: Session, today: Optional[date]=None) -> Optional[List[Dict]]:
+    # Today's digest rows with names, birthdays first; None while the job has
+    # not produced today's digest yet
+    today = today or date.today()
+    rows = (
+        db.query(DailyDigest, Person.last_name, Person.first_name)
+        .join(Person, Person.id == DailyDigest.person_id)
+        .filter(DailyDigest.digest_date == today)
+        .order_by(DailyDigest.kind, DailyDigest.days)
+        .all()
+    )
+    if not rows:
+        state = db.get(JobState, "daily_digest")
+        result = json.loads(state.last_result) if state and state.last_result else {}
+        if result.get("date") != today.isoformat():
+            return None
+    return [{"kind": d.kind, "person_id": d.person_id, "name": f"{last} {first}", "days": d.days, "detail": d.detail}
+            for d, last, first in rows]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Background jobs of the CRM")
+    parser.add_argument("--db", default="human_crm.db")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status")
+    run = sub.add_parser("run")
+    run.add_argument("names", nargs="*", help=f"Jobs to run (default: all of {', '.join(sorted(JOBS))})")
+    run.add_argument("--force", action="store_true", help="Run even if not due")
+    worker = sub.add_parser("worker")
+    worker.add_argument("--poll", type=float, default=None, help="Seconds between checks")
+    args = parser.parse_args(argv)
+    unknown = [name for name in getattr(args, "names", []) if name not in JOBS]
+    if unknown:
+        parser.error(f"unknown job: {', '.join(unknown)}")
+
+    bind = create_engine(f"sqlite:///{args.db}")
+    init_db_once(bind)
+    if args.command == "status":
+        with Session(bind) as db:
+            for s in get_job_states(db):
+                duration = f"{s.last_duration_ms:.0f} ms" if s.last_duration_ms is not None else "-"
+                print(f"{s.name:<16} {s.status:<8} {s.run_count:>5} runs  {s.fail_count:>4} failed  "
+                      f"{duration:>9}  {s.last_finished_at or '-'}  {s.last_error or ''}")
+    elif args.command == "run":
+        scheduler = Scheduler()
+        for name in args.names or sorted(JOBS):
+            summary = run_job(bind, JOBS[name], scheduler.owner, force=args.force)
+            if summary is None:
+                print(f"{name:<16} skipped (not due or running elsewhere)")
+            else:
+                print(f"{name:<16} {summary['status']:<8} {summary['duration_ms']:>9.1f} ms  "
+                      f"{summary.get('error') or json.dumps(summary['result'], ensure_ascii=False)}")
+    elif args.command == "worker":
+        scheduler = Scheduler(poll=args.poll) if args.poll else Scheduler()
+        scheduler.watch(bind)
+        print(f"Running jobs {', '.join(sorted(JOBS))} as {scheduler.owner} (Ctrl+C to stop)")
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
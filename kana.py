@@ -0,0 +1,100 @@
+import unicodedata
+from typing import List, Optional, Tuple
+
+# --- Kana-normalized name keys ---
+# Names are matched on a normalized form: NFKC (half-width katakana and
+# full-width ASCII fold to their usual forms), lower case, katakana -> hiragana,
+# no spaces or separators. Readings also get a Hepburn romaji form, so
+# "タナカ", "ﾀﾅｶ", "たなか" and "tanaka" all find the same person.
+_SEPARATORS = set(" \t　・･.,_-")
+
+_ROMAJI = {
+    "あ": "a", "い": "i", "う": "u", "え": "e", "お": "o",
+    "か": "ka", "き": "ki", "く": "ku", "け": "ke", "こ": "ko",
+    "さ": "sa", "し": "shi", "す": "su", "せ": "se", "そ": "so",
+    "た": "ta", "ち": "chi", "つ": "tsu", "て": "te", "と": "to",
+    "な": "na", "に": "ni", "ぬ": "nu", "ね": "ne", "の": "no",
+    "は": "ha", "ひ": "hi", "ふ": "fu", "へ": "he", "ほ": "ho",
+    "ま": "ma", "み": "mi", "む": "mu", "め": "me", "も": "mo",
+    "や": "ya", "ゆ": "yu", "よ": "yo",
+    "ら": "ra", "り": "ri", "る": "ru", "れ": "re", "ろ": "ro",
+    "わ": "wa", "ゐ": "i", "ゑ": "e", "を": "o", "ん": "n",
+    "が": "ga", "ぎ": "gi", "ぐ": "gu", "げ": "ge", "ご": "go",
+    "ざ": "za", "じ": "ji", "ず": "zu", "ぜ": "ze", "ぞ": "zo",
+    "だ": "da", "ぢ": "ji", "づ": "zu", "で": "de", "ど": "do",
+    "ば": "ba", "び": "bi", "ぶ": "bu", "べ": "be", "ぼ": "bo",
+    "ぱ": "pa", "ぴ": "pi", "ぷ": "pu", "ぺ": "pe", "ぽ": "po",
+    "ぁ": "a", "ぃ": "i", "ぅ": "u", "ぇ": "e", "ぉ": "o",
+    "ゃ": "ya", "ゅ": "yu", "ょ": "yo", "ゎ": "wa", "ゔ": "vu",
+}
+# Small ya/yu/yo after an i-row kana: きゃ -> kya, しゃ -> sha, ちゃ -> cha, じゃ -> ja
+_YOUON = {"ゃ": "a", "ゅ": "u", "ょ": "o"}
+
+def normalize_kana(text: Optional[str]) -> str:
+    if not text:
+        return ""
+    out = []
+    for ch in unicodedata.normalize("NFKC", text).lower():
+        if ch in _SEPARATORS:
+            continue
+        code = ord(ch)
+        if 0x30A1 <= code <= 0x30F6: # Katakana ァ..ヶ -> hiragana
+            ch = chr(code - 0x60)
+        out.append(ch)
+    return "".join(out)
+
+def is_kana(text: str) -> bool:
+    return bool(text) and all(ch in _ROMAJI or ch in "っー" for ch in text)
+
+def to_romaji(hiragana: str) -> str:
+    # Hepburn for normalized hiragana; anything else passes through
+    out = []
+    double_next = False
+    i = 0
+    while i < len(hiragana):
+        ch = hiragana[i]
+        if ch == "っ":
+            double_next = True
+            i += 1
+            continue
+        if ch == "ー":
+            i += 1
+            continue
+        roma = _ROMAJI.get(ch, ch)
+        nxt = hiragana[i + 1] if i + 1 < len(hiragana) else ""
+        if nxt in _YOUON and roma.endswith("i") and len(roma) > 1:
+            stem = roma[:-1]
+            roma = (stem if stem in ("sh", "ch", "j") else stem + "y") + _YOUON[nxt]
+            i += 1
+        if double_next:
+            roma = ("t" if roma.startswith("ch") else roma[0]) + roma
+            double_next = False
+        out.append(roma)
+        i += 1
+    return "".join(out)
+
+def _tokens(*parts: Optional[str]) -> List[str]:
+    tokens = []
+    for part in parts:
+        token = normalize_kana(part)
+        if token and token not in tokens:
+            tokens.append(token)
+    return tokens
+
+def person_name_keys(last_name: Optional[str], first_name: Optional[str], yomigana_last: Optional[str]=None,
+                     yomigana_first: Optional[str]=None, nickname: Optional[str]=None) -> Tuple[str, str]:
+    # Returns (sort_key, search_key). sort_key orders people by reading
+    # (gojuon order), falling back to the written name without a reading.
+    # search_key is the space-separated set of tokens a picker matches against.
+    reading_last = normalize_kana(yomigana_last) or normalize_kana(last_name)
+    reading_first = normalize_kana(yomigana_first) or normalize_kana(first_name)
+    sort_key = f"{reading_last} {reading_first}".strip()
+
+    tokens = _tokens(last_name, first_name, (last_name or "") + (first_name or ""),
+                     yomigana_last, yomigana_first, (yomigana_last or "") + (yomigana_first or ""), nickname)
+    for token in list(tokens):
+        if is_kana(token):
+            roma = to_romaji(token)
+            if roma not in tokens:
+                tokens.append(roma)
+    return sort_key, " ".join(tokens)
@@ -0,0 +1,118 @@
+import heapq
+import threading
+import weakref
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from change_log import table_version
+from kana import normalize_kana, person_name_keys
+
+# --- Name index for person pickers ---
+# An in-memory index over people's names, readings, nicknames and romaji,
+# built from the precomputed people.name_sort_key / name_search_key columns.
+# Everything is kept in reading order (name_sort_key), so "top k" simply means
+# the first k hits:
+#   prefix:    bisect into a sorted list of (token, rank)
+#   substring: str.find over one newline-joined string of every search key
+SEARCH_LIMIT = 20
+
+class NameIndex:
+    def __init__(self, rows: List[Tuple[int, str, str]]):
+        # rows: (person_id, label, search_key), already in reading order
+        self.ids = [r[0] for r in rows]
+        self.labels = {r[0]: r[1] for r in rows}
+        self._rank = {pid: rank for rank, pid in enumerate(self.ids)}
+        self._tokens = sorted(
+            (token, rank) for rank, r in enumerate(rows) for token in r[2].split(" ") if token
+        )
+        # Newline-separated per person, spaces between tokens, so a query
+        # (which never contains either) cannot match across two people or tokens
+        keys = [r[2] for r in rows]
+        self._blob = "\n".join(keys)
+        self._offsets = []
+        pos = 0
+        for key in keys:
+            self._offsets.append(pos)
+            pos += len(key) + 1
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, person_id) -> bool:
+        return person_id in self._rank
+
+    def label(self, person_id: int) -> str:
+        return self.labels.get(person_id, "?")
+
+    def first(self, limit: int=SEARCH_LIMIT) -> List[int]:
+        return self.ids[:limit]
+
+    def prefix(self, query: str, limit: int=SEARCH_LIMIT) -> List[int]:
+        q = normalize_kana(query)
+        if not q:
+            return []
+        # Every token starting with q sorts between q and q + U+FFFF
+        lo = bisect_left(self._tokens, (q,))
+        hi = bisect_left(self._tokens, (q + "\uffff",), lo)
+        ranks = heapq.nsmallest(limit, {rank for _, rank in self._tokens[lo:hi]})
+        return [self.ids[r] for r in ranks]
+
+    def substring(self, query: str, limit: int=SEARCH_LIMIT, skip: Optional[set]=None) -> List[int]:
+        q = normalize_kana(query)
+        if not q:
+            return []
+        found = []
+        pos = self._blob.find(q)
+        while pos != -1 and len(found) < limit:
+            rank = bisect_right(self._offsets, pos) - 1
+            pid = self.ids[rank]
+            if skip is None or pid not in skip:
+                found.append(pid)
+            # Continue after this person's key
+            nxt = self._offsets[rank + 1] if rank + 1 < len(self._offsets) else len(self._blob)
+            pos = self._blob.find(q, nxt)
+        return found
+
+    def search(self, query: str, limit: int=SEARCH_LIMIT) -> List[int]:
+        # Prefix hits first (a name or reading starts with the query), then
+        # names that merely contain it; each group in reading order
+        hits = self.prefix(query, limit)
+        if len(hits) < limit:
+            hits += self.substring(query, limit - len(hits), skip=set(hits))
+        return hits
+
+# Per engine: (version, NameIndex), validated with table_version on each call
+_index_cache = weakref.WeakKeyDictionary()
+_cache_lock = threading.Lock()
+
+def _build_index(db: Session) -> NameIndex:
+    rows = db.connection().exec_driver_sql(
+        "SELECT id, last_name, first_name, yomigana_last, yomigana_first, nickname, name_sort_key, name_search_key "
+        "FROM people"
+    ).fetchall()
+    entries = []
+    for pid, last, first, y_last, y_first, nickname, sort_key, search_key in rows:
+        if sort_key is None:
+            # Written without the ORM and not migrated yet
+            sort_key, search_key = person_name_keys(last, first, y_last, y_first, nickname)
+        entries.append((sort_key, pid, f"{last} {first}", search_key))
+    entries.sort()
+    return NameIndex([(pid, label, key) for _, pid, label, key in entries])
+
+def get_name_index(db: Session) -> NameIndex:
+    bind = db.get_bind()
+    version = table_version(db, "people")
+    with _cache_lock:
+        entry = _index_cache.get(bind)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    index = _build_index(db)
+    with _cache_lock:
+        _index_cache[bind] = (version, index)
+    return index
+
+def search_person_names(db: Session, query: str, limit: int=SEARCH_LIMIT) -> List[Dict]:
+    index = get_name_index(db)
+    return [{"id": pid, "name": index.label(pid)} for pid in index.search(query, limit)]
@@ -0,0 +1,205 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# --- Page-level Python profiling ---
+# HRCRM_PROFILE=1 (or ?profile=1): section wall/CPU timers only.
+# HRCRM_PROFILE=cprofile (or ?profile=cprofile): timers + cProfile + stack
+# sampling for a collapsed-stack (flame graph) export.
+MODE_OFF = ""
+MODE_TIMERS = "1"
+MODE_CPROFILE = "cprofile"
+
+SAMPLE_INTERVAL = 0.005
+
+_lock = threading.Lock()
+_local = threading.local()
+_sections = {} # name -> {"calls", "wall_ms", "cpu_ms", "max_wall_ms"}
+_stats = None # pstats.Stats accumulated across reruns
+_stacks = Counter() # "a;b;c" -> samples
+
+def resolve_mode(query_value: Optional[str]=None) -> str:
+    value = query_value or os.environ.get("HRCRM_PROFILE", "")
+    if value in (MODE_TIMERS, "true", "on"):
+        return MODE_TIMERS
+    if value == MODE_CPROFILE:
+        return MODE_CPROFILE
+    return MODE_OFF
+
+def is_enabled() -> bool:
+    return bool(getattr(_local, "mode", MODE_OFF))
+
+def _add_section(name: str, wall_ms: float, cpu_ms: float):
+    with _lock:
+        s = _sections.setdefault(name, {"calls": 0, "wall_ms": 0.0, "cpu_ms": 0.0, "max_wall_ms": 0.0})
+        s["calls"] += 1
+        s["wall_ms"] += wall_ms
+        s["cpu_ms"] += cpu_ms
+        s["max_wall_ms"] = max(s["max_wall_ms"], wall_ms)
+    rerun = getattr(_local, "rerun_sections", None)
+    if rerun is not None:
+        rerun[name] = rerun.get(name, 0.0) + wall_ms
+
+class SectionTimer:
+    # Started/stopped explicitly for regions that don't fit a with-block
+    def __init__(self, name: str):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.name = "/".join(stack + [name])
+        self.wall0 = time.perf_counter()
+        self.cpu0 = time.thread_time()
+        stack.append(name)
+
+    def stop(self):
+        wall_ms = (time.perf_counter() - self.wall0) * 1000
+        cpu_ms = (time.thread_time() - self.cpu0) * 1000
+        stack = _local.stack
+        if stack:
+            stack.pop()
+        _add_section(self.name, wall_ms, cpu_ms)
+
+def start_section(name: str) -> Optional[SectionTimer]:
+    if not is_enabled():
+        return None
+    return SectionTimer(name)
+
+def end_section(timer: Optional[SectionTimer]):
+    if timer is not None:
+        timer.stop()
+
+@contextmanager
+def section(name: str):
+    timer = start_section(name)
+    try:
+        yield
+    finally:
+        end_section(timer)
+
+class _StackSampler(threading.Thread):
+    def __init__(self, target_thread_id: int):
+        super().__init__(daemon=True)
+        self.target = target_thread_id
+        self.halt = threading.Event()
+        self.samples = Counter()
+
+    def run(self):
+        this_file = os.path.abspath(__file__)
+        while not self.halt.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.target)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                if os.path.abspath(code.co_filename) != this_file:
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.samples[";".join(reversed(names))] += 1
+
+def _discard_unfinished():
+    # st.rerun() aborts the script before finish_rerun; drop that partial run
+    profiler = getattr(_local, "profiler", None)
+    if profiler is not None:
+        profiler.disable()
+    sampler = getattr(_local, "sampler", None)
+    if sampler is not None:
+        sampler.halt.set()
+
+def in_rerun() -> bool:
+    # True between start_rerun and finish_rerun, i.e. during a full script
+    # run; a fragment rerun (st.fragment) executes outside of one
+    return getattr(_local, "in_rerun", False)
+
+def start_rerun(mode: str):
+    # Call at the top of the script; resets per-rerun state for this thread
+    _discard_unfinished()
+    _local.in_rerun = True
+    _local.mode = mode
+    _local.stack = []
+    _local.rerun_sections = {}
+    _local.profiler = None
+    _local.sampler = None
+    if mode == MODE_CPROFILE:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            _local.profiler = profiler
+        except ValueError:
+            # Another session's profiler is active (one per process on 3.12+)
+            pass
+        _local.sampler = _StackSampler(threading.get_ident())
+        _local.sampler.start()
+
+def finish_rerun() -> Optional[Dict]:
+    # Call at the end of the script; merges this rerun into the aggregates
+    global _stats
+    _local.in_rerun = False
+    if not is_enabled():
+        return None
+    profiler = getattr(_local, "profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        with _lock:
+            if _stats is None:
+                _stats = pstats.Stats(profiler)
+            else:
+                _stats.add(profiler)
+    sampler = getattr(_local, "sampler", None)
+    if sampler is not None:
+        sampler.halt.set()
+        sampler.join()
+        with _lock:
+            _stacks.update(sampler.samples)
+    result = {"kind": "profile", "mode": _local.mode, "sections": {k: round(v, 3) for k, v in _local.rerun_sections.items()}}
+    _local.mode = MODE_OFF
+    _local.profiler = None
+    _local.sampler = None
+    return result
+
+def section_totals() -> Dict[str, Dict]:
+    with _lock:
+        return {name: dict(s) for name, s in _sections.items()}
+
+def export_pstats() -> Optional[bytes]:
+    # Aggregated cProfile data in the binary format pstats/snakeviz read
+    with _lock:
+        if _stats is None:
+            return None
+        fd, path = tempfile.mkstemp(suffix=".pstats")
+        os.close(fd)
+        try:
+            _stats.dump_stats(path)
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.unlink(path)
+
+def export_collapsed_stacks() -> str:
+    # "frame;frame;frame count" lines, as consumed by flamegraph.pl / speedscope
+    with _lock:
+        return "\n".join(f"{stack} {count}" for stack, count in _stacks.most_common())
+
+def top_functions(limit: int=20) -> str:
+    with _lock:
+        if _stats is None:
+            return ""
+        out = io.StringIO()
+        stats = pstats.Stats(stream=out)
+        stats.add(_stats)
+        stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+def reset():
+    global _stats
+    with _lock:
+        _sections.clear()
+        _stacks.clear()
+        _stats = None
@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+import weakref
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Optional
+
+from sqlalchemy import event
+
+# --- Per-rerun SQL instrumentation ---
+# Cursor hooks count queries and time them into a recorder bound to the
+# current thread (Streamlit runs each session's script in its own thread).
+LOG_DIR = "logs"
+LOG_FILE = os.path.join(LOG_DIR, "perf.jsonl")
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+SLOWEST_KEEP = 5
+N_PLUS_ONE_THRESHOLD = 5 # Same statement shape this many times in one rerun
+
+_local = threading.local()
+_installed = weakref.WeakSet()
+_install_lock = threading.Lock()
+_logger = None
+
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_SPACES = re.compile(r"\s+")
+
+def statement_signature(statement: str) -> str:
+    # Shape of a statement with literals and IN-lists collapsed
+    sig = _STRING.sub("?", statement)
+    sig = _NUMBER.sub("?", sig)
+    sig = _IN_LIST.sub("(?...)", sig)
+    return _SPACES.sub(" ", sig).strip()
+
+class QueryRecorder:
+    def __init__(self, label: str=""):
+        self.label = label
+        self.started = time.perf_counter()
+        self.count = 0
+        self.total_ms = 0.0
+        self.by_signature = {} # signature -> [count, total_ms]
+        self.slowest = [] # [(ms, statement)]
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        sig = statement_signature(statement)
+        entry = self.by_signature.setdefault(sig, [0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed_ms
+        if len(self.slowest) < SLOWEST_KEEP or elapsed_ms > self.slowest[-1][0]:
+            self.slowest.append((elapsed_ms, _SPACES.sub(" ", statement).strip()))
+            self.slowest.sort(key=lambda x: -x[0])
+            del self.slowest[SLOWEST_KEEP:]
+
+    def summary(self) -> Dict:
+        repeated = [
+            {"signature": sig, "count": c, "total_ms": round(ms, 3)}
+            for sig, (c, ms) in self.by_signature.items() if c >= N_PLUS_ONE_THRESHOLD
+        ]
+        repeated.sort(key=lambda x: -x["count"])
+        return {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "kind": "sql",
+            "label": self.label,
+            "wall_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "query_count": self.count,
+            "sql_ms": round(self.total_ms, 3),
+            "distinct_statements": len(self.by_signature),
+            "slowest": [{"ms": round(ms, 3), "statement": stmt[:500]} for ms, stmt in self.slowest],
+            "n_plus_one": repeated,
+        }
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start")
+    if not starts:
+        return
+    elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+    recorder = getattr(_local, "recorder", None)
+    if recorder is not None:
+        recorder.record(statement, elapsed_ms)
+
+def install_query_hooks(bind):
+    # Idempotent: Streamlit reruns the script, but hooks go on once per engine
+    with _install_lock:
+        if bind in _installed:
+            return
+        event.listen(bind, "before_cursor_execute", _before_cursor_execute)
+        event.listen(bind, "after_cursor_execute", _after_cursor_execute)
+        _installed.add(bind)
+
+def start_recording(label: str="") -> QueryRecorder:
+    recorder = QueryRecorder(label)
+    _local.recorder = recorder
+    return recorder
+
+def current_recorder() -> Optional[QueryRecorder]:
+    return getattr(_local, "recorder", None)
+
+def stop_recording(log: bool=True) -> Optional[Dict]:
+    recorder = getattr(_local, "recorder", None)
+    _local.recorder = None
+    if recorder is None:
+        return None
+    summary = recorder.summary()
+    if log:
+        write_log(summary)
+    return summary
+
+def _get_logger():
+    global _logger
+    if _logger is None:
+        with _install_lock:
+            if _logger is None:
+                os.makedirs(LOG_DIR, exist_ok=True)
+                logger = logging.getLogger("hrcrm.perf")
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+                _logger = logger
+    return _logger
+
+def write_log(record: Dict):
+    # One JSON object per line in logs/perf.jsonl (rotated)
+    try:
+        _get_logger().info(json.dumps(record, ensure_ascii=False, default=str))
+    except OSError:
+        pass
@@ -0,0 +1,74 @@
+from datetime import date
+from typing import List, Dict, Optional
+
+from sqlalchemy.orm import Session
+from crud import get_all_questions, get_question_stats
+
+# --- Next-question recommendation ---
+# Scores approximate how much a new answer would tell us about the person.
+STALE_AFTER_DAYS = 365
+MAX_NUMERIC_STD = 2.5 # Answers are on a 0-5 scale
+
+REASON_UNANSWERED = "未回答"
+REASON_LOW_CONFIDENCE = "確信度低"
+REASON_STALE = "古い回答"
+REASON_CATEGORY_GAP = "カテゴリ未充足"
+
+def answer_confidence(stat) -> float:
+    # 0.0 (know nothing) .. 1.0 (many consistent answers)
+    count = stat.answer_count or 0
+    if count == 0:
+        return 0.0
+    if stat.numeric_count and stat.numeric_count > 1:
+        mean = stat.numeric_sum / stat.numeric_count
+        var = max(stat.numeric_sq_sum / stat.numeric_count - mean * mean, 0.0)
+        consistency = 1.0 - min(var ** 0.5 / MAX_NUMERIC_STD, 1.0)
+    else:
+        consistency = 1.0 - min((stat.value_changes or 0) / count, 1.0)
+    return (count / (count + 1.0)) * consistency
+
+def score_questions(questions, stats: Dict, today: Optional[date]=None) -> List[Dict]:
+    today = today or date.today()
+
+    cat_total = {}
+    cat_answered = {}
+    for q in questions:
+        cat_total[q.category] = cat_total.get(q.category, 0) + 1
+        if q.id in stats:
+            cat_answered[q.category] = cat_answered.get(q.category, 0) + 1
+
+    scored = []
+    for q in questions:
+        reasons = []
+        stat = stats.get(q.id)
+        if stat is None or not stat.answer_count:
+            score = 1.0
+            reasons.append(REASON_UNANSWERED)
+        else:
+            uncertainty = 1.0 - answer_confidence(stat)
+            staleness = 0.0
+            if stat.last_answered_on:
+                staleness = min((today - stat.last_answered_on).days / STALE_AFTER_DAYS, 1.0)
+            score = 0.6 * uncertainty + 0.3 * staleness
+            if uncertainty >= 0.5:
+                reasons.append(REASON_LOW_CONFIDENCE)
+            if staleness >= 1.0:
+                reasons.append(REASON_STALE)
+
+        gap = 1.0 - cat_answered.get(q.category, 0) / cat_total[q.category]
+        if gap > 0:
+            score += 0.4 * gap
+            if gap >= 0.5:
+                reasons.append(REASON_CATEGORY_GAP)
+
+        scored.append({"question": q, "score": score, "reasons": reasons})
+
+    scored.sort(key=lambda x: (-x["score"], x["question"].id))
+    return scored
+
+def recommend_questions(db: Session, person_id: int, k: int=5, questions=None) -> List[Dict]:
+    # Two indexed reads: the question list and this person's answer stats
+    if questions is None:
+        questions = get_all_questions(db)
+    stats = get_question_stats(db, person_id)
+    return score_questions(questions, stats)[:k]
@@ -0,0 +1,193 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+import weakref
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, bindparam, text
+from sqlalchemy.orm import Session
+
+from change_log import table_version
+from database import JobState
+from query_stats import write_log
+
+# --- Background jobs ---
+# Work that pages used to do inside a rerun (digests, cache builds) runs as
+# registered jobs on a background thread. A job is due when
+#   - it has never run,
+#   - interval seconds passed since its last run, or
+#   - one of its on_change tables changed (change_log.table_version) since
+#     the version recorded at its last run.
+# job_state holds each job's status, timings and a lease: a runner takes the
+# lease with one conditional UPDATE, so a job runs at most once at a time
+# across threads, Streamlit processes and `python jobs.py worker`. A runner
+# that dies leaves a lease that others take over once it expires.
+#
+#   @register_job("daily_digest", interval=3600, on_change=("people",))
+#   def daily_digest(db): ...; return {"rows": n} # JSON-able summary or None
+POLL_SECONDS = 5.0
+DEFAULT_LEASE_SECONDS = 600
+RETRY_SECONDS = 300 # A failed job waits this long before it is due again
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[[Session], Optional[Dict]]
+    interval: Optional[float] = None
+    on_change: Tuple[str, ...] = ()
+    lease: float = DEFAULT_LEASE_SECONDS
+
+JOBS: Dict[str, Job] = {}
+
+def register_job(name: str, interval: Optional[float]=None, on_change: Tuple[str, ...]=(),
+                 lease: float=DEFAULT_LEASE_SECONDS):
+    def decorate(func):
+        JOBS[name] = Job(name, func, interval, tuple(on_change), lease)
+        return func
+    return decorate
+
+def _watched_version(db: Session, job: Job) -> Optional[str]:
+    if not job.on_change:
+        return None
+    return json.dumps([table_version(db, table_name) for table_name in job.on_change])
+
+def is_due(state: JobState, job: Job, version: Optional[str], now: datetime) -> bool:
+    if state.last_finished_at is None:
+        return True
+    elapsed = (now - state.last_finished_at).total_seconds()
+    if state.status == "failed":
+        return elapsed >= RETRY_SECONDS
+    if job.on_change and version != state.last_version:
+        return True
+    return job.interval is not None and elapsed >= job.interval
+
+def _acquire(bind, name: str, owner: str, lease: float) -> bool:
+    now = time.time()
+    with bind.begin() as conn:
+        result = conn.execute(text(
+            "UPDATE job_state SET status = 'running', lease_owner = :owner, lease_expires_at = :expires, "
+            "last_started_at = :started WHERE name = :name AND (lease_owner IS NULL OR lease_expires_at < :now)"
+        ).bindparams(bindparam("started", type_=DateTime)), {"owner": owner, "expires": now + lease, "started": datetime.now(), "name": name, "now": now})
+        return result.rowcount == 1
+
+def _release(bind, name: str, owner: str, status: str, duration_ms: float, error: Optional[str],
+             result: Optional[Dict], version: Optional[str]):
+    with bind.begin() as conn:
+        conn.execute(text(
+            "UPDATE job_state SET status = :status, lease_owner = NULL, lease_expires_at = NULL, "
+            "last_finished_at = :finished, last_duration_ms = :ms, run_count = run_count + 1, "
+            "fail_count = fail_count + :failed, last_error = :error, last_result = :result, "
+            "last_version = CASE WHEN :failed THEN last_version ELSE :version END "
+            "WHERE name = :name AND lease_owner = :owner"
+        ).bindparams(bindparam("finished", type_=DateTime)), {"status": status, "finished": datetime.now(), "ms": duration_ms, "failed": int(status == "failed"),
+            "error": error, "result": json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+            "version": version, "name": name, "owner": owner})
+
+def run_job(bind, job: Job, owner: str, force: bool=False) -> Optional[Dict]:
+    # Runs job if it is due (or force) and nobody else holds it. Returns a
+    # summary of the run, or None when it was skipped.
+    with Session(bind) as db:
+        db.execute(text("INSERT OR IGNORE INTO job_state (name, status, run_count, fail_count) VALUES (:name, 'idle', 0, 0)"),
+                   {"name": job.name})
+        db.commit()
+        state = db.get(JobState, job.name)
+        # Taken before the run, so changes made while it runs trigger another
+        version = _watched_version(db, job)
+        due = force or is_due(state, job, version, datetime.now())
+    if not due or not _acquire(bind, job.name, owner, job.lease):
+        return None
+
+    t0 = time.perf_counter()
+    result, error = None, None
+    try:
+        with Session(bind, autoflush=False) as db:
+            result = job.func(db)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    duration_ms = (time.perf_counter() - t0) * 1000
+    status = "failed" if error else "ok"
+    _release(bind, job.name, owner, status, duration_ms, error, result, version)
+    summary = {"kind": "job", "job": job.name, "status": status, "duration_ms": round(duration_ms, 3)}
+    if error:
+        summary["error"] = error
+    write_log(summary)
+    return {**summary, "result": result}
+
+def get_job_states(db: Session) -> List[JobState]:
+    return db.query(JobState).order_by(JobState.name).all()
+
+class Scheduler:
+    def __init__(self, jobs: Optional[Dict[str, Job]]=None, poll: float=POLL_SECONDS, owner: Optional[str]=None):
+        self.jobs = jobs # None: whatever is registered in JOBS at run time
+        self.poll = poll
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._binds = weakref.WeakSet()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def watch(self, bind):
+        # Databases to run jobs against (the main DB, each opened shard)
+        self._binds.add(bind)
+        self._wake.set()
+
+    def run_pending(self) -> List[Dict]:
+        ran = []
+        jobs = self.jobs if self.jobs is not None else JOBS
+        for bind in list(self._binds):
+            for job in list(jobs.values()):
+                if self._stop.is_set():
+                    return ran
+                try:
+                    summary = run_job(bind, job, self.owner)
+                except Exception as e:
+                    # e.g. a shard engine closed under us; try again next poll
+                    write_log({"kind": "job", "job": job.name, "status": "error", "error": f"{type(e).__name__}: {e}"})
+                    continue
+                if summary:
+                    ran.append(summary)
+        return ran
+
+    def notify(self):
+        # Check for due jobs now instead of at the next poll
+        self._wake.set()
+
+    def run_forever(self):
+        # Polls until stop(); start() runs this on a daemon thread
+        while not self._stop.is_set():
+            self.run_pending()
+            self._wake.wait(self.poll)
+            self._wake.clear()
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run_forever, name="hrcrm-jobs", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float]=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def start_background(bind) -> Optional[Scheduler]:
+    # The in-process scheduler, started on first use; HRCRM_SCHEDULER=0 turns
+    # it off (e.g. when a separate `python jobs.py worker` runs the jobs)
+    global _scheduler
+    if os.environ.get("HRCRM_SCHEDULER", "1") == "0":
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler()
+            _scheduler.start()
+        _scheduler.watch(bind)
+        return _scheduler
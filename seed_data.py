@@ -1,7 +1,257 @@
+import argparse
 import random
+import time
 from datetime import date, timedelta
-from database import init_db, get_db, Person, Interaction, ProfilingQuestion
-from crud import create_person, create_interaction, create_relationship, create_person_history
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.orm import sessionmaker
+from database import (
+    init_db, get_db, engine as default_engine, rebuild_question_stats,
+    Person, PersonHistory, Interaction, InteractionAnswer, Relationship, ProfilingQuestion
+)
+from change_log import bump_generation
+from crud import seed_questions
+from fuzzy_date import period_keys
+from kana import person_name_keys
+
+# Data lists
+last_names = ["佐藤", "鈴木", "高橋", "田中", "渡辺", "伊藤", "山本", "中村", "小林", "加藤"]
+first_names_m = ["翔太", "蓮", "大翔", "陽翔", "陸", "湊", "悠真", "樹", "陽太", "大和"]
+first_names_f = ["陽葵", "凛", "結菜", "芽依", "詩", "結衣", "陽菜", "美月", "咲良", "莉子"]
+
+# Fake Kana map (simplified)
+kana_map = {
+    "佐藤": "さとう", "鈴木": "すずき", "高橋": "たかはし", "田中": "たなか", "渡辺": "わたなべ",
+    "伊藤": "いとう", "山本": "やまもと", "中村": "なかむら", "小林": "こばやし", "加藤": "かとう",
+    "翔太": "しょうた", "蓮": "れん", "大翔": "ひろと", "陽翔": "はると", "陸": "りく",
+    "湊": "みなと", "悠真": "ゆうま", "樹": "いつき", "陽太": "ひなた", "大和": "やまと",
+    "陽葵": "ひまり", "凛": "りん", "結菜": "ゆいな", "芽依": "めい", "詩": "うた",
+    "結衣": "ゆい", "陽菜": "ひな", "美月": "みづき", "咲良": "さくら", "莉子": "りこ"
+}
+
+groups = ["会社", "高校", "大学", "趣味", "家族", "イベント"]
+statuses = ["友人", "同僚", "親友", "知人", "要レビュー"]
+categories = ["会話", "食事", "イベント", "観察", "連絡"]
+channels = ["対面 (In Person)", "通話 (Call/Remote)", "メッセージ (Text)", "観測 (Passive)"]
+contents = [
+    "最近の様子について話した。元気そうだった。",
+    "仕事の愚痴を聞いた。転職を考えているらしい。",
+    "ランチに行った。辛いものが好き。",
+    "共通の友人の結婚式で会った。",
+    "誕生日のメッセージを送った。",
+    "週末の予定について連絡した。",
+]
+qualities = ["良好"] * 6 + ["普通"] * 3 + ["複雑", "険悪"]
+rel_types = ["友人", "同僚", "先輩・後輩", "上司・部下", "ライバル", "夫婦・パートナー"]
+fuzzy_periods = ["2023/00/00", "2024年春", "2022 Summer", "2021/04", "2024/01/15"]
+
+# Extra questions so answer distributions span several categories
+extra_questions = [
+    ("Big5", "人と話すと元気になりますか？", "numeric", "Extraversion"),
+    ("Big5", "他人の気持ちに敏感ですか？", "numeric", "Agreeableness"),
+    ("Big5", "心配事が多いですか？", "numeric", "Neuroticism"),
+    ("MBTI", "計画を立ててから動きますか？", "numeric", "J/P"),
+    ("MBTI", "決断は論理と感情どちらで？", "numeric", "T/F"),
+    ("価値観", "お金と時間どちらを優先？", "numeric", "Value"),
+    ("個人情報", "出身地", "text", "Hometown"),
+    ("個人情報", "好きな食べ物", "text", "Food"),
+]
+
+BATCH_SIZE = 10000
+
+def _insert_batches(conn, table, rows_iter):
+    batch = []
+    count = 0
+    for row in rows_iter:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            conn.execute(table.insert(), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        conn.execute(table.insert(), batch)
+        count += len(batch)
+    return count
+
+def _people_rows(rng, n_people, first_id, with_self=True):
+    today = date.today()
+    for idx in range(n_people):
+        pid = first_id + idx
+        is_self = with_self and idx == 0
+        is_male = rng.random() < 0.5
+        ln = rng.choice(last_names)
+        fn = rng.choice(first_names_m if is_male else first_names_f)
+        b_year = rng.randint(1960, 2005)
+        b_month = rng.randint(1, 12)
+        b_day = rng.randint(1, 28)
+        met = today - timedelta(days=rng.randint(30, 365 * 20))
+        row = {
+            "id": pid,
+            "last_name": ln,
+            "first_name": fn,
+            "yomigana_last": kana_map.get(ln, ""),
+            "yomigana_first": kana_map.get(fn, ""),
+            "nickname": f"{fn}くん" if is_male else f"{fn}ちゃん",
+            "birth_date": date(b_year, b_month, b_day),
+            "birth_year": b_year,
+            "birth_month": b_month,
+            "birth_day": b_day,
+            "gender": "男性" if is_male else "女性",
+            "blood_type": rng.choice(["A", "B", "O", "AB"]),
+            "status": "自分" if is_self else rng.choice(statuses),
+            "first_met_date": None if is_self else met,
+            "first_met_year": None if is_self else met.year,
+            "first_met_month": None if is_self else met.month,
+            "first_met_day": None if is_self else met.day,
+            "notes": f"ダミーデータ {pid}。" + "".join(rng.choice(contents) for _ in range(4)),
+            "strategy": rng.choice(contents),
+            "tags": ", ".join(rng.sample(groups, rng.choice([1, 1, 1, 2]))),
+            "is_self": is_self,
+            "prediction_notes": "MBTI: " + rng.choice(["INFP", "ENTJ", "ISTJ", "ESFP"]) + "?",
+        }
+        row["name_sort_key"], row["name_search_key"] = person_name_keys(
+            ln, fn, row["yomigana_last"], row["yomigana_first"], row["nickname"]
+        )
+        yield row
+
+def _history_rows(rng, person_ids):
+    for pid in person_ids:
+        grad = rng.randint(1980, 2024)
+        for date_str, content in ((f"{grad}/04", "大学卒業"), (f"{grad} Summer", f"{rng.choice(groups)}に参加")):
+            start_key, end_key, precision = period_keys(date_str)
+            yield {"person_id": pid, "date_str": date_str, "content": content,
+                   "start_key": start_key, "end_key": end_key, "date_precision": precision}
+
+def _interaction_counts(rng, person_ids, per_person):
+    # Heavy-tailed: a few close contacts have many entries, most have a handful
+    weights = [rng.paretovariate(1.5) for _ in person_ids]
+    total_weight = sum(weights) or 1.0
+    total = int(per_person * len(person_ids))
+    return {pid: int(round(total * w / total_weight)) for pid, w in zip(person_ids, weights)}
+
+def _interaction_rows(rng, counts, first_id):
+    today = date.today()
+    iid = first_id
+    for pid, n in counts.items():
+        for _ in range(n):
+            # Recent entries are more common
+            entry = today - timedelta(days=int(rng.expovariate(1 / 400.0)) % (365 * 10))
+            start_str = rng.choice(fuzzy_periods) if rng.random() < 0.1 else None
+            end_str = "Present" if start_str and rng.random() < 0.3 else None
+            start_key, end_key, precision = period_keys(start_str, end_str, fallback=entry)
+            yield {
+                "id": iid,
+                "person_id": pid,
+                "entry_date": entry,
+                "start_date_str": start_str,
+                "end_date_str": end_str,
+                "start_key": start_key,
+                "end_key": end_key,
+                "date_precision": precision,
+                "category": rng.choice(categories),
+                "channel": rng.choice(channels),
+                "tags": rng.choice(["日常", "仕事", "趣味", ""]),
+                "content": rng.choice(contents),
+                "user_feeling": rng.choice(["楽しかった", "疲れた", "普通", None]),
+            }
+            iid += 1
+
+def _answer_rows(rng, interaction_people, questions, answer_rate):
+    # Each person has a latent trait level per numeric question; answers scatter around it
+    numeric_levels = ["0", "1", "3", "5"]
+    latent = {}
+    for iid, pid in interaction_people:
+        if rng.random() >= answer_rate:
+            continue
+        for q in rng.sample(questions, min(len(questions), rng.randint(1, 3))):
+            q_id, q_type, q_opts = q
+            if q_type in ("numeric", "scale"):
+                base = latent.setdefault((pid, q_id), rng.randrange(4))
+                idx = min(3, max(0, base + rng.choice([-1, 0, 0, 0, 1])))
+                value = numeric_levels[idx]
+            elif q_type == "selection" and q_opts:
+                value = rng.choice([o.strip() for o in q_opts.split(",")])
+            else:
+                value = rng.choice(["東京", "大阪", "ラーメン", "寿司", "未確認"])
+            yield {"interaction_id": iid, "question_id": q_id, "answer_value": value}
+
+def _relationship_rows(rng, person_ids, edges_per_person):
+    # Barabasi-Albert preferential attachment gives a power-law degree distribution
+    m = max(1, edges_per_person)
+    targets_pool = list(person_ids[:m])
+    seen = set()
+    for pid in person_ids[m:]:
+        chosen = set()
+        while len(chosen) < min(m, len(targets_pool)):
+            chosen.add(rng.choice(targets_pool))
+        for other in chosen:
+            key = (min(pid, other), max(pid, other))
+            if key in seen:
+                continue
+            seen.add(key)
+            yield {
+                "person_a_id": pid,
+                "person_b_id": other,
+                "pair_min_id": key[0],
+                "pair_max_id": key[1],
+                "relation_type": rng.choice(rel_types),
+                "quality": rng.choice(qualities),
+                "position_a_to_b": None,
+                "position_b_to_a": None,
+                "caution_flag": rng.random() < 0.03,
+            }
+            targets_pool.extend([pid, other])
+
+def generate_data(bind, n_people: int, interactions_per_person: float=100, edges_per_person: int=3,
+                  answer_rate: float=0.3, seed: int=42, verbose: bool=True):
+    # Bulk-generate a synthetic CRM. Rows go in with executemany batches,
+    # one transaction per table, bypassing the ORM.
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    init_db(bind)
+
+    Session = sessionmaker(bind=bind)
+    db = Session()
+    seed_questions(db)
+    if db.query(ProfilingQuestion).count() < 10:
+        for cat, q_text, q_type, trait in extra_questions:
+            db.add(ProfilingQuestion(category=cat, question_text=q_text, judgment_criteria="", answer_type=q_type, target_trait=trait))
+        db.commit()
+    questions = [(q.id, q.answer_type, q.options) for q in db.query(ProfilingQuestion).all()]
+    first_person_id = (db.query(func.max(Person.id)).scalar() or 0) + 1
+    first_interaction_id = (db.query(func.max(Interaction.id)).scalar() or 0) + 1
+    has_self = db.query(Person.id).filter(Person.is_self == True).first() is not None
+    db.close()
+
+    person_ids = list(range(first_person_id, first_person_id + n_people))
+    counts = {}
+
+    with bind.begin() as conn:
+        n = _insert_batches(conn, Person.__table__, _people_rows(rng, n_people, first_person_id, with_self=not has_self))
+        if verbose: print(f"people: {n}")
+    with bind.begin() as conn:
+        n = _insert_batches(conn, PersonHistory.__table__, _history_rows(rng, person_ids))
+        if verbose: print(f"history: {n}")
+    with bind.begin() as conn:
+        # The self person is not logged against
+        counts = _interaction_counts(rng, person_ids[1:] or person_ids, interactions_per_person)
+        n = _insert_batches(conn, Interaction.__table__, _interaction_rows(rng, counts, first_interaction_id))
+        if verbose: print(f"interactions: {n}")
+    with bind.begin() as conn:
+        interaction_people = ((first_interaction_id + offset, pid) for offset, pid in
+                              enumerate(pid for pid, c in counts.items() for _ in range(c)))
+        n = _insert_batches(conn, InteractionAnswer.__table__, _answer_rows(rng, interaction_people, questions, answer_rate))
+        if verbose: print(f"answers: {n}")
+    with bind.begin() as conn:
+        n = _insert_batches(conn, Relationship.__table__, _relationship_rows(rng, person_ids, edges_per_person))
+        if verbose: print(f"relationships: {n}")
+
+    rebuild_question_stats(bind)
+    with bind.begin() as conn:
+        # The rows above skip change_log; move data_version on anyway
+        bump_generation(conn)
+        conn.execute(text("ANALYZE"))
+    if verbose:
+        print(f"generated in {time.perf_counter() - started:.1f}s")
 
 def seed_data():
     init_db()
@@ -13,115 +263,23 @@ def seed_data():
         return
 
     print("Seeding data...")
-
-    # Data lists
-    last_names = ["佐藤", "鈴木", "高橋", "田中", "渡辺", "伊藤", "山本", "中村", "小林", "加藤"]
-    first_names_m = ["翔太", "蓮", "大翔", "陽翔", "陸", "湊", "悠真", "樹", "陽太", "大和"]
-    first_names_f = ["陽葵", "凛", "結菜", "芽依", "詩", "結衣", "陽菜", "美月", "咲良", "莉子"]
-
-    # Fake Kana map (simplified)
-    kana_map = {
-        "佐藤": "さとう", "鈴木": "すずき", "高橋": "たかはし", "田中": "たなか", "渡辺": "わたなべ",
-        "伊藤": "いとう", "山本": "やまもと", "中村": "なかむら", "小林": "こばやし", "加藤": "かとう",
-        "翔太": "しょうた", "蓮": "れん", "大翔": "ひろと", "陽翔": "はると", "陸": "りく",
-        "湊": "みなと", "悠真": "ゆうま", "樹": "いつき", "陽太": "ひなた", "大和": "やまと",
-        "陽葵": "ひまり", "凛": "りん", "結菜": "ゆいな", "芽依": "めい", "詩": "うた",
-        "結衣": "ゆい", "陽菜": "ひな", "美月": "みづき", "咲良": "さくら", "莉子": "りこ"
-    }
-
-    groups = ["会社", "高校", "大学", "趣味", "家族", "イベント"]
-    statuses = ["友人", "同僚", "親友", "知人", "要レビュー"]
-
-    people_objs = []
-
-    # Create Myself
-    myself = create_person(
-        db,
-        last_name="山田",
-        first_name="太郎",
-        yomigana_last="やまだ",
-        yomigana_first="たろう",
-        nickname="自分",
-        birth_date=date(1990, 1, 1),
-        gender="男性",
-        blood_type="A",
-        status="自分",
-        first_met_date=None,
-        notes="これは自分です。",
-        tags="家族",
-        is_self=True,
-        prediction_notes="内向的だが好奇心旺盛"
-    )
-    people_objs.append(myself)
-
-    # Create Others
-    for i in range(20):
-        is_male = random.choice([True, False])
-        ln = random.choice(last_names)
-        fn = random.choice(first_names_m) if is_male else random.choice(first_names_f)
-
-        y_ln = kana_map.get(ln, "")
-        y_fn = kana_map.get(fn, "")
-
-        b_year = random.randint(1980, 2000)
-        b_month = random.randint(1, 12)
-        b_day = random.randint(1, 28)
-
-        p = create_person(
-            db,
-            last_name=ln,
-            first_name=fn,
-            yomigana_last=y_ln,
-            yomigana_first=y_fn,
-            nickname=f"{fn}ちゃん" if not is_male else f"{fn}くん",
-            birth_date=date(b_year, b_month, b_day),
-            gender="男性" if is_male else "女性",
-            blood_type=random.choice(["A", "B", "O", "AB"]),
-            status=random.choice(statuses),
-            first_met_date=date(2023, random.randint(1, 12), random.randint(1, 28)),
-            notes=f"ダミーデータ {i}",
-            tags=random.choice(groups),
-            prediction_notes="MBTI: INFP?"
-        )
-        people_objs.append(p)
-
-        # Add History
-        create_person_history(db, p.id, f"{b_year + 22}/04", "大学卒業")
-        create_person_history(db, p.id, f"{b_year + 22}/05", f"{random.choice(groups)}に参加")
-
-    # Create Interactions
-    categories = ["会話", "食事", "イベント", "連絡"]
-    for i in range(30):
-        p = random.choice(people_objs)
-        if p.is_self: continue
-
-        create_interaction(
-            db,
-            person_id=p.id,
-            category=random.choice(categories),
-            content=f"最近の様子について話した。元気そうだった。",
-            tags="日常",
-            user_feeling="楽しかった",
-            entry_date=date(2024, random.randint(1, 5), random.randint(1, 28)),
-            channel="対面"
-        )
-
-    # Create Relationships
-    for i in range(10):
-        p1 = random.choice(people_objs)
-        p2 = random.choice(people_objs)
-        if p1.id == p2.id: continue
-
-        create_relationship(
-            db,
-            person_a=p1.id,
-            person_b=p2.id,
-            rel_type="友人",
-            quality="良好",
-            caution_flag=False
-        )
-
+    # Myself + 20 others with ~30 interactions, like the original demo set
+    generate_data(default_engine, 21, interactions_per_person=1.5, edges_per_person=1, answer_rate=0.0,
+                  seed=random.randrange(1 << 30), verbose=False)
     print("Seeding complete.")
 
 if __name__ == "__main__":
-    seed_data()
+    parser = argparse.ArgumentParser(description="Seed the CRM database with synthetic data")
+    parser.add_argument("--scale", type=int, help="Number of people to generate (e.g. 100, 100000)")
+    parser.add_argument("--interactions-per-person", type=float, default=100)
+    parser.add_argument("--edges-per-person", type=int, default=3)
+    parser.add_argument("--answer-rate", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", help="SQLAlchemy URL (default: the app database)")
+    args = parser.parse_args()
+
+    if args.scale is None:
+        seed_data()
+    else:
+        bind = create_engine(args.db) if args.db else default_engine
+        generate_data(bind, args.scale, args.interactions_per_person, args.edges_per_person, args.answer_rate, args.seed)
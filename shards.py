@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import zipfile
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine, select, func
+from sqlalchemy.orm import Session, sessionmaker
+
+from database import Base, Person, Interaction, Relationship, ProfilingQuestion, init_db
+
+# --- Per-account SQLite shards ---
+# Each account gets its own database file, account/<account_id>/human_crm.db,
+# so a heavy account never locks or bloats another. Engines are handed out by
+# a ShardRouter that keeps a bounded LRU of open engines and migrates each
+# shard's schema the first time it is opened in this process.
+#
+# Account ids must start with a letter: numeric account/<id>/ folders are the
+# legacy per-person avatar folders of the single-database layout.
+SHARD_ROOT = "account"
+SHARD_DB_NAME = "human_crm.db"
+MAX_OPEN_ENGINES = 16
+EXPORT_SKIP_TABLES = {"change_log", "sync_state", "sync_meta", "job_state", "daily_digest"} # Bookkeeping or recomputed, not account data
+
+_ACCOUNT_ID = re.compile(r"^[A-Za-z][A-Za-z0-9_-]{0,63}$")
+
+def validate_account_id(account_id: str) -> str:
+    if not isinstance(account_id, str) or not _ACCOUNT_ID.match(account_id):
+        raise ValueError(f"invalid account id: {account_id!r} (letters, digits, '_' or '-', starting with a letter)")
+    return account_id
+
+def person_media_dir(account_id: Optional[str], person_id: int, root: str=SHARD_ROOT) -> str:
+    # Where a person's avatar images live. Without an account this is the
+    # legacy account/<person_id>/icon_imag layout.
+    if account_id is None:
+        return os.path.join(root, str(person_id), "icon_imag")
+    return os.path.join(root, validate_account_id(account_id), "people", str(person_id), "icon_imag")
+
+class ShardRouter:
+    def __init__(self, root: str=SHARD_ROOT, max_open: int=MAX_OPEN_ENGINES,
+                 on_open: Optional[Callable]=None):
+        # on_open(account_id, engine) runs after a shard's engine is created
+        # (e.g. to install query hooks or seed questions)
+        self.root = root
+        self.max_open = max_open
+        self.on_open = on_open
+        self._engines = OrderedDict() # account_id -> Engine, least recently used first
+        self._sessionmakers = {}
+        self._migrated = set() # db paths migrated in this process
+        self._lock = threading.RLock()
+
+    def db_path(self, account_id: str) -> str:
+        return os.path.join(self.root, validate_account_id(account_id), SHARD_DB_NAME)
+
+    def exists(self, account_id: str) -> bool:
+        return os.path.exists(self.db_path(account_id))
+
+    def accounts(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if _ACCOUNT_ID.match(name) and os.path.exists(os.path.join(self.root, name, SHARD_DB_NAME))
+        )
+
+    def engine(self, account_id: str, create: bool=True):
+        path = self.db_path(account_id)
+        with self._lock:
+            bind = self._engines.get(account_id)
+            if bind is not None:
+                self._engines.move_to_end(account_id)
+                return bind
+            if not create and not os.path.exists(path):
+                raise KeyError(f"no such account: {account_id}")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            bind = create_engine(f"sqlite:///{path}")
+            if path not in self._migrated:
+                init_db(bind)
+                self._migrated.add(path)
+            self._engines[account_id] = bind
+            self._sessionmakers[account_id] = sessionmaker(autocommit=False, autoflush=False, bind=bind)
+            while len(self._engines) > self.max_open:
+                old_id, old_engine = self._engines.popitem(last=False)
+                self._sessionmakers.pop(old_id, None)
+                # Checked-out connections stay valid and are closed when returned
+                old_engine.dispose()
+        if self.on_open is not None:
+            self.on_open(account_id, bind)
+        return bind
+
+    def session(self, account_id: str, create: bool=True) -> Session:
+        bind = self.engine(account_id, create=create)
+        with self._lock:
+            maker = self._sessionmakers.get(account_id)
+        if maker is None:
+            # Evicted between the two calls by another thread
+            maker = sessionmaker(autocommit=False, autoflush=False, bind=bind)
+        return maker()
+
+    def open_accounts(self) -> List[str]:
+        with self._lock:
+            return list(self._engines)
+
+    def dispose_all(self):
+        with self._lock:
+            for bind in self._engines.values():
+                bind.dispose()
+            self._engines.clear()
+            self._sessionmakers.clear()
+
+# --- Cross-shard admin tools ---
+def _readonly_engine(path: str):
+    # Admin scans use short-lived read-only engines instead of the router, so
+    # walking every shard does not evict the engines of active accounts.
+    return create_engine(f"sqlite:///file:{os.path.abspath(path)}?mode=ro&uri=true")
+
+def shard_stats(router: ShardRouter, account_ids: Optional[List[str]]=None) -> Dict:
+    counted = {"people": Person, "interactions": Interaction, "relationships": Relationship, "questions": ProfilingQuestion}
+    shards = []
+    for account_id in account_ids or router.accounts():
+        path = router.db_path(account_id)
+        row = {"account": account_id, "size_bytes": os.path.getsize(path)}
+        bind = _readonly_engine(path)
+        try:
+            with bind.connect() as conn:
+                for name, model in counted.items():
+                    row[name] = conn.execute(select(func.count()).select_from(model.__table__)).scalar()
+        finally:
+            bind.dispose()
+        shards.append(row)
+    totals = {key: sum(s[key] for s in shards) for key in ["size_bytes"] + list(counted)}
+    totals["accounts"] = len(shards)
+    return {"shards": shards, "totals": totals}
+
+def _json_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def export_shards(router: ShardRouter, out_path: str, account_ids: Optional[List[str]]=None) -> Dict[str, int]:
+    # Zip of <account>/<table>.jsonl, one JSON object per row. Returns rows per account.
+    exported = {}
+    with zipfile.ZipFile(out_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for account_id in account_ids or router.accounts():
+            bind = _readonly_engine(router.db_path(account_id))
+            total = 0
+            try:
+                with bind.connect() as conn:
+                    for table in Base.metadata.sorted_tables:
+                        if table.name in EXPORT_SKIP_TABLES:
+                            continue
+                        with zf.open(f"{account_id}/{table.name}.jsonl", "w") as f:
+                            result = conn.execute(select(table).order_by(*table.primary_key.columns))
+                            for row in result.mappings():
+                                line = json.dumps({k: _json_value(v) for k, v in row.items()}, ensure_ascii=False)
+                                f.write(line.encode("utf-8") + b"\n")
+                                total += 1
+            finally:
+                bind.dispose()
+            exported[account_id] = total
+    return exported
+
+def migrate_all(router: ShardRouter) -> List[str]:
+    # Eager alternative to lazy migration, e.g. right after a deploy
+    done = []
+    for account_id in router.accounts():
+        router.engine(account_id, create=False)
+        done.append(account_id)
+    router.dispose_all()
+    return done
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Admin tools for per-account database shards")
+    parser.add_argument("--root", default=SHARD_ROOT)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list")
+    stats = sub.add_parser("stats")
+    stats.add_argument("--json", action="store_true")
+    export = sub.add_parser("export")
+    export.add_argument("output", help="Zip file to write")
+    export.add_argument("--accounts", nargs="+", default=None)
+    sub.add_parser("migrate")
+    args = parser.parse_args(argv)
+
+    router = ShardRouter(args.root)
+    if args.command == "list":
+        for account_id in router.accounts():
+            print(account_id)
+    elif args.command == "stats":
+        result = shard_stats(router)
+        if args.json:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        else:
+            for s in result["shards"] + [dict(result["totals"], account="(total)")]:
+                print(f"{s['account']:<24} {s['size_bytes'] / 1024:>10.1f} KB  people {s['people']:>7}  "
+                      f"interactions {s['interactions']:>9}  relationships {s['relationships']:>8}")
+    elif args.command == "export":
+        for account_id, rows in export_shards(router, args.output, args.accounts).items():
+            print(f"{account_id}: {rows} rows")
+    elif args.command == "migrate":
+        for account_id in migrate_all(router):
+            print(f"migrated {account_id}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, select, bindparam
+
+from database import (
+    Base, ChangeLog, SyncState, SyncMeta, init_db_once, ensure_uuids, log_changes,
+    new_uuid, rebuild_question_stats
+)
+from change_log import high_water_seq
+from intro_routes import invalidate_route_cache
+
+# --- Two-instance sync ---
+# Rows are matched across databases by their uuid, never by id. Each side sends
+# the rows its change_log says changed since the last sync with that peer (the
+# whole table the first time). When both sides changed the same row, the later
+# change wins (last-writer-wins on change_log.changed_at, ties broken by
+# instance id) and the pair is reported as a conflict. Rows written by sync
+# are logged with origin=<peer> so they are not echoed back.
+#
+# Usage: python sync.py /mnt/share/human_crm.db [--db sqlite:///human_crm.db] [--dry-run]
+
+# Parents before children; foreign keys travel as the parent's uuid
+SYNC_TABLES = [
+    ("people", {}),
+    ("profiling_questions", {}),
+    ("person_history", {"person_id": "people"}),
+    ("interactions", {"person_id": "people"}),
+    ("profiling_data", {"person_id": "people"}),
+    ("relationships", {"person_a_id": "people", "person_b_id": "people"}),
+    ("interaction_answers", {"interaction_id": "interactions", "question_id": "profiling_questions"}),
+]
+_FKS = dict(SYNC_TABLES)
+_ORDER = {name: i for i, (name, _) in enumerate(SYNC_TABLES)}
+LOCAL_ONLY_COLUMNS = {"id", "uuid", "pair_min_id", "pair_max_id"}
+BATCH_SIZE = 500
+EPOCH = datetime(1970, 1, 1)
+
+class Change:
+    __slots__ = ("table", "uuid", "op", "changed_at", "row")
+
+    def __init__(self, table: str, uuid: str, op: str, changed_at: datetime, row: Optional[Dict]=None):
+        self.table = table
+        self.uuid = uuid
+        self.op = op # "upsert" or "delete"
+        self.changed_at = changed_at
+        self.row = row # Column values with foreign keys as uuids; None for deletes
+
+def _table(name: str):
+    return Base.metadata.tables[name]
+
+def _chunks(items: List, size: int=BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def instance_id(conn) -> str:
+    value = conn.execute(select(SyncMeta.value).where(SyncMeta.key == "instance_id")).scalar()
+    if value is None:
+        value = new_uuid()
+        conn.execute(SyncMeta.__table__.insert(), {"key": "instance_id", "value": value})
+    return value
+
+def _reset_instance_id(conn) -> str:
+    # A copied database file carries the original's id; give the copy its own
+    value = new_uuid()
+    conn.execute(SyncMeta.__table__.update().where(SyncMeta.key == "instance_id"), {"value": value})
+    return value
+
+def _uuid_map(conn, table_name: str, column, values) -> Dict:
+    # {column value: (id, uuid)} for the given ids or uuids, in batches
+    table = _table(table_name)
+    out = {}
+    for chunk in _chunks(list(values)):
+        for row_id, row_uuid in conn.execute(select(table.c.id, table.c.uuid).where(table.c[column].in_(chunk))):
+            out[row_id if column == "id" else row_uuid] = (row_id, row_uuid)
+    return out
+
+def _read_rows(conn, table_name: str, ids: List[int], changed_at: Dict[int, datetime]) -> List[Change]:
+    # Current state of the given rows as portable Changes
+    table = _table(table_name)
+    fks = _FKS[table_name]
+    rows = []
+    for chunk in _chunks(ids):
+        rows.extend(conn.execute(select(table).where(table.c.id.in_(chunk))).mappings().all())
+    parent_uuids = {}
+    for col, parent in fks.items():
+        parent_uuids[col] = _uuid_map(conn, parent, "id", {r[col] for r in rows if r[col] is not None})
+    changes = []
+    for r in rows:
+        payload = {k: v for k, v in r.items() if k not in LOCAL_ONLY_COLUMNS}
+        for col in fks:
+            parent = parent_uuids[col].get(r[col])
+            payload[col] = parent[1] if parent else None
+        changes.append(Change(table_name, r["uuid"], "upsert", changed_at.get(r["id"], EPOCH), payload))
+    return changes
+
+def collect_changes(conn, peer_id: str) -> Tuple[Dict[Tuple[str, str], Change], int]:
+    # Returns ({(table, uuid): Change}, high_seq) for everything not yet sent to peer_id
+    # The high-water mark, not MAX(seq): compaction may have removed the
+    # newest rows, and the cursor must not move back onto seq numbers
+    # that were already sent
+    high = high_water_seq(conn)
+    since = conn.execute(select(SyncState.sent_seq).where(SyncState.peer_id == peer_id)).scalar()
+    if since is not None:
+        high = max(high, since)
+    log = ChangeLog.__table__
+    not_echo = (log.c.origin == None) | (log.c.origin != peer_id)
+    changes = {}
+
+    if since is None:
+        # First contact: every row, stamped with its latest logged change
+        for table_name, _ in SYNC_TABLES:
+            stamps = dict(conn.execute(
+                select(log.c.row_id, log.c.changed_at).where(log.c.table_name == table_name)
+                .order_by(log.c.seq)
+            ).all())
+            ids = conn.execute(select(_table(table_name).c.id)).scalars().all()
+            for c in _read_rows(conn, table_name, ids, stamps):
+                changes[(c.table, c.uuid)] = c
+        tombstones = conn.execute(
+            select(log.c.table_name, log.c.row_uuid, log.c.changed_at)
+            .where(log.c.op == "delete", log.c.row_uuid != None, log.c.seq <= high, not_echo)
+        ).all()
+        for table_name, row_uuid, changed_at in tombstones:
+            if (table_name, row_uuid) not in changes:
+                changes[(table_name, row_uuid)] = Change(table_name, row_uuid, "delete", changed_at)
+        return changes, high
+
+    # Latest entry per row since the last sync
+    latest = {}
+    entries = conn.execute(
+        select(log.c.table_name, log.c.row_id, log.c.op, log.c.row_uuid, log.c.changed_at)
+        .where(log.c.seq > since, log.c.seq <= high, not_echo).order_by(log.c.seq)
+    ).all()
+    for table_name, row_id, op, row_uuid, changed_at in entries:
+        if table_name in _FKS:
+            latest[(table_name, row_id)] = (op, row_uuid, changed_at)
+    by_table = {}
+    for (table_name, row_id), (op, row_uuid, changed_at) in latest.items():
+        if op == "delete":
+            if row_uuid is not None:
+                changes[(table_name, row_uuid)] = Change(table_name, row_uuid, "delete", changed_at)
+        else:
+            by_table.setdefault(table_name, {})[row_id] = changed_at
+    for table_name, stamps in by_table.items():
+        for c in _read_rows(conn, table_name, list(stamps), stamps):
+            changes[(c.table, c.uuid)] = c
+    return changes, high
+
+def apply_changes(conn, changes: List[Change], origin: str) -> Dict:
+    # Upserts parents first, deletes children first; everything is logged with origin
+    # stats_people: local person ids whose answer stats need rebuilding
+    applied = {"upserted": 0, "deleted": 0, "skipped": [], "tables": set(), "stats_people": set()}
+    upserts = [c for c in changes if c.op == "upsert"]
+    deletes = [c for c in changes if c.op == "delete"]
+
+    for table_name, _ in SYNC_TABLES:
+        batch = [c for c in upserts if c.table == table_name]
+        if not batch:
+            continue
+        table = _table(table_name)
+        fks = _FKS[table_name]
+        parents = {col: _uuid_map(conn, parent, "uuid", {c.row[col] for c in batch if c.row[col]})
+                   for col, parent in fks.items()}
+        existing = _uuid_map(conn, table_name, "uuid", [c.uuid for c in batch])
+        inserts, updates = [], []
+        for c in batch:
+            values = dict(c.row, uuid=c.uuid)
+            missing = False
+            for col in fks:
+                if c.row[col] is None:
+                    continue
+                parent = parents[col].get(c.row[col])
+                if parent is None:
+                    missing = True
+                    break
+                values[col] = parent[0]
+            if missing:
+                # Parent was deleted on this side
+                applied["skipped"].append({"table": table_name, "uuid": c.uuid, "reason": "missing parent"})
+                continue
+            if table_name == "relationships":
+                values["pair_min_id"] = min(values["person_a_id"], values["person_b_id"])
+                values["pair_max_id"] = max(values["person_a_id"], values["person_b_id"])
+            if c.uuid in existing:
+                values["_id"] = existing[c.uuid][0]
+                updates.append(values)
+            else:
+                inserts.append(values)
+        entries = []
+        if updates:
+            columns = [k for k in updates[0] if k != "_id"]
+            stmt = table.update().where(table.c.id == bindparam("_id")).values({k: bindparam(k) for k in columns})
+            conn.execute(stmt, updates)
+            entries.extend((table_name, v["_id"], "update", v["uuid"]) for v in updates)
+        for chunk in _chunks(inserts):
+            rows = conn.execute(table.insert().returning(table.c.id, table.c.uuid, sort_by_parameter_order=True), chunk).all()
+            entries.extend((table_name, row_id, "insert", row_uuid) for row_id, row_uuid in rows)
+        log_changes(conn, entries, origin=origin)
+        if table_name == "interactions":
+            applied["stats_people"].update(v["person_id"] for v in updates + inserts)
+        elif table_name == "interaction_answers":
+            applied["stats_people"].update(_answer_people(conn, {v["interaction_id"] for v in updates + inserts}))
+        applied["upserted"] += len(entries)
+        if entries:
+            applied["tables"].add(table_name)
+
+    for table_name, _ in reversed(SYNC_TABLES):
+        uuids = [c.uuid for c in deletes if c.table == table_name]
+        table = _table(table_name)
+        for chunk in _chunks(uuids):
+            if table_name == "interaction_answers":
+                ids = conn.execute(select(table.c.interaction_id).where(table.c.uuid.in_(chunk))).scalars().all()
+                applied["stats_people"].update(_answer_people(conn, set(ids)))
+            elif table_name == "interactions":
+                applied["stats_people"].update(
+                    conn.execute(select(table.c.person_id).where(table.c.uuid.in_(chunk))).scalars().all()
+                )
+            rows = conn.execute(table.delete().where(table.c.uuid.in_(chunk)).returning(table.c.id, table.c.uuid)).all()
+            log_changes(conn, [(table_name, row_id, "delete", row_uuid) for row_id, row_uuid in rows], origin=origin)
+            applied["deleted"] += len(rows)
+            if rows:
+                applied["tables"].add(table_name)
+    return applied
+
+def _answer_people(conn, interaction_ids) -> set:
+    interactions = _table("interactions")
+    people = set()
+    for chunk in _chunks(list(interaction_ids)):
+        people.update(conn.execute(select(interactions.c.person_id).where(interactions.c.id.in_(chunk))).scalars().all())
+    return people
+
+def _same(a: Change, b: Change) -> bool:
+    return a.op == b.op and a.row == b.row
+
+def _save_state(conn, peer_id: str, sent_seq: int):
+    table = SyncState.__table__
+    values = {"sent_seq": sent_seq, "last_synced_at": datetime.now()}
+    if conn.execute(table.update().where(table.c.peer_id == peer_id), values).rowcount == 0:
+        conn.execute(table.insert(), dict(values, peer_id=peer_id))
+
+def _refresh_derived(bind, applied: Dict):
+    # Answer stats and the route cache are derived from synced tables
+    if "profiling_questions" in applied["tables"]:
+        rebuild_question_stats(bind)
+    elif applied["stats_people"]:
+        rebuild_question_stats(bind, person_ids=applied["stats_people"])
+    if applied["tables"] & {"relationships", "people"}:
+        invalidate_route_cache()
+
+def sync(local_bind, remote_bind, dry_run: bool=False) -> Dict:
+    t0 = time.perf_counter()
+    for bind in (local_bind, remote_bind):
+        init_db_once(bind)
+        ensure_uuids(bind)
+
+    with local_bind.begin() as lc, remote_bind.begin() as rc:
+        local_id, remote_id = instance_id(lc), instance_id(rc)
+        if local_id == remote_id:
+            remote_id = _reset_instance_id(rc)
+    with local_bind.connect() as lc, remote_bind.connect() as rc:
+        local_changes, local_high = collect_changes(lc, remote_id)
+        remote_changes, remote_high = collect_changes(rc, local_id)
+
+    to_remote, to_local, conflicts = [], [], []
+    for key in local_changes.keys() | remote_changes.keys():
+        mine, theirs = local_changes.get(key), remote_changes.get(key)
+        if mine and theirs:
+            if _same(mine, theirs):
+                continue
+            local_wins = (mine.changed_at, local_id) > (theirs.changed_at, remote_id)
+            conflicts.append({
+                "table": key[0], "uuid": key[1], "winner": "local" if local_wins else "remote",
+                "local": {"op": mine.op, "changed_at": mine.changed_at}, "remote": {"op": theirs.op, "changed_at": theirs.changed_at},
+            })
+            (to_remote if local_wins else to_local).append(mine if local_wins else theirs)
+        elif mine:
+            to_remote.append(mine)
+        else:
+            to_local.append(theirs)
+
+    report = {
+        "local_id": local_id, "remote_id": remote_id, "dry_run": dry_run,
+        "to_local": len(to_local), "to_remote": len(to_remote), "conflicts": conflicts, "skipped": [],
+    }
+    if not dry_run:
+        # Each side's cursor only moves once the other side has committed its rows,
+        # so an interrupted sync just resends (upserts are idempotent).
+        with local_bind.begin() as lc:
+            applied_local = apply_changes(lc, to_local, origin=remote_id)
+        with remote_bind.begin() as rc:
+            applied_remote = apply_changes(rc, to_remote, origin=local_id)
+            _save_state(rc, local_id, remote_high)
+        with local_bind.begin() as lc:
+            _save_state(lc, remote_id, local_high)
+        _refresh_derived(local_bind, applied_local)
+        _refresh_derived(remote_bind, applied_remote)
+        report["skipped"] = applied_local["skipped"] + applied_remote["skipped"]
+        report["applied_local"] = applied_local["upserted"] + applied_local["deleted"]
+        report["applied_remote"] = applied_remote["upserted"] + applied_remote["deleted"]
+    report["duration_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+    return report
+
+def _url(value: str) -> str:
+    return value if "://" in value else f"sqlite:///{value}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync this CRM database with another copy")
+    parser.add_argument("other", help="Path or SQLAlchemy URL of the other database")
+    parser.add_argument("--db", default="human_crm.db", help="This side (default: human_crm.db)")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would change without writing")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    report = sync(create_engine(_url(args.db)), create_engine(_url(args.other)), dry_run=args.dry_run)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+        return 0
+    print(f"{'(dry run) ' if args.dry_run else ''}sent {report['to_remote']}, received {report['to_local']} "
+          f"in {report['duration_ms']:.0f} ms")
+    for c in report["conflicts"]:
+        print(f"  conflict {c['table']} {c['uuid']}: local {c['local']['op']} @ {c['local']['changed_at']}, "
+              f"remote {c['remote']['op']} @ {c['remote']['changed_at']} -> {c['winner']} wins")
+    for s in report["skipped"]:
+        print(f"  skipped {s['table']} {s['uuid']}: {s['reason']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
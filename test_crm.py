@@ -1,12 +1,19 @@
 import unittest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from database import Base, Person, Interaction, Relationship, ProfilingQuestion
+from sqlalchemy import text
+from database import Base, Person, Interaction, Relationship, ProfilingQuestion, InteractionAnswer, PersonHistory, init_db, migrate_db, rebuild_question_stats
 from crud import (
     create_person, create_interaction, create_relationship, create_question,
-    get_people, get_interactions_by_person, get_relationships_for_person, get_all_questions
+    get_people, get_interactions_by_person, get_relationships_for_person, get_all_questions,
+    upsert_relationships_bulk, get_all_relationships, create_person_history, delete_person, delete_people_bulk,
+    get_question_stats, get_question_answer_counts, get_person_history, get_person_history_in_period,
+    get_interactions_in_period, get_interaction_timeline, update_person, get_person, save_person, delete_question
 )
-from datetime import date
+from intro_routes import find_introduction_routes, find_routes
+from question_recommender import recommend_questions
+from fuzzy_date import parse_fuzzy_date, OPEN_END_KEY
+from datetime import date, timedelta
 
 class TestCRM(unittest.TestCase):
     def setUp(self):
@@ -52,5 +59,1041 @@ class TestCRM(unittest.TestCase):
         self.assertEqual(len(qs), 1)
         self.assertEqual(qs[0].options, "Option1,Option2")
 
+    def test_create_relationship_reverse_pair_updates_same_row(self):
+        p1 = create_person(self.db, "A", "A", None, None, None, None, None, None, "F", None, None)
+        p2 = create_person(self.db, "B", "B", None, None, None, None, None, None, "F", None, None)
+
+        r1 = create_relationship(self.db, p1.id, p2.id, "上司・部下", "良好", "上司", "部下")
+        r2 = create_relationship(self.db, p2.id, p1.id, "上司・部下", "普通", "部下", "上司")
+
+        self.assertEqual(r1.id, r2.id)
+        self.assertEqual(len(get_all_relationships(self.db)), 1)
+        # Stored orientation is kept, positions are flipped into it
+        self.assertEqual(r2.person_a_id, p1.id)
+        self.assertEqual(r2.position_a_to_b, "上司")
+        self.assertEqual(r2.position_b_to_a, "部下")
+        self.assertEqual(r2.quality, "普通")
+        # The stable pair id is set on write, not left for ensure_uuids
+        from database import relationship_uuid
+        self.assertEqual(r2.uuid, relationship_uuid(p1.uuid, p2.uuid))
+
+    def test_upsert_relationships_bulk(self):
+        ids = [create_person(self.db, f"P{i}", "X", None, None, None, None, None, None, "F", None, None).id for i in range(5)]
+        edges = [{"person_a": a, "person_b": b, "rel_type": "友人", "quality": "良好"} for a in ids for b in ids if a != b]
+        upsert_relationships_bulk(self.db, edges)
+        self.assertEqual(len(get_all_relationships(self.db)), 10)
+        self.assertTrue(all(r.uuid for r in get_all_relationships(self.db)))
+
+    def test_init_db_deduplicates_legacy_pairs(self):
+        engine = create_engine('sqlite:///:memory:')
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE relationships (id INTEGER PRIMARY KEY, person_a_id INTEGER NOT NULL, person_b_id INTEGER NOT NULL, "
+                              "relation_type VARCHAR, quality VARCHAR, position_a_to_b VARCHAR, position_b_to_a VARCHAR, caution_flag BOOLEAN)"))
+            conn.execute(text("INSERT INTO relationships (person_a_id, person_b_id, relation_type) VALUES (1, 2, 'x'), (2, 1, 'y'), (3, 1, 'z')"))
+        init_db(engine)
+        with engine.connect() as conn:
+            rows = conn.execute(text("SELECT pair_min_id, pair_max_id, relation_type FROM relationships ORDER BY id")).all()
+        self.assertEqual([tuple(r) for r in rows], [(1, 2, 'x'), (1, 3, 'z')])
+
+    def test_delete_people_bulk_removes_dependents(self):
+        q = create_question(self.db, "Info", "Q", "", "text")
+        people = [create_person(self.db, f"P{i}", "X", None, None, None, None, None, None, "F", None, None) for i in range(3)]
+        for p in people:
+            create_interaction(self.db, p.id, "Meal", "Lunch", "", "", date.today(), answers=[{"question_id": q.id, "answer_value": "a"}])
+            create_person_history(self.db, p.id, "2020/04", "入社")
+        create_relationship(self.db, people[0].id, people[2].id, "友人", "良好")
+        create_relationship(self.db, people[1].id, people[2].id, "友人", "良好")
+
+        self.assertEqual(delete_people_bulk(self.db, [people[0].id, people[1].id]), 2)
+        self.assertEqual(self.db.query(Person).count(), 1)
+        self.assertEqual(self.db.query(Interaction).count(), 1)
+        self.assertEqual(self.db.query(InteractionAnswer).count(), 1)
+        self.assertEqual(self.db.query(PersonHistory).count(), 1)
+        self.assertEqual(self.db.query(Relationship).count(), 0)
+
+    def test_save_person_is_one_transaction(self):
+        import os, tempfile
+        from sqlalchemy import event
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        media = lambda pid: os.path.join(tmp.name, str(pid))
+        commits = []
+        event.listen(self.db, "after_commit", lambda session: commits.append(1))
+
+        p = save_person(self.db, {"last_name": "山田", "first_name": "花子", "status": "F"},
+                        history=[{"date_str": "2020/04", "content": "入社"}], avatar=b"img", avatar_dir=media)
+        self.assertEqual(len(commits), 1)
+        self.assertEqual(p.avatar_path, os.path.join(media(p.id), "icon.png"))
+        with open(p.avatar_path, "rb") as f:
+            self.assertEqual(f.read(), b"img")
+        self.assertEqual([h.content for h in get_person_history(self.db, p.id)], ["入社"])
+
+        # A failure after the avatar is staged leaves neither a row nor a file
+        with self.assertRaises(KeyError):
+            save_person(self.db, {"last_name": "佐藤", "first_name": "一郎", "status": "F"},
+                        history=[{"date_str": "2021"}], avatar=b"img", avatar_dir=media)
+        self.assertEqual(self.db.query(Person).count(), 1)
+        self.assertEqual(self.db.query(PersonHistory).count(), 1)
+        files = [os.path.join(d, f) for d, _, names in os.walk(tmp.name) for f in names]
+        self.assertEqual(files, [p.avatar_path])
+
+        q = create_question(self.db, "Info", "Q", "", "text")
+        commits.clear()
+        create_interaction(self.db, p.id, "会話", "", "", "", date(2024, 1, 1), answers=[{"question_id": q.id, "answer_value": "3"}])
+        self.assertEqual(len(commits), 1)
+        self.assertEqual(get_question_stats(self.db, p.id)[q.id].answer_count, 1)
+
+    def test_database_cascade_on_delete(self):
+        p = create_person(self.db, "A", "A", None, None, None, None, None, None, "F", None, None)
+        create_interaction(self.db, p.id, "Meal", "Lunch", "", "", date.today())
+        # Raw delete relies on ON DELETE CASCADE with foreign_keys=ON
+        self.db.execute(text("DELETE FROM people WHERE id = :id"), {"id": p.id})
+        self.db.commit()
+        self.assertEqual(self.db.query(Interaction).count(), 0)
+
+    def test_delete_question_removes_answers(self):
+        p = create_person(self.db, "A", "A", None, None, None, None, None, None, "F", None, None)
+        q = create_question(self.db, "Info", "Q", "", "text")
+        create_interaction(self.db, p.id, "会話", "", "", "", date(2024, 1, 1), answers=[{"question_id": q.id, "answer_value": "3"}])
+        delete_question(self.db, q.id)
+        self.assertEqual(self.db.query(InteractionAnswer).count(), 0)
+        self.assertEqual(get_question_stats(self.db, p.id), {})
+        self.assertEqual(self.db.query(Interaction).count(), 1)
+
+    def test_question_stats_track_answers(self):
+        p = create_person(self.db, "A", "A", None, None, None, None, None, None, "F", None, None)
+        q = create_question(self.db, "Big5", "Open?", "", "numeric")
+        create_interaction(self.db, p.id, "会話", "", "", "", date(2024, 1, 1), answers=[{"question_id": q.id, "answer_value": "1"}])
+        create_interaction(self.db, p.id, "会話", "", "", "", date(2024, 2, 1), answers=[{"question_id": q.id, "answer_value": "5"}])
+
+        stat = get_question_stats(self.db, p.id)[q.id]
+        self.assertEqual(stat.answer_count, 2)
+        self.assertEqual(stat.value_changes, 1)
+        self.assertEqual(stat.last_answered_on, date(2024, 2, 1))
+        self.assertEqual(stat.numeric_sum, 6.0)
+        self.assertEqual(get_question_answer_counts(self.db, p.id), {q.id: 2})
+
+        rebuild_question_stats(self.engine)
+        self.db.expire_all()
+        stat = get_question_stats(self.db, p.id)[q.id]
+        self.assertEqual((stat.answer_count, stat.last_value, stat.numeric_sq_sum), (2, "5", 26.0))
+
+        # A backdated answer is counted but keeps the latest value
+        create_interaction(self.db, p.id, "会話", "", "", "", date(2023, 12, 1), answers=[{"question_id": q.id, "answer_value": "3"}])
+        self.db.expire_all()
+        stat = get_question_stats(self.db, p.id)[q.id]
+        self.assertEqual((stat.answer_count, stat.value_changes, stat.last_value), (3, 1, "5"))
+        self.assertEqual(stat.last_answered_on, date(2024, 2, 1))
+
+    def test_question_stats_skip_non_finite_numbers(self):
+        p = create_person(self.db, "A", "A", None, None, None, None, None, None, "F", None, None)
+        q = create_question(self.db, "Big5", "Open?", "", "numeric")
+        create_interaction(self.db, p.id, "会話", "", "", "", date(2024, 1, 1), answers=[
+            {"question_id": q.id, "answer_value": v} for v in ("nan", "inf", "1e400", "-2", "はい")
+        ])
+        stat = get_question_stats(self.db, p.id)[q.id]
+        self.assertEqual((stat.answer_count, stat.numeric_count, stat.numeric_sum, stat.numeric_sq_sum), (5, 1, -2.0, 4.0))
+
+        # The SQL rebuild applies the same rule
+        rebuild_question_stats(self.engine)
+        self.db.expire_all()
+        stat = get_question_stats(self.db, p.id)[q.id]
+        self.assertEqual((stat.answer_count, stat.numeric_count, stat.numeric_sum, stat.numeric_sq_sum), (5, 1, -2.0, 4.0))
+
+    def test_recommend_questions_ranks_unknown_first(self):
+        p = create_person(self.db, "A", "A", None, None, None, None, None, None, "F", None, None)
+        known = create_question(self.db, "Big5", "Known", "", "numeric")
+        shaky = create_question(self.db, "Big5", "Shaky", "", "numeric")
+        unanswered = create_question(self.db, "MBTI", "New", "", "numeric")
+        recent = date.today() - timedelta(days=10)
+        for v in ["3", "3", "3", "3"]:
+            create_interaction(self.db, p.id, "会話", "", "", "", recent, answers=[{"question_id": known.id, "answer_value": v}])
+        for v in ["0", "5"]:
+            create_interaction(self.db, p.id, "会話", "", "", "", recent, answers=[{"question_id": shaky.id, "answer_value": v}])
+
+        ranked = recommend_questions(self.db, p.id, k=3)
+        self.assertEqual([r["question"].id for r in ranked], [unanswered.id, shaky.id, known.id])
+        self.assertIn("未回答", ranked[0]["reasons"])
+        self.assertIn("確信度低", ranked[1]["reasons"])
+
+    def test_parse_fuzzy_date(self):
+        self.assertEqual(parse_fuzzy_date("2024/04/01"), (20240401, 20240401, "day"))
+        self.assertEqual(parse_fuzzy_date("2024/00/00"), (20240101, 20241231, "year"))
+        self.assertEqual(parse_fuzzy_date("1999/04"), (19990401, 19990430, "month"))
+        self.assertEqual(parse_fuzzy_date("２０２０年２月"), (20200201, 20200229, "month"))
+        self.assertEqual(parse_fuzzy_date("2020 Summer"), (20200601, 20200831, "season"))
+        self.assertEqual(parse_fuzzy_date("2024年春"), (20240301, 20240531, "season"))
+        self.assertEqual(parse_fuzzy_date("2023 Winter")[1], 20240229)
+        self.assertEqual(parse_fuzzy_date("Present")[1], OPEN_END_KEY)
+        self.assertIsNone(parse_fuzzy_date("いつか"))
+
+    def test_history_sorted_and_queried_by_date_keys(self):
+        p = create_person(self.db, "A", "A", None, None, None, None, None, None, "F", None, None)
+        for d in ["2020/04", "2020 Summer", "2009", "2012/03/01", "不明"]:
+            create_person_history(self.db, p.id, d, d)
+        self.assertEqual([h.date_str for h in get_person_history(self.db, p.id)],
+                         ["2009", "2012/03/01", "2020/04", "2020 Summer", "不明"])
+        self.assertEqual([h.date_str for h in get_person_history_in_period(self.db, p.id, "2010", "2015")], ["2012/03/01"])
+
+    def test_migrate_backfills_date_keys(self):
+        with self.engine.begin() as conn:
+            conn.execute(text("INSERT INTO people (id, last_name, first_name) VALUES (1, 'A', 'A')"))
+            conn.execute(text("INSERT INTO person_history (person_id, date_str) VALUES (1, '2020 Summer'), (1, '??')"))
+            conn.execute(text("INSERT INTO interactions (person_id, entry_date) VALUES (1, '2024-02-03')"))
+        migrate_db(self.engine)
+        with self.engine.connect() as conn:
+            self.assertEqual(conn.execute(text("SELECT start_key, end_key FROM person_history ORDER BY id")).all(),
+                             [(20200601, 20200831), (None, None)])
+            self.assertEqual(conn.execute(text("SELECT start_key, date_precision FROM interactions")).one(), (20240203, "day"))
+
+    def test_interactions_overlapping_period(self):
+        p = create_person(self.db, "A", "A", None, None, None, None, None, None, "F", None, None)
+        create_interaction(self.db, p.id, "会話", "ongoing", "", "", date(2024, 1, 1), "2022/06", "Present")
+        create_interaction(self.db, p.id, "会話", "old", "", "", date(2021, 5, 1))
+        create_interaction(self.db, p.id, "会話", "in2023", "", "", date(2024, 1, 1), "2023 Summer")
+        found = get_interactions_in_period(self.db, "2023", person_id=p.id)
+        self.assertEqual([i.content for i in found], ["ongoing", "in2023"])
+
+    def test_interaction_timeline_keyset_pages(self):
+        p = create_person(self.db, "A", "A", None, None, None, None, None, None, "F", None, None)
+        for i in range(7):
+            create_interaction(self.db, p.id, "食事" if i % 2 else "会話", f"memo {i}", "", "", date(2024, 1, 1 + i // 2), channel="対面")
+
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = get_interaction_timeline(self.db, p.id, cursor=cursor, limit=3)
+            seen.extend(i.content for i in page)
+            if cursor is None:
+                break
+        self.assertEqual(seen, [f"memo {i}" for i in range(6, -1, -1)])
+
+        page, _ = get_interaction_timeline(self.db, p.id, category="食事")
+        self.assertEqual([i.content for i in page], ["memo 5", "memo 3", "memo 1"])
+
+    def test_interaction_timeline_search_uses_fts(self):
+        engine = create_engine('sqlite:///:memory:')
+        init_db(engine)
+        db = sessionmaker(bind=engine)()
+        p = create_person(db, "A", "A", None, None, None, None, None, None, "F", None, None)
+        create_interaction(db, p.id, "会話", "最近の様子について話した", "仕事", "", date(2024, 1, 1))
+        create_interaction(db, p.id, "食事", "ランチ", "", "", date(2024, 1, 2))
+        for term in ["様子につ", "仕事", "ランチ"]:
+            page, _ = get_interaction_timeline(db, p.id, search=term)
+            self.assertEqual(len(page), 1, term)
+        delete_person(db, p.id)
+        self.assertEqual(db.execute(text("SELECT count(*) FROM interactions_fts WHERE interactions_fts MATCH '\"ランチ\"'")).scalar(), 0)
+        db.close()
+
+    def test_short_search_terms_match_wildcards_literally(self):
+        from crud import search_interactions, search_people
+        p = create_person(self.db, "A", "A", None, None, "100%", None, None, None, "F", None, None)
+        create_person(self.db, "B", "B", None, None, "10", None, None, None, "F", None, None)
+        create_interaction(self.db, p.id, "会話", "達成率100%", "a_b", "", date(2024, 1, 1))
+        create_interaction(self.db, p.id, "会話", "普通のメモ", "ab", "", date(2024, 1, 2))
+        create_interaction(self.db, p.id, "会話", "C:\\temp", "", "", date(2024, 1, 3))
+        for term, expected in [("%", ["達成率100%"]), ("_", ["達成率100%"]), ("\\", ["C:\\temp"])]:
+            page, _ = get_interaction_timeline(self.db, p.id, search=term)
+            self.assertEqual([i.content for i in page], expected, term)
+            self.assertEqual([i.content for i in search_interactions(self.db, term)], expected, term)
+        self.assertEqual([x.id for x in search_people(self.db, "%")], [p.id])
+
+    def test_generate_data_bulk(self):
+        from seed_data import generate_data
+        generate_data(self.engine, 50, interactions_per_person=4, edges_per_person=2, verbose=False)
+        self.assertEqual(self.db.query(Person).count(), 50)
+        self.assertEqual(self.db.query(Person).filter(Person.is_self == True).count(), 1)
+        self.assertGreater(self.db.query(Interaction).count(), 150)
+        self.assertGreater(self.db.query(InteractionAnswer).count(), 0)
+        self.assertEqual(self.db.query(Interaction).filter(Interaction.start_key == None).count(), 0)
+        rels = get_all_relationships(self.db)
+        self.assertEqual(len(rels), len({(r.pair_min_id, r.pair_max_id) for r in rels}))
+
+    def test_query_recorder_flags_repeated_statements(self):
+        from query_stats import install_query_hooks, start_recording, stop_recording
+        install_query_hooks(self.engine)
+        install_query_hooks(self.engine)
+        ids = [create_person(self.db, f"P{i}", "X", None, None, None, None, None, None, "F", None, None).id for i in range(6)]
+        start_recording("人物一覧")
+        for pid in ids:
+            get_interactions_by_person(self.db, pid)
+        summary = stop_recording(log=False)
+        self.assertEqual(summary["query_count"], 6)
+        self.assertEqual(len(summary["n_plus_one"]), 1)
+        self.assertEqual(summary["n_plus_one"][0]["count"], 6)
+        self.assertIsNone(stop_recording(log=False))
+
+    def test_change_log_records_writes_in_transaction(self):
+        from database import ChangeLog
+        from change_log import get_changes, iter_change_batches, compact, latest_seq
+        p1 = create_person(self.db, "A", "A", None, None, None, None, None, None, "F", None, None)
+        p2 = create_person(self.db, "B", "B", None, None, None, None, None, None, "F", None, None)
+        update_person(self.db, p1.id, notes="x")
+        rel_id = create_relationship(self.db, p1.id, p2.id, "友人", "良好").id
+        p1_id, p2_id = p1.id, p2.id
+        q = create_question(self.db, "Big5", "Q", "", "numeric")
+        create_interaction(self.db, p2.id, "会話", "", "", "", date(2024, 1, 1), answers=[{"question_id": q.id, "answer_value": "1"}])
+        # A rolled back write leaves no trace
+        self.db.add(Person(last_name="C", first_name="C"))
+        self.db.flush()
+        self.db.rollback()
+        delete_people_bulk(self.db, [p2_id])
+
+        changes, cursor = get_changes(self.db, 0, limit=3)
+        self.assertEqual([(c.table_name, c.op, c.version) for c in changes],
+                         [("people", "insert", 1), ("people", "insert", 1), ("people", "update", 2)])
+        rest = [c for batch in iter_change_batches(self.db, cursor, batch_size=2) for c in batch]
+        ops = [(c.table_name, c.row_id, c.op) for c in rest]
+        self.assertIn(("relationships", rel_id, "upsert"), ops)
+        self.assertTrue(all(c.row_uuid for c in rest if c.table_name == "relationships"))
+        self.assertIn(("interaction_answers", 1, "insert"), ops)
+        self.assertEqual(ops[-1], ("people", p2_id, "delete"))
+        self.assertNotIn(("people", 3, "insert"), ops)
+        self.assertEqual(len({c.table_name for c in rest if c.op == "delete"}), 4) # answers, interactions, relationships, people
+
+        total = latest_seq(self.db)
+        removed = compact(self.db)
+        self.assertEqual(self.db.query(ChangeLog).count(), total - removed)
+        latest = {(c.table_name, c.row_id): c.op for c in self.db.query(ChangeLog)}
+        self.assertEqual(latest[("people", p1_id)], "update")
+        self.assertEqual(latest[("people", p2_id)], "delete")
+        high = latest_seq(self.db)
+        compact(self.db, drop_deletes=True)
+        self.assertNotIn("delete", {c.op for c in self.db.query(ChangeLog)})
+        # Compaction removed the newest rows; their seq numbers are not reused
+        self.db.expunge_all() # p2's id is free again after the bulk delete
+        p3_id = create_person(self.db, "D", "D", None, None, None, None, None, None, "F", None, None).id
+        changes, _ = get_changes(self.db, since=high)
+        self.assertEqual([(c.table_name, c.row_id, c.op) for c in changes], [("people", p3_id, "insert")])
+
+    def test_change_log_rebuilt_with_autoincrement(self):
+        from change_log import latest_seq
+        engine = create_engine('sqlite:///:memory:')
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE change_log (seq INTEGER PRIMARY KEY, table_name VARCHAR NOT NULL, row_id INTEGER NOT NULL, "
+                              "op VARCHAR NOT NULL, version INTEGER NOT NULL, changed_at DATETIME NOT NULL, row_uuid VARCHAR, origin VARCHAR)"))
+            conn.execute(text("CREATE INDEX ix_change_log_row ON change_log (table_name, row_id, version)"))
+            conn.execute(text("INSERT INTO change_log VALUES (3, 'people', 1, 'insert', 1, '2024-01-01 00:00:00', NULL, NULL)"))
+            conn.execute(text("CREATE TABLE sync_state (peer_id VARCHAR PRIMARY KEY, sent_seq INTEGER, last_synced_at DATETIME)"))
+            conn.execute(text("INSERT INTO sync_state VALUES ('peer', 7, NULL)"))
+        init_db(engine)
+        db = sessionmaker(bind=engine)()
+        self.assertEqual(latest_seq(db), 7)
+        create_person(db, "A", "A", None, None, None, None, None, None, "F", None, None)
+        self.assertEqual([r[0] for r in db.execute(text("SELECT seq FROM change_log ORDER BY seq"))], [3, 8])
+        db.close()
+
+    def test_list_projections_and_deferred_text(self):
+        from crud import get_people_summary, get_relationship_edges
+        a = create_person(self.db, "A", "A", "い", None, None, None, "F", None, "F", None, "long note")
+        b = create_person(self.db, "B", "B", "あ", None, None, None, "M", None, "F", None, None, tags="仕事")
+        create_relationship(self.db, a.id, b.id, "友人", "良好")
+        summaries = get_people_summary(self.db)
+        self.assertEqual([(p.id, p.name, p.tags) for p in summaries], [(b.id, "B B", "仕事"), (a.id, "A A", None)])
+        self.assertFalse(hasattr(summaries[0], "__dict__"))
+        edges = get_relationship_edges(self.db)
+        self.assertEqual([(e.person_a_id, e.person_b_id, e.quality) for e in edges], [(a.id, b.id, "良好")])
+
+        self.db.expunge_all()
+        listed = get_people(self.db)
+        self.assertNotIn("notes", listed[1].__dict__)
+        self.assertEqual(get_person(self.db, a.id).notes, "long note")
+
+    def test_init_db_once_per_engine(self):
+        from database import init_db_once
+        engine = create_engine("sqlite:///:memory:")
+        self.assertTrue(init_db_once(engine))
+        self.assertFalse(init_db_once(engine))
+        with engine.connect() as conn:
+            self.assertEqual(conn.execute(text("SELECT COUNT(*) FROM people")).scalar(), 0)
+
+    def test_introduction_routes_prefer_good_relationships(self):
+        me = create_person(self.db, "Self", "Me", None, None, None, None, None, None, "自分", None, None, is_self=True)
+        good = create_person(self.db, "Good", "G", None, None, None, None, None, None, "F", None, None)
+        bad = create_person(self.db, "Bad", "B", None, None, None, None, None, None, "F", None, None)
+        target = create_person(self.db, "Target", "T", None, None, None, None, None, None, "F", None, None)
+
+        create_relationship(self.db, me.id, good.id, "友人", "良好")
+        create_relationship(self.db, good.id, target.id, "友人", "良好")
+        create_relationship(self.db, me.id, bad.id, "友人", "険悪")
+        create_relationship(self.db, bad.id, target.id, "友人", "良好")
+
+        routes = find_introduction_routes(self.db, target.id, k=2)
+        self.assertEqual(routes[0]["path"], [me.id, good.id, target.id])
+        self.assertEqual(routes[1]["path"], [me.id, bad.id, target.id])
+
+        # Cache is invalidated when a relationship changes
+        create_relationship(self.db, target.id, good.id, "友人", "普通", caution_flag=True)
+        routes = find_introduction_routes(self.db, target.id, k=2)
+        self.assertEqual(len(routes), 1)
+        self.assertEqual(routes[0]["path"], [me.id, bad.id, target.id])
+
+        routes = find_introduction_routes(self.db, target.id, k=2, exclude_caution=False)
+        self.assertEqual(routes[0]["path"], [me.id, bad.id, target.id])
+        self.assertEqual(len(routes), 2)
+
+        # A write that skips crud (another process, raw SQL) is picked up too
+        self.db.execute(text("DELETE FROM relationships WHERE person_a_id = :a AND person_b_id = :b"), {"a": bad.id, "b": target.id})
+        self.db.commit()
+        self.assertEqual(find_introduction_routes(self.db, target.id, k=2), [])
+
+    def test_find_routes_matches_exhaustive_search(self):
+        import random as rnd
+        rng = rnd.Random(7)
+        adj = {}
+        for _ in range(120):
+            a, b = rng.randrange(40), rng.randrange(40)
+            if a == b:
+                continue
+            w = rng.choice([1.0, 2.0, 4.0, 8.0])
+            adj.setdefault(a, {})[b] = (w, False)
+            adj.setdefault(b, {})[a] = (w, False)
+
+        # Plain Dijkstra as reference
+        import heapq
+        dist = {0: 0.0}
+        heap = [(0.0, 0)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for v, (w, _) in adj.get(u, {}).items():
+                if d + w < dist.get(v, float("inf")):
+                    dist[v] = d + w
+                    heapq.heappush(heap, (d + w, v))
+
+        for target in range(1, 40):
+            routes = find_routes(adj, 0, target, k=3)
+            if target not in dist:
+                self.assertEqual(routes, [])
+                continue
+            self.assertAlmostEqual(routes[0]["cost"], dist[target])
+            costs = [r["cost"] for r in routes]
+            self.assertEqual(costs, sorted(costs))
+            self.assertEqual(len({tuple(r["path"]) for r in routes}), len(routes))
+
+class TestProfiling(unittest.TestCase):
+    def tearDown(self):
+        import profiling
+        profiling.reset()
+
+    def test_sections_aggregate_across_reruns(self):
+        import profiling
+        for _ in range(2):
+            profiling.start_rerun(profiling.MODE_CPROFILE)
+            with profiling.section("ダッシュボード"):
+                with profiling.section("タイムライン"):
+                    sum(i * i for i in range(20000))
+            summary = profiling.finish_rerun()
+            self.assertIn("ダッシュボード/タイムライン", summary["sections"])
+
+        totals = profiling.section_totals()
+        self.assertEqual(totals["ダッシュボード"]["calls"], 2)
+        self.assertGreaterEqual(totals["ダッシュボード"]["wall_ms"], totals["ダッシュボード/タイムライン"]["wall_ms"])
+        self.assertTrue(profiling.export_pstats())
+        self.assertIn("function calls", profiling.top_functions(5))
+
+    def test_disabled_mode_is_noop(self):
+        import profiling
+        profiling.start_rerun(profiling.MODE_OFF)
+        with profiling.section("x"):
+            pass
+        self.assertIsNone(profiling.finish_rerun())
+        self.assertEqual(profiling.section_totals(), {})
+
+class TestApiServer(unittest.TestCase):
+    def setUp(self):
+        from sqlalchemy.pool import StaticPool
+        from api_server import ApiApp
+        # One shared in-memory connection so the server's worker threads see the same data
+        self.engine = create_engine('sqlite:///:memory:', poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(self.engine)
+        self.app = ApiApp(self.engine)
+
+    def call(self, method, target, body=None, headers=None):
+        import json
+        data = json.dumps(body).encode() if body is not None else b""
+        status, resp_headers, payload = self.app.dispatch(method, target, headers or {}, data)
+        return status, resp_headers, json.loads(payload) if payload else None
+
+    def test_bulk_create_paginate_and_search(self):
+        status, _, created = self.call("POST", "/api/people/bulk", [{"last_name": f"L{i}", "first_name": "F", "tags": "API"} for i in range(5)])
+        self.assertEqual(status, 201)
+        pid = created["ids"][0]
+        with sessionmaker(bind=self.engine)() as db:
+            create_question(db, "Big5", "Q", "", "numeric")
+        status, _, _ = self.call("POST", "/api/interactions/bulk", [
+            {"person_id": pid, "category": "会話", "content": f"元気そうだった {i}", "entry_date": f"2024-01-0{i + 1}",
+             "answers": [{"question_id": 1, "answer_value": "3"}]}
+            for i in range(3)
+        ])
+        self.assertEqual(status, 201)
+
+        _, _, page1 = self.call("GET", "/api/people?limit=2")
+        _, _, page2 = self.call("GET", f"/api/people?limit=2&after={page1['next_cursor']}")
+        _, _, page3 = self.call("GET", f"/api/people?limit=2&after={page2['next_cursor']}")
+        ids = [p["id"] for p in page1["items"] + page2["items"] + page3["items"]]
+        self.assertEqual(ids, created["ids"])
+        self.assertIsNone(page3["next_cursor"])
+
+        _, _, timeline = self.call("GET", f"/api/people/{pid}/interactions?limit=2")
+        self.assertEqual(timeline["items"][0]["entry_date"], "2024-01-03")
+        _, _, rest = self.call("GET", f"/api/people/{pid}/interactions?limit=2&cursor={timeline['next_cursor']}")
+        self.assertEqual(len(rest["items"]), 1)
+
+        _, _, found = self.call("GET", "/api/search?q=元気")
+        self.assertEqual(len(found["interactions"]), 3)
+        self.assertEqual(self.call("GET", "/api/people/999")[0], 404)
+        self.assertEqual(self.call("PUT", "/api/people/1")[0], 405)
+        self.assertEqual(self.call("POST", "/api/people", {"nope": 1})[0], 400)
+
+    def test_conditional_get_until_write(self):
+        self.call("POST", "/api/people", {"last_name": "A", "first_name": "B"})
+        status, headers, _ = self.call("GET", "/api/people")
+        self.assertEqual(status, 200)
+        etag = headers["ETag"]
+        self.assertEqual(self.call("GET", "/api/people", headers={"if-none-match": etag})[0], 304)
+        self.call("PATCH", "/api/people/1", {"notes": "changed"})
+        status, headers, body = self.call("GET", "/api/people", headers={"if-none-match": etag})
+        self.assertEqual(status, 200)
+        self.assertEqual(body["items"][0]["notes"], "changed")
+        self.assertNotEqual(headers["ETag"], etag)
+
+        # Bulk writes that skip change_log bump the generation instead
+        from change_log import bump_generation
+        etag = headers["ETag"]
+        with self.engine.begin() as conn:
+            bump_generation(conn)
+        self.assertEqual(self.call("GET", "/api/people", headers={"if-none-match": etag})[0], 200)
+
+    def test_bad_bodies_are_400_and_server_bugs_500(self):
+        from unittest import mock
+        self.call("POST", "/api/people", {"last_name": "A", "first_name": "B"})
+        bad = [
+            ("POST", "/api/people", ["not", "an", "object"]),
+            ("POST", "/api/people/bulk", [1, 2]),
+            ("PATCH", "/api/people/1", {"notes": {"nested": 1}}),
+            ("POST", "/api/interactions", {"person_id": "x"}),
+            ("POST", "/api/interactions", {"person_id": 1, "answers": [{"answer_value": "3"}]}),
+            ("POST", "/api/relationships", {"person_a": 1}),
+            ("POST", "/api/relationships/bulk", [{"person_a": 1, "person_b": None}]),
+            ("POST", "/api/people/bulk_delete", {"ids": ["1; x"]}),
+        ]
+        for method, target, body in bad:
+            status, _, payload = self.call(method, target, body)
+            self.assertEqual(status, 400, (target, payload))
+
+        # Unexpected errors inside crud are not the client's fault
+        with mock.patch("crud.get_person", side_effect=KeyError("oops")):
+            status, _, payload = self.call("GET", "/api/people/1")
+        self.assertEqual(status, 500)
+        self.assertIn("KeyError", payload["error"])
+
+        self.assertEqual(self.call("DELETE", "/api/people/1")[0], 200)
+        self.assertEqual(self.call("DELETE", "/api/people/1")[0], 404)
+
+    def test_http_round_trip(self):
+        import http.client, json
+        from api_server import run_in_thread, stop_thread_server
+        server = run_in_thread(self.app, workers=2)
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=10)
+            conn.request("POST", "/api/people", body=json.dumps({"last_name": "山田", "first_name": "花子"}))
+            resp = conn.getresponse()
+            self.assertEqual(resp.status, 201)
+            person_id = json.loads(resp.read())["id"]
+            # Same keep-alive connection
+            conn.request("GET", f"/api/people/{person_id}")
+            resp = conn.getresponse()
+            self.assertEqual(json.loads(resp.read())["last_name"], "山田")
+            conn.close()
+
+            # A bad Content-Length gets a 400 instead of a dropped connection
+            for length in ("abc", "-1"):
+                conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=10)
+                conn.putrequest("POST", "/api/people")
+                conn.putheader("Content-Length", length)
+                conn.endheaders()
+                self.assertEqual(conn.getresponse().status, 400)
+                conn.close()
+        finally:
+            stop_thread_server(server)
+
+class TestShards(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_router_lru_and_lazy_migration(self):
+        import os
+        from shards import ShardRouter, person_media_dir
+        # A shard created by an older schema gets migrated when first opened
+        os.makedirs(os.path.join(self.tmp.name, "old"))
+        legacy = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'old', 'human_crm.db')}")
+        with legacy.begin() as conn:
+            conn.execute(text("CREATE TABLE people (id INTEGER PRIMARY KEY, last_name VARCHAR NOT NULL, first_name VARCHAR NOT NULL)"))
+        legacy.dispose()
+
+        opened = []
+        router = ShardRouter(self.tmp.name, max_open=2, on_open=lambda a, e: opened.append(a))
+        with router.session("old") as db:
+            create_person(db, "A", "B", None, None, None, None, None, None, "F", None, "tag")
+        with router.session("alpha") as db:
+            create_person(db, "C", "D", None, None, None, None, None, None, "F", None, None)
+        router.engine("old")
+        router.engine("beta")
+        # alpha was least recently used
+        self.assertEqual(router.open_accounts(), ["old", "beta"])
+        self.assertEqual(router.accounts(), ["alpha", "beta", "old"])
+        with router.session("alpha") as db:
+            self.assertEqual([p.last_name for p in get_people(db)], ["C"])
+        self.assertEqual(opened, ["old", "alpha", "beta", "alpha"])
+        with self.assertRaises(KeyError):
+            router.engine("missing", create=False)
+        with self.assertRaises(ValueError):
+            router.engine("23")
+        self.assertEqual(person_media_dir(None, 5), os.path.join("account", "5", "icon_imag"))
+        router.dispose_all()
+
+    def test_stats_and_export_across_shards(self):
+        import os, zipfile, json
+        from shards import ShardRouter, shard_stats, export_shards
+        router = ShardRouter(self.tmp.name)
+        for account, n in (("a", 2), ("b", 3)):
+            with router.session(account) as db:
+                for i in range(n):
+                    create_person(db, f"P{i}", "X", None, None, None, None, None, None, "F", None, None)
+        router.dispose_all()
+
+        stats = shard_stats(router)
+        self.assertEqual([(s["account"], s["people"]) for s in stats["shards"]], [("a", 2), ("b", 3)])
+        self.assertEqual(stats["totals"]["people"], 5)
+        self.assertEqual(stats["totals"]["accounts"], 2)
+
+        out = os.path.join(self.tmp.name, "export.zip")
+        self.assertEqual(export_shards(router, out, ["b"]), {"b": 3})
+        with zipfile.ZipFile(out) as zf:
+            rows = [json.loads(line) for line in zf.read("b/people.jsonl").splitlines()]
+        self.assertEqual([r["last_name"] for r in rows], ["P0", "P1", "P2"])
+
+class TestBackup(unittest.TestCase):
+    def setUp(self):
+        import os, tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.base = self.tmp.name
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.base, 'human_crm.db')}")
+        init_db(self.engine)
+        with sessionmaker(bind=self.engine)() as db:
+            create_person(db, "A", "B", None, None, None, None, None, None, "F", None, None)
+        os.makedirs(os.path.join(self.base, "account", "1", "icon_imag"))
+        with open(os.path.join(self.base, "account", "1", "icon_imag", "icon.png"), "wb") as f:
+            f.write(b"png" * 100)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def test_backup_dedupes_media_and_restores(self):
+        import os
+        from backup import create_backup, verify_backup, restore_backup, list_backups
+        root = os.path.join(self.base, "backups")
+        first = create_backup(self.base, root, log=False)
+        second = create_backup(self.base, root, keep=1, log=False)
+        self.assertEqual(first["media_new_bytes"], 300)
+        self.assertEqual(second["media_new_bytes"], 0)
+        self.assertEqual(second["removed"], [first["snapshot"]])
+        self.assertEqual([b["snapshot"] for b in list_backups(root)], [second["snapshot"]])
+        snapshot = os.path.join(root, second["snapshot"])
+        self.assertEqual(verify_backup(snapshot), [])
+
+        from change_log import data_version
+        with sessionmaker(bind=self.engine)() as db:
+            delete_people_bulk(db, [1])
+        with self.engine.connect() as conn:
+            before = data_version(conn)
+        restore_backup(snapshot, self.base)
+        with sessionmaker(bind=self.engine)() as db:
+            self.assertEqual([p.last_name for p in get_people(db)], ["A"])
+        # The restored change_log is older, but the version still moves on
+        with self.engine.connect() as conn:
+            after = data_version(conn)
+        self.assertNotEqual(after, before)
+        self.assertGreater(int(after.split(".")[0]), int(before.split(".")[0]))
+
+        with open(os.path.join(snapshot, "media", "account", "1", "icon_imag", "icon.png"), "ab") as f:
+            f.write(b"x")
+        self.assertEqual(len(verify_backup(snapshot)), 1)
+        with self.assertRaises(ValueError):
+            restore_backup(snapshot, self.base)
+
+class TestSync(unittest.TestCase):
+    def setUp(self):
+        import os, tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = [os.path.join(self.tmp.name, name) for name in ("laptop.db", "desktop.db")]
+        self.engines = [create_engine(f"sqlite:///{p}") for p in self.paths]
+        for e in self.engines:
+            init_db(e)
+        self.laptop, self.desktop = [sessionmaker(bind=e)() for e in self.engines]
+
+    def tearDown(self):
+        for db in (self.laptop, self.desktop):
+            db.close()
+        for e in self.engines:
+            e.dispose()
+        self.tmp.cleanup()
+
+    def test_sync_exchanges_changes_and_reports_conflicts(self):
+        from sync import sync
+        q = create_question(self.laptop, "Big5", "Q", "", "numeric")
+        a = create_person(self.laptop, "A", "A", None, None, None, None, None, None, "F", None, None)
+        b = create_person(self.laptop, "B", "B", None, None, None, None, None, None, "F", None, None)
+        create_relationship(self.laptop, a.id, b.id, "友人", "良好")
+        create_interaction(self.laptop, a.id, "会話", "hello", "", "", date(2024, 1, 1), answers=[{"question_id": q.id, "answer_value": "4"}])
+        create_person(self.desktop, "C", "C", None, None, None, None, None, None, "F", None, None)
+
+        report = sync(self.engines[0], self.engines[1])
+        self.assertEqual((report["to_remote"], report["to_local"], report["conflicts"]), (6, 1, []))
+        self.assertEqual(sorted(p.last_name for p in get_people(self.desktop)), ["A", "B", "C"])
+        self.assertEqual(sorted(p.last_name for p in get_people(self.laptop)), ["A", "B", "C"])
+        remote_a = self.desktop.query(Person).filter(Person.uuid == a.uuid).one()
+        self.assertEqual(len(get_relationships_for_person(self.desktop, remote_a.id)), 1)
+        self.assertEqual(get_question_stats(self.desktop, remote_a.id)[1].last_value, "4")
+
+        # Nothing is echoed back
+        report = sync(self.engines[0], self.engines[1])
+        self.assertEqual((report["to_remote"], report["to_local"]), (0, 0))
+
+        # Both edit A: the later write wins and is reported
+        update_person(self.laptop, a.id, notes="laptop")
+        update_person(self.desktop, remote_a.id, notes="desktop")
+        delete_people_bulk(self.desktop, [self.desktop.query(Person).filter(Person.last_name == "B").one().id])
+        report = sync(self.engines[0], self.engines[1])
+        self.assertEqual([(c["table"], c["winner"]) for c in report["conflicts"]], [("people", "remote")])
+        self.laptop.expire_all()
+        self.assertEqual(get_person(self.laptop, a.id).notes, "desktop")
+        self.assertEqual(sorted(p.last_name for p in get_people(self.laptop)), ["A", "C"])
+        self.assertEqual(get_all_relationships(self.laptop), [])
+
+    def test_changes_after_compaction_are_sent(self):
+        from change_log import compact
+        from sync import sync
+        a = create_person(self.laptop, "A", "A", None, None, None, None, None, None, "F", None, None)
+        b_id = create_person(self.laptop, "B", "B", None, None, None, None, None, None, "F", None, None).id
+        delete_people_bulk(self.laptop, [b_id])
+        sync(self.engines[0], self.engines[1])
+        # Compaction drops the newest entries (B's insert and delete); later
+        # writes must still land above the cursor saved by the first sync
+        compact(self.laptop, drop_deletes=True)
+        update_person(self.laptop, a.id, notes="after compaction")
+        create_person(self.laptop, "C", "C", None, None, None, None, None, None, "F", None, None)
+        report = sync(self.engines[0], self.engines[1])
+        self.assertEqual(report["to_remote"], 2)
+        self.assertEqual(sorted((p.last_name, p.notes) for p in get_people(self.desktop)), [("A", "after compaction"), ("C", None)])
+
+    def test_copied_file_gets_its_own_identity(self):
+        import shutil
+        from sync import sync
+        create_person(self.laptop, "A", "A", None, None, None, None, None, None, "F", None, None)
+        sync(self.engines[0], self.engines[1])
+        self.engines[1].dispose()
+        shutil.copy(self.paths[0], self.paths[1])
+        report = sync(self.engines[0], self.engines[1])
+        self.assertNotEqual(report["local_id"], report["remote_id"])
+        self.assertEqual((report["to_remote"], report["to_local"], report["conflicts"]), (0, 0, []))
+
+class TestAnalyticsSnapshot(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{self.tmp.name}/crm.db")
+        init_db(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+        self.root = f"{self.tmp.name}/analytics"
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def test_refresh_appends_inserts_and_rewrites_on_update(self):
+        from analytics_snapshot import refresh_snapshot, load_table
+        a = create_person(self.db, "A", "A", None, None, None, None, None, None, "F", None, None)
+        create_interaction(self.db, a.id, "会話", "one", "", "", date(2024, 1, 1))
+        first = refresh_snapshot(self.engine, self.root, log=False)
+        self.assertEqual(first["tables"]["interactions"]["action"], "full")
+
+        create_interaction(self.db, a.id, "食事", "two", "", "", date(2024, 2, 1))
+        second = refresh_snapshot(self.engine, self.root, log=False)
+        self.assertEqual((second["tables"]["interactions"]["action"], second["tables"]["interactions"]["rows_written"]), ("append", 1))
+        self.assertEqual(second["tables"]["people"]["action"], "skip")
+        df = load_table("interactions", self.root)
+        self.assertEqual(list(df["content"]), ["one", "two"])
+        self.assertEqual(df["entry_date"].iloc[1], date(2024, 2, 1))
+
+        update_person(self.db, a.id, nickname="エー")
+        third = refresh_snapshot(self.engine, self.root, log=False)
+        self.assertEqual(third["tables"]["people"]["action"], "full")
+        self.assertEqual(list(load_table("people", self.root, columns=["nickname"])["nickname"]), ["エー"])
+
+        # A delete the change log no longer shows is still caught by the row count
+        with self.engine.begin() as conn:
+            conn.execute(text("DELETE FROM interactions WHERE content = 'two'"))
+        fourth = refresh_snapshot(self.engine, self.root, tables=["interactions"], log=False)
+        self.assertEqual(fourth["tables"]["interactions"]["action"], "full")
+        self.assertEqual(len(load_table("interactions", self.root, arrow_dtypes=False)), 1)
+
+class TestContactCadence(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:")
+        init_db(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_overdue_relative_to_own_rhythm(self):
+        from contact_cadence import get_cadence, get_overdue_people, monthly_contact_counts
+        today = date(2024, 6, 30)
+        weekly = create_person(self.db, "W", "W", None, None, None, None, None, None, "F", None, None)
+        monthly = create_person(self.db, "M", "M", None, None, None, None, None, None, "F", None, None)
+        rare = create_person(self.db, "R", "R", None, None, None, None, None, None, "F", None, None)
+        for i in range(6):
+            create_interaction(self.db, weekly.id, "会話", "", "", "", date(2024, 5, 1) + timedelta(days=7 * i))
+            create_interaction(self.db, monthly.id, "会話", "", "", "", date(2024, 1, 5) + timedelta(days=30 * i))
+        create_interaction(self.db, weekly.id, "会話", "same day", "", "", date(2024, 5, 1))
+        create_interaction(self.db, rare.id, "会話", "", "", "", date(2024, 4, 1))
+        create_interaction(self.db, rare.id, "観測", "", "", "", date(2024, 6, 29), channel="観測 (Passive)")
+
+        frame = get_cadence(self.db, today)
+        self.assertEqual(frame.loc[weekly.id, "contacts"], 6)
+        self.assertEqual(frame.loc[weekly.id, "median_gap"], 7)
+        self.assertAlmostEqual(frame.loc[monthly.id, "ewma_gap"], 30)
+        # Weekly: 25 days since the last contact is overdue; monthly: 15 days is not.
+        # Rare has too little history, so the fixed 90-day rule applies (90 days exactly).
+        self.assertEqual(list(get_overdue_people(self.db, today=today).index), [weekly.id, rare.id])
+        self.assertEqual(frame.loc[monthly.id, "status"], "ok")
+
+        counts = monthly_contact_counts(self.db, months=3, person_ids=[weekly.id, rare.id], today=today)
+        self.assertEqual(list(counts.columns), ["2024-04", "2024-05", "2024-06"])
+        self.assertEqual(counts.loc[weekly.id].tolist(), [0, 5, 1])
+        self.assertEqual(counts.loc[rare.id].tolist(), [1, 0, 0])
+
+        # Cached until a new interaction arrives
+        self.assertIs(get_cadence(self.db, today), frame)
+        create_interaction(self.db, weekly.id, "会話", "", "", "", date(2024, 6, 29))
+        self.assertEqual(get_cadence(self.db, today).loc[weekly.id, "status"], "ok")
+
+class TestNameIndex(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:")
+        init_db(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_kana_normalization(self):
+        from kana import normalize_kana, to_romaji, person_name_keys
+        self.assertEqual(normalize_kana("ﾀﾅｶ"), "たなか")
+        self.assertEqual(normalize_kana("タナカ　タロウ"), "たなかたろう")
+        self.assertEqual(normalize_kana("ＴＡＮＡＫＡ"), "tanaka")
+        self.assertEqual(to_romaji("しょうたろう"), "shoutarou")
+        self.assertEqual(to_romaji("いっちゃん"), "itchan")
+        self.assertEqual(person_name_keys("鈴木", "一郎", "スズキ", "イチロウ")[0], "すずき いちろう")
+
+    def test_prefix_then_substring_in_reading_order(self):
+        from name_index import get_name_index, search_person_names
+        suzuki = create_person(self.db, "鈴木", "一郎", "すずき", "いちろう", None, None, "M", None, "F", None, None)
+        sato = create_person(self.db, "佐藤", "花子", "さとう", "はなこ", "ハナ", None, "F", None, "F", None, None)
+        nakata = create_person(self.db, "中田", "健", "なかた", "けん", None, None, "M", None, "F", None, None)
+        tanaka = create_person(self.db, "田中", "一郎", "たなか", "いちろう", None, None, "M", None, "F", None, None)
+        self.assertEqual([p.id for p in get_people(self.db)], [sato.id, suzuki.id, tanaka.id, nakata.id])
+
+        index = get_name_index(self.db)
+        self.assertEqual(index.search("ｽｽﾞｷ"), [suzuki.id])
+        self.assertEqual(index.search("suzu"), [suzuki.id])
+        self.assertEqual(index.search("はな"), [sato.id])
+        # "なか" starts nakata's reading and is inside tanaka's
+        self.assertEqual(index.search("ナカ"), [nakata.id, tanaka.id])
+        self.assertEqual(index.search("一郎"), [suzuki.id, tanaka.id])
+        self.assertEqual(index.search("ichirou", limit=1), [suzuki.id])
+        self.assertEqual(index.search("zzz"), [])
+
+        # Edits invalidate the cached index
+        update_person(self.db, nakata.id, yomigana_last="ちゅうでん")
+        self.assertEqual(search_person_names(self.db, "chuu"), [{"id": nakata.id, "name": "中田 健"}])
+
+class TestAvatarImages(unittest.TestCase):
+    def test_working_image_is_rotated_downscaled_and_cached(self):
+        from io import BytesIO
+        from PIL import Image
+        import avatar_images
+
+        # A landscape JPEG whose EXIF says "rotate 90° clockwise to display"
+        photo = Image.new("RGB", (3000, 2000), (200, 40, 40))
+        exif = photo.getexif()
+        exif[0x0112] = 6
+        buf = BytesIO()
+        photo.save(buf, format="JPEG", exif=exif)
+        data = buf.getvalue()
+
+        digest, working = avatar_images.get_working_image(data)
+        self.addCleanup(avatar_images.shutdown_pool)
+        self.assertEqual(max(working.size), avatar_images.WORKING_SIZE)
+        self.assertGreater(working.height, working.width)
+        self.assertIs(avatar_images.get_working_image(data)[1], working)
+        self.assertEqual(digest, avatar_images.upload_hash(data))
+
+        avatar = Image.open(BytesIO(avatar_images.make_avatar(working, {"left": 10, "top": 10, "width": 300, "height": 300})))
+        self.assertEqual((avatar.format, avatar.size), ("PNG", (avatar_images.AVATAR_SIZE, avatar_images.AVATAR_SIZE)))
+
+class TestUploadSpool(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _png(self, size=200):
+        from io import BytesIO
+        from PIL import Image
+        buf = BytesIO()
+        Image.new("RGB", (size, size), (10, 120, 200)).save(buf, format="PNG")
+        return buf.getvalue()
+
+    def test_quota_thumbnail_and_ttl(self):
+        import os, time
+        from PIL import Image
+        from upload_spool import UploadSpool, SpoolFullError, THUMB_SIZE, make_thumbnail
+        data = self._png()
+        item = len(data) + len(make_thumbnail(data))
+        spool = UploadSpool(self.tmp.name, session_quota=2 * item, global_quota=4 * item, ttl=60)
+
+        handle = spool.put("sess-a", "a.png", data)
+        self.assertEqual(set(handle), {"id", "name", "size"})
+        self.assertEqual(spool.read("sess-a", handle), data)
+        self.assertEqual(Image.open(spool.thumbnail_path("sess-a", handle)).size, (THUMB_SIZE, THUMB_SIZE))
+
+        # Per-session quota, then the global quota across sessions
+        spool.put("sess-a", "b.png", data)
+        with self.assertRaises(SpoolFullError):
+            spool.put("sess-a", "c.png", data)
+        spool.put("sess-b", "a.png", data)
+        spool.put("sess-b", "b.png", data)
+        with self.assertRaises(SpoolFullError):
+            spool.put("sess-c", "a.png", data)
+        with self.assertRaises(ValueError):
+            spool.put("../x", "a.png", data)
+
+        # Idle sessions expire; a touched one survives
+        past = time.time() - 120
+        os.utime(os.path.join(self.tmp.name, "sess-a"), (past, past))
+        self.assertEqual(spool.cleanup(force=True), ["sess-a"])
+        self.assertFalse(spool.exists("sess-a", handle))
+        spool.put("sess-c", "a.png", data)
+
+        spool.clear_session("sess-b")
+        self.assertEqual(os.listdir(self.tmp.name), ["sess-c"])
+
+class TestGraphClusters(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_clusters_and_lazy_members(self):
+        from graph_clusters import BY_COMMUNITY, BY_TAG, UNGROUPED, get_cluster_graph, load_members
+        p = [create_person(self.db, f"P{i}", "X", None, None, None, None, None, None, "F", None, None,
+                           tags="営業, 東京" if i < 3 else ("開発" if i < 6 else None)) for i in range(7)]
+        # Two triangles joined by one relationship; p[6] has none
+        for a, b in [(0, 1), (1, 2), (0, 2), (3, 4), (4, 5), (3, 5), (2, 3)]:
+            create_relationship(self.db, p[a].id, p[b].id, "友人", "良好")
+
+        by_tag = get_cluster_graph(self.db, BY_TAG)
+        self.assertEqual({k: c.size for k, c in by_tag.clusters.items()}, {"営業": 3, "開発": 3, UNGROUPED: 1})
+        self.assertEqual(by_tag.edges, {("営業", "開発"): (1, 0)})
+        self.assertEqual(by_tag.clusters["営業"].internal_edges, 3)
+
+        community = get_cluster_graph(self.db, BY_COMMUNITY)
+        groups = sorted(sorted(c.members) for c in community.clusters.values())
+        self.assertEqual(groups, [[p[0].id, p[1].id, p[2].id], [p[3].id, p[4].id, p[5].id], [p[6].id]])
+        self.assertEqual(list(community.edges.values()), [(1, 0)])
+
+        people, edges = load_members(self.db, by_tag, ["営業"])
+        self.assertEqual({x.id for x in people}, {p[0].id, p[1].id, p[2].id})
+        self.assertEqual(len(edges), 4) # three inside plus the bridge
+
+        # Cached until relationships change
+        self.assertIs(get_cluster_graph(self.db, BY_TAG), by_tag)
+        create_relationship(self.db, p[6].id, p[0].id, "知人", "普通", caution_flag=True)
+        self.assertEqual(get_cluster_graph(self.db, BY_TAG).edges[(UNGROUPED, "営業")], (1, 1))
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{self.tmp.name}/crm.db")
+        init_db(self.engine)
+        self.db = sessionmaker(bind=self.engine)()
+
+    def tearDown(self):
+        self.db.close()
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def test_lease_triggers_and_failures(self):
+        from database import JobState
+        from scheduler import Job, _acquire, run_job
+        calls = []
+        job = Job("count", lambda db: calls.append(1) or {"n": len(calls)}, on_change=("people",))
+
+        self.assertEqual(run_job(self.engine, job, "a")["result"], {"n": 1})
+        self.assertIsNone(run_job(self.engine, job, "a")) # nothing changed
+        create_person(self.db, "A", "A", None, None, None, None, None, None, "F", None, None)
+        self.assertEqual(run_job(self.engine, job, "a")["status"], "ok")
+
+        # While one runner holds the lease nobody else runs the job
+        self.assertTrue(_acquire(self.engine, "count", "a", lease=60))
+        self.assertFalse(_acquire(self.engine, "count", "b", lease=60))
+        self.assertIsNone(run_job(self.engine, job, "b", force=True))
+        self.assertEqual(len(calls), 2)
+        # An expired lease can be taken over
+        with self.engine.begin() as conn:
+            conn.execute(text("UPDATE job_state SET lease_expires_at = 0 WHERE name = 'count'"))
+        self.assertIsNotNone(run_job(self.engine, job, "b", force=True))
+
+        def broken(db):
+            raise RuntimeError("boom")
+        failing = Job("broken", broken, interval=1)
+        self.assertEqual(run_job(self.engine, failing, "a")["status"], "failed")
+        self.assertIsNone(run_job(self.engine, failing, "a")) # waits RETRY_SECONDS
+        self.db.expire_all()
+        state = self.db.get(JobState, "broken")
+        self.assertEqual((state.status, state.fail_count, state.lease_owner), ("failed", 1, None))
+        self.assertIn("boom", state.last_error)
+
+    def test_daily_digest(self):
+        from jobs import JOBS, get_daily_digest
+        from scheduler import run_job
+        today = date.today()
+        soon = today + timedelta(days=3)
+        a = create_person(self.db, "A", "A", None, None, None, None, None, None, "F", None, None,
+                          birth_month=soon.month, birth_day=soon.day)
+        create_person(self.db, "B", "B", None, None, None, None, None, None, "F", None, None,
+                      birth_month=(today - timedelta(days=40)).month, birth_day=(today - timedelta(days=40)).day)
+        create_interaction(self.db, a.id, "会話", "", "", "", today - timedelta(days=200))
+
+        self.assertIsNone(get_daily_digest(self.db)) # not computed yet
+        run_job(self.engine, JOBS["daily_digest"], "a")
+        digest = get_daily_digest(self.db)
+        self.assertEqual([(d["kind"], d["person_id"]) for d in digest], [("birthday", a.id), ("overdue", a.id)])
+        self.assertEqual(digest[0]["days"], 3)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,58 @@
+import os
+import uuid
+from contextlib import contextmanager
+from typing import List, Tuple
+
+from sqlalchemy.orm import Session
+
+# --- Unit of work ---
+# A composite save (a person with avatar and history, an interaction with its
+# answers) is built with flush() and committed once. Files that belong to the
+# save are written next to their final path as hidden .tmp files and only
+# renamed into place after the commit succeeds; on any error the transaction
+# is rolled back and the temp files are removed, so neither the database nor
+# the media folders are left half-written.
+#
+#   with unit_of_work(db) as files:
+#       person = Person(...); db.add(person); db.flush()
+#       person.avatar_path = files.stage(media_dir, "icon.png", data)
+
+class StagedFiles:
+    def __init__(self):
+        self._pending: List[Tuple[str, str]] = [] # (temp path, final path)
+
+    def stage(self, directory: str, filename: str, data: bytes) -> str:
+        # Writes data to a temp file in directory (same filesystem, so the
+        # final rename is atomic) and returns the path it will have on commit
+        os.makedirs(directory, exist_ok=True)
+        final_path = os.path.join(directory, filename)
+        tmp_path = os.path.join(directory, f".{filename}.{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        self._pending.append((tmp_path, final_path))
+        return final_path
+
+    def finalize(self):
+        for tmp_path, final_path in self._pending:
+            os.replace(tmp_path, final_path)
+        self._pending = []
+
+    def discard(self):
+        for tmp_path, _ in self._pending:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+        self._pending = []
+
+@contextmanager
+def unit_of_work(db: Session):
+    files = StagedFiles()
+    try:
+        yield files
+        db.commit()
+    except BaseException:
+        db.rollback()
+        files.discard()
+        raise
+    files.finalize()
@@ -0,0 +1,156 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from io import BytesIO
+from typing import Dict, List, Optional
+
+# --- Upload spool ---
+# Staged uploads (avatar candidates on the registration page) live on disk,
+# one folder per browser session, instead of as bytes in st.session_state.
+# Session state only keeps small handles: {"id", "name", "size"}. Each staged
+# image also gets a small PNG thumbnail for the preview grid.
+#
+#   spool = get_spool()
+#   handle = spool.put(session_id, "icon.png", data)
+#   st.image(spool.thumbnail_path(session_id, handle))
+#   data = spool.read(session_id, handle)
+#
+# Limits: SESSION_QUOTA_BYTES per session and GLOBAL_QUOTA_BYTES for the whole
+# spool. Session folders untouched for TTL_SECONDS are removed (checked at
+# most every CLEANUP_INTERVAL seconds, on writes), so abandoned sessions do
+# not accumulate.
+SPOOL_ROOT = os.environ.get("HRCRM_UPLOAD_SPOOL", os.path.join(tempfile.gettempdir(), "hrcrm_uploads"))
+SESSION_QUOTA_BYTES = 20 * 1024 * 1024
+GLOBAL_QUOTA_BYTES = 512 * 1024 * 1024
+TTL_SECONDS = 6 * 3600
+CLEANUP_INTERVAL = 60
+THUMB_SIZE = 96
+
+class SpoolFullError(Exception):
+    pass
+
+def make_thumbnail(data: bytes, size: int=THUMB_SIZE) -> bytes:
+    from PIL import Image
+    img = Image.open(BytesIO(data))
+    img.thumbnail((size, size), Image.Resampling.LANCZOS)
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+def _dir_size(path: str) -> int:
+    total = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    total += entry.stat().st_size
+    except FileNotFoundError:
+        pass
+    return total
+
+class UploadSpool:
+    def __init__(self, root: str=SPOOL_ROOT, session_quota: int=SESSION_QUOTA_BYTES,
+                 global_quota: int=GLOBAL_QUOTA_BYTES, ttl: float=TTL_SECONDS):
+        self.root = root
+        self.session_quota = session_quota
+        self.global_quota = global_quota
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    def _session_dir(self, session_id: str) -> str:
+        if not session_id or not session_id.replace("-", "").isalnum():
+            raise ValueError(f"Invalid spool session id: {session_id!r}")
+        return os.path.join(self.root, session_id)
+
+    def _paths(self, session_id: str, handle: Dict):
+        base = os.path.join(self._session_dir(session_id), handle["id"])
+        return base + ".bin", base + ".thumb.png"
+
+    def usage(self, session_id: Optional[str]=None) -> int:
+        if session_id is not None:
+            return _dir_size(self._session_dir(session_id))
+        if not os.path.isdir(self.root):
+            return 0
+        with os.scandir(self.root) as entries:
+            return sum(_dir_size(e.path) for e in entries if e.is_dir())
+
+    def put(self, session_id: str, name: str, data: bytes) -> Dict:
+        thumb = make_thumbnail(data)
+        needed = len(data) + len(thumb)
+        self.cleanup()
+        with self._lock:
+            if self.usage(session_id) + needed > self.session_quota:
+                raise SpoolFullError("この画面で一時保存できる画像の容量を超えました。不要な画像を削除してください。")
+            if self.usage() + needed > self.global_quota:
+                self.cleanup(force=True)
+                if self.usage() + needed > self.global_quota:
+                    raise SpoolFullError("サーバーの一時保存領域がいっぱいです。しばらくしてから再度お試しください。")
+            directory = self._session_dir(session_id)
+            os.makedirs(directory, exist_ok=True)
+            handle = {"id": uuid.uuid4().hex, "name": name, "size": len(data)}
+            data_path, thumb_path = self._paths(session_id, handle)
+            for path, content in ((data_path, data), (thumb_path, thumb)):
+                with open(path, "wb") as f:
+                    f.write(content)
+            os.utime(directory)
+        return handle
+
+    def read(self, session_id: str, handle: Dict) -> bytes:
+        data_path, _ = self._paths(session_id, handle)
+        with open(data_path, "rb") as f:
+            data = f.read()
+        self.touch(session_id)
+        return data
+
+    def thumbnail_path(self, session_id: str, handle: Dict) -> str:
+        return self._paths(session_id, handle)[1]
+
+    def exists(self, session_id: str, handle: Dict) -> bool:
+        return os.path.exists(self._paths(session_id, handle)[0])
+
+    def remove(self, session_id: str, handle: Dict):
+        for path in self._paths(session_id, handle):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def touch(self, session_id: str):
+        # Marks the session as active so the TTL sweep keeps it
+        try:
+            os.utime(self._session_dir(session_id))
+        except FileNotFoundError:
+            pass
+
+    def clear_session(self, session_id: str):
+        shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+
+    def cleanup(self, now: Optional[float]=None, force: bool=False) -> List[str]:
+        # Removes session folders idle for longer than ttl; returns their ids
+        now = time.time() if now is None else now
+        if not force and now - self._last_cleanup < CLEANUP_INTERVAL:
+            return []
+        self._last_cleanup = now
+        removed = []
+        if not os.path.isdir(self.root):
+            return removed
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.is_dir() and now - entry.stat().st_mtime > self.ttl:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    removed.append(entry.name)
+        return removed
+
+_spool = None
+_spool_lock = threading.Lock()
+
+def get_spool() -> UploadSpool:
+    global _spool
+    with _spool_lock:
+        if _spool is None:
+            _spool = UploadSpool()
+        return _spool
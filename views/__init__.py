@@ -0,0 +1,30 @@
+import importlib
+import threading
+import time
+
+# Page name -> module, imported on first visit
+PAGE_MODULES = {
+    "人物一覧": "views.people_list",
+    "人物登録": "views.register",
+    "交流ログ": "views.interaction_log",
+    "ダッシュボード": "views.dashboard",
+    "相関図": "views.relation_graph",
+    "質問リスト": "views.questions",
+}
+
+_import_ms = {}
+_lock = threading.Lock()
+
+def load_page(page_name):
+    module_name = PAGE_MODULES[page_name]
+    with _lock:
+        if module_name not in _import_ms:
+            t0 = time.perf_counter()
+            module = importlib.import_module(module_name)
+            _import_ms[module_name] = (time.perf_counter() - t0) * 1000
+            return module
+    return importlib.import_module(module_name)
+
+def page_import_times():
+    with _lock:
+        return dict(_import_ms)
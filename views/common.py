@@ -0,0 +1,107 @@
+import functools
+from datetime import date
+
+import streamlit as st
+from sqlalchemy.orm import Session
+
+from name_index import get_name_index
+from profiling import end_section, finish_rerun, in_rerun, resolve_mode, start_rerun, start_section
+from query_stats import start_recording, stop_recording, write_log
+
+# --- Constants ---
+RELATIONSHIP_TEMPLATES = [
+    {"label": "親子", "forward": "親", "backward": "子", "type": "vertical"},
+    {"label": "兄弟姉妹", "forward": "兄・姉", "backward": "弟・妹", "type": "vertical"},
+    {"label": "夫婦・パートナー", "forward": "パートナー", "backward": "パートナー", "type": "horizontal"},
+    {"label": "上司・部下", "forward": "上司", "backward": "部下", "type": "vertical"},
+    {"label": "先輩・後輩", "forward": "先輩", "backward": "後輩", "type": "vertical"},
+    {"label": "師弟", "forward": "師匠", "backward": "弟子", "type": "vertical"},
+    {"label": "同僚", "forward": "同僚", "backward": "同僚", "type": "horizontal"},
+    {"label": "友人", "forward": "友人", "backward": "友人", "type": "horizontal"},
+    {"label": "ライバル", "forward": "ライバル", "backward": "ライバル", "type": "horizontal"},
+]
+
+def navigate_to(page_name):
+    st.session_state["current_page"] = page_name
+
+# --- Page fragments ---
+# Heavy page sections run as st.fragment: a widget inside the section reruns
+# only that function, not app.py and the rest of the page. The section gets
+# its own session (the page's session is closed once the full run ends) and
+# loads its own data from it. Partial reruns are timed and logged like full
+# ones, with the label "<page>/<section>".
+#
+#   @page_fragment("タイムライン")
+#   def render_timeline(db, person_id): ...
+#   render_timeline(db, person.id) # db: the page's session; only its bind is used
+#
+# Arguments are replayed on partial reruns, so pass ids, not ORM objects.
+def page_fragment(name):
+    def decorate(render_section):
+        @st.fragment
+        @functools.wraps(render_section)
+        def run(db, *args, **kwargs):
+            partial = not in_rerun()
+            if partial:
+                label = f"{st.session_state.get('current_page', '')}/{name}"
+                start_rerun(resolve_mode(st.query_params.get("profile")))
+                start_recording(label)
+            timer = start_section(name)
+            try:
+                with Session(db.get_bind(), autoflush=False) as section_db:
+                    render_section(section_db, *args, **kwargs)
+            finally:
+                end_section(timer)
+                if partial:
+                    profile_summary = finish_rerun()
+                    if profile_summary:
+                        write_log({**profile_summary, "label": label, "fragment": name})
+                    perf_summary = stop_recording(log=False)
+                    if perf_summary:
+                        write_log({**perf_summary, "fragment": name})
+        return run
+    return decorate
+
+# --- Person pickers ---
+# Search-as-you-type instead of a selectbox holding every person: the query box
+# commits after a short typing pause and the selectbox lists only the top
+# matches from the name index (name, reading, romaji, nickname).
+PICKER_LIMIT = 20
+
+def person_search_box(label, key):
+    # Separate from person_select so the box can sit outside an st.form
+    # (widgets inside a form only commit on submit)
+    return st.text_input(f"{label}を検索", key=f"{key}_query", type="search", live=True,
+                         placeholder="名前・よみ・ローマ字 (例: たなか / tanaka)")
+
+def person_select(db, label, key, query="", default_id=None, exclude_ids=()):
+    index = get_name_index(db)
+    ids = index.search(query, PICKER_LIMIT) if query else index.first(PICKER_LIMIT)
+    if default_id is not None and default_id in index and default_id not in ids and not query:
+        ids = [default_id] + ids
+    ids = [pid for pid in ids if pid not in exclude_ids]
+    if not ids:
+        st.caption("該当する人物がいません。")
+        return None
+    default_index = ids.index(default_id) if default_id in ids else 0
+    # A new default (e.g. arriving from 詳細 in the people list) gets a fresh
+    # widget so it is not overridden by the previous selection
+    return st.selectbox(label, options=ids, format_func=index.label, key=f"{key}_{default_id}", index=default_index)
+
+def person_picker(db, label, key, default_id=None, exclude_ids=()):
+    query = person_search_box(label, key)
+    return person_select(db, label, key, query, default_id, exclude_ids)
+
+# --- Helper Functions ---
+def calculate_age(born, birth_year=None, birth_month=None, birth_day=None):
+    today = date.today()
+    if born:
+        return today.year - born.year - ((today.month, today.day) < (born.month, born.day))
+
+    if birth_year and birth_month and birth_day:
+        return today.year - birth_year - ((today.month, today.day) < (birth_month, birth_day))
+
+    if birth_year:
+        return today.year - birth_year # Rough estimate
+
+    return "不明"
@@ -0,0 +1,254 @@
+import os
+
+import streamlit as st
+
+from crud import (
+    get_person, save_person, delete_person,
+    get_interaction_timeline, get_interaction_facets, get_relationships_for_person,
+    get_all_questions, get_question_stats,
+    get_person_history, delete_person_history
+)
+from contact_cadence import MIN_GAPS, get_contact_summary
+from name_index import get_name_index
+from shards import person_media_dir
+from views.common import navigate_to, calculate_age, page_fragment, person_picker
+
+# Timeline and relationship panel rerun on their own (page_fragment): typing
+# in the timeline search does not reload the header, answer rates or relations
+@page_fragment("タイムライン")
+def render_timeline(db, person_id):
+    col_tl_head, col_tl_search = st.columns([1,1])
+    with col_tl_head:
+        st.subheader("📅 タイムライン")
+    with col_tl_search:
+        tl_search = st.text_input("タイムライン検索", placeholder="キーワード...")
+
+    facets = get_interaction_facets(db, person_id)
+    col_tl_cat, col_tl_ch = st.columns(2)
+    with col_tl_cat:
+        tl_category = st.selectbox("カテゴリで絞り込み", ["すべて"] + facets["category"], key="tl_category")
+    with col_tl_ch:
+        tl_channel = st.selectbox("接触手段で絞り込み", ["すべて"] + facets["channel"], key="tl_channel")
+
+    if st.button("交流ログを追加"):
+        st.session_state["selected_person_id"] = person_id
+        navigate_to("交流ログ")
+        st.rerun()
+
+    # Keyset pagination: one cursor per loaded page, reset when the query changes
+    tl_query_key = (person_id, tl_search, tl_category, tl_channel)
+    if st.session_state.get("tl_query_key") != tl_query_key:
+        st.session_state["tl_query_key"] = tl_query_key
+        st.session_state["tl_cursors"] = [None]
+
+    interactions = []
+    next_cursor = None
+    for cursor in st.session_state["tl_cursors"]:
+        page_items, next_cursor = get_interaction_timeline(
+            db, person_id, search=tl_search or None,
+            category=None if tl_category == "すべて" else tl_category,
+            channel=None if tl_channel == "すべて" else tl_channel,
+            cursor=cursor
+        )
+        interactions.extend(page_items)
+
+    if interactions:
+        for i in interactions:
+            date_display = i.entry_date.strftime('%Y-%m-%d')
+            if i.start_date_str:
+                date_display = f"{i.start_date_str} 〜 {i.end_date_str or ''}"
+
+            # Icons based on Channel
+            icon = "📝"
+            if i.channel:
+                if "対面" in i.channel: icon = "🤝"
+                elif "通話" in i.channel: icon = "📞"
+                elif "メッセージ" in i.channel: icon = "💬"
+                elif "観測" in i.channel: icon = "👁️"
+
+            with st.expander(f"{icon} {date_display} - {i.category}"):
+                st.markdown(f"**手段:** {i.channel or '未設定'}")
+                st.markdown(f"**内容:** {i.content}")
+                if i.tags:
+                    st.caption(f"タグ: {i.tags}")
+                if i.user_feeling:
+                    st.info(f"感情: {i.user_feeling}")
+                if i.answers:
+                    st.write("---")
+                    st.caption("回答:")
+                    for ans in i.answers:
+                        q_text = ans.question.question_text if ans.question else "(削除された質問)"
+                        st.write(f"- {q_text}: **{ans.answer_value}**")
+
+        if next_cursor is not None:
+            if st.button("さらに読み込む", key="tl_load_more"):
+                st.session_state["tl_cursors"].append(next_cursor)
+                st.rerun(scope="fragment")
+    elif tl_search or tl_category != "すべて" or tl_channel != "すべて":
+        st.info("該当する交流ログがありません。")
+    else:
+        st.info("交流ログはまだありません。")
+
+@page_fragment("関係性")
+def render_relationships(db, person_id):
+    relationships = get_relationships_for_person(db, person_id)
+    st.subheader("🔗 関係性")
+    if st.button("関係性を追加"):
+        st.session_state["selected_person_id"] = person_id
+        navigate_to("相関図")
+        st.rerun()
+
+    if relationships:
+        name_index = get_name_index(db)
+        for r in relationships:
+            other_id = r.person_b_id if r.person_a_id == person_id else r.person_a_id
+            if other_id in name_index:
+                position = ""
+                if r.person_a_id == person_id:
+                    position = r.position_a_to_b
+                else:
+                    position = r.position_b_to_a
+
+                pos_str = f" ({position})" if position else ""
+                caution = "⚠️" if r.caution_flag else ""
+                st.markdown(f"- {caution} **{name_index.label(other_id)}**: {r.relation_type} ({r.quality}){pos_str}")
+    else:
+        st.markdown("*関係性の記録なし*")
+
+# --- ダッシュボード ---
+def render(db):
+    if not len(get_name_index(db)):
+        st.warning("人物が登録されていません。")
+    else:
+        # Sidebar selection
+        with st.sidebar:
+            selected_id = person_picker(db, "ダッシュボード表示対象", "dashboard_person",
+                                        default_id=st.session_state.get("selected_person_id"))
+        if selected_id is None:
+            st.info("サイドバーで人物を選択してください。")
+            return
+
+        # Load Data
+        person = get_person(db, selected_id)
+        history = get_person_history(db, selected_id)
+
+        # --- HEADER & EDIT ---
+        with st.expander("👤 人物情報の編集", expanded=False):
+            with st.form("edit_person_form"):
+                new_last = st.text_input("姓", value=person.last_name)
+                new_first = st.text_input("名", value=person.first_name)
+                new_tags = st.text_input("グループ", value=person.tags or "")
+                new_status = st.text_input("ステータス", value=person.status or "")
+                new_notes = st.text_area("メモ", value=person.notes or "")
+                new_prediction = st.text_area("性格分析予想 (付き合い方・考え方)", value=person.prediction_notes or "")
+
+                # Update Avatar
+                uploaded_avatar = st.file_uploader("アイコン画像更新", type=["jpg", "png", "jpeg"])
+
+                st.markdown("---")
+                st.write("経歴の追加")
+                new_hist_date = st.text_input("日付 (例: 2010/04)")
+                new_hist_content = st.text_input("内容")
+
+                if st.form_submit_button("保存"):
+                    # Fields, new avatar and history entry commit together
+                    account_id = st.session_state.get("account_id")
+                    save_person(db, dict(last_name=new_last, first_name=new_first, tags=new_tags, status=new_status,
+                                         notes=new_notes, prediction_notes=new_prediction),
+                                person_id=person.id,
+                                history=[{"date_str": new_hist_date, "content": new_hist_content}] if new_hist_content else None,
+                                avatar=uploaded_avatar.getvalue() if uploaded_avatar else None,
+                                avatar_name=f"icon{os.path.splitext(uploaded_avatar.name)[1]}" if uploaded_avatar else "icon.png",
+                                avatar_dir=lambda pid: person_media_dir(account_id, pid))
+
+                    st.success("更新しました。")
+                    st.rerun()
+
+                if st.form_submit_button("削除 (注意: 元に戻せません)", type="primary"):
+                     delete_person(db, person.id)
+                     st.warning("削除しました。")
+                     st.rerun()
+
+            # Manage History
+            if history:
+                st.markdown("##### 経歴の管理")
+                for h in history:
+                    c1, c2, c3 = st.columns([1, 4, 1])
+                    with c1: st.write(h.date_str or "---")
+                    with c2: st.write(h.content)
+                    with c3:
+                        if st.button("🗑️", key=f"del_hist_{h.id}"):
+                            delete_person_history(db, h.id)
+                            st.rerun()
+
+        col_h1, col_h2 = st.columns([1, 3])
+        with col_h1:
+            if person.avatar_path:
+                if os.path.exists(person.avatar_path):
+                     st.image(person.avatar_path, width=150)
+                elif person.avatar_path.startswith("http"):
+                     st.image(person.avatar_path, width=150)
+                else:
+                     st.warning(f"画像が見つかりません: {person.avatar_path}")
+            else:
+                st.image("https://placehold.co/150x150?text=No+Image", width=150)
+        with col_h2:
+            st.title(f"{person.last_name} {person.first_name}")
+            if person.nickname:
+                st.caption(f"({person.nickname})")
+
+            st.write(f"🏷️ グループ: {person.tags} | ステータス: {person.status}")
+            st.markdown(f"**性別:** {person.gender} | **年齢:** {calculate_age(person.birth_date)}")
+            cadence = get_contact_summary(db, person.id)
+            if cadence:
+                rhythm = f"いつもの間隔 約{cadence['expected_gap']:.0f}日" if cadence["contacts"] > MIN_GAPS else "履歴が少ないため90日で判定"
+                line = f"📞 最終接触: {cadence['last_contact']:%Y-%m-%d}（{cadence['days_since']}日前） | {rhythm} | 連絡目安: {cadence['next_contact']:%Y-%m-%d}"
+                if cadence["status"] == "overdue":
+                    st.warning(f"{line} ⚠️ 疎遠")
+                else:
+                    st.caption(line)
+            if person.prediction_notes:
+                st.info(f"🔮 **予想・付き合い方:** {person.prediction_notes}")
+
+            if history:
+                with st.expander("📜 経歴", expanded=True):
+                    for h in history:
+                        st.markdown(f"- **{h.date_str or '---'}**: {h.content}")
+
+        st.divider()
+
+        # --- Answer Rate / Profiling Summary ---
+        st.subheader("📊 質問回答率 (カテゴリ別)")
+        question_stats = get_question_stats(db, person.id)
+        questions = get_all_questions(db)
+
+        if question_stats:
+            cat_counts = {}
+            cat_totals = {}
+            for q in questions:
+                cat_totals[q.category] = cat_totals.get(q.category, 0) + 1
+
+            answered_q_ids = set(question_stats.keys())
+
+            for qid in answered_q_ids:
+                q = next((x for x in questions if x.id == qid), None)
+                if q:
+                    cat_counts[q.category] = cat_counts.get(q.category, 0) + 1
+
+            cols = st.columns(len(cat_totals))
+            for idx, (cat, total) in enumerate(cat_totals.items()):
+                count = cat_counts.get(cat, 0)
+                rate = count / total if total > 0 else 0
+                with cols[idx % len(cols)]:
+                    st.metric(label=cat, value=f"{count}/{total}", delta=f"{rate:.0%}")
+        else:
+            st.write("回答データがありません。")
+
+        # --- LAYOUT ---
+        col_main, col_side = st.columns([2, 1])
+
+        with col_main:
+            render_timeline(db, person.id)
+
+        with col_side:
+            render_relationships(db, person.id)
@@ -0,0 +1,63 @@
+import streamlit as st
+from sqlalchemy.orm import Session
+
+from profiling import section_totals, export_pstats, export_collapsed_stacks, top_functions
+from scheduler import get_job_states
+from views import page_import_times
+
+# --- Sidebar debug panels (SQL / startup / Python profile) ---
+def render_sql(perf_summary, startup, overhead_ms):
+    with st.sidebar.expander("🛠 パフォーマンス (SQL)", expanded=False):
+        st.metric("クエリ数", perf_summary["query_count"])
+        st.metric("SQL時間", f"{perf_summary['sql_ms']:.1f} ms")
+        st.metric("描画時間", f"{perf_summary['wall_ms']:.1f} ms")
+        st.metric("再実行オーバーヘッド", f"{overhead_ms:.1f} ms", help="スクリプト開始からページ描画開始まで")
+        st.caption(f"初期化 (プロセスごとに1回): {startup['init_ms']:.1f} ms / {startup['started_at']}")
+        imports = page_import_times()
+        if imports:
+            st.caption("ページモジュール読込: " + ", ".join(f"{m.split('.')[-1]} {ms:.0f} ms" for m, ms in imports.items()))
+        if perf_summary["n_plus_one"]:
+            st.warning("N+1 の疑いがあるクエリ")
+            for r in perf_summary["n_plus_one"]:
+                st.caption(f"{r['count']}回 / {r['total_ms']:.1f} ms")
+                st.code(r["signature"], language="sql")
+        st.write("遅いクエリ:")
+        for r in perf_summary["slowest"]:
+            st.caption(f"{r['ms']:.2f} ms")
+            st.code(r["statement"], language="sql")
+
+def render_jobs(bind):
+    with st.sidebar.expander("⚙️ バックグラウンド処理", expanded=False):
+        with Session(bind) as db:
+            states = get_job_states(db)
+        if not states:
+            st.caption("まだ実行されていません")
+            return
+        rows = [
+            {"ジョブ": s.name, "状態": s.status,
+             "最終実行": s.last_finished_at.strftime("%m-%d %H:%M:%S") if s.last_finished_at else "-",
+             "所要(ms)": round(s.last_duration_ms, 1) if s.last_duration_ms is not None else None,
+             "実行回数": s.run_count, "失敗": s.fail_count}
+            for s in states
+        ]
+        st.dataframe(rows, hide_index=True)
+        for s in states:
+            if s.status == "failed" and s.last_error:
+                st.error(f"{s.name}: {s.last_error}")
+
+def render_profile(profile_mode):
+    with st.sidebar.expander("⏱ プロファイル (Python)", expanded=False):
+        totals = section_totals()
+        rows = [
+            {"セクション": name, "回数": t["calls"], "平均(ms)": round(t["wall_ms"] / t["calls"], 1),
+             "CPU平均(ms)": round(t["cpu_ms"] / t["calls"], 1), "最大(ms)": round(t["max_wall_ms"], 1)}
+            for name, t in sorted(totals.items(), key=lambda x: -x[1]["wall_ms"])
+        ]
+        st.dataframe(rows, hide_index=True)
+        if profile_mode == "cprofile":
+            pstats_bytes = export_pstats()
+            if pstats_bytes:
+                st.download_button(".pstats をダウンロード", pstats_bytes, file_name="hrcrm.pstats", mime="application/octet-stream")
+            st.download_button("collapsed stacks をダウンロード", export_collapsed_stacks().encode("utf-8"),
+                               file_name="hrcrm.collapsed.txt", mime="text/plain")
+            st.code(top_functions(15))
@@ -0,0 +1,97 @@
+from datetime import date
+
+import streamlit as st
+
+from crud import create_interaction, get_all_questions, get_question_stats
+from name_index import get_name_index
+from question_recommender import score_questions
+from views.common import person_picker
+
+# --- 交流ログ ---
+def render(db):
+    st.title("📝 交流ログ")
+
+    if not len(get_name_index(db)):
+        st.error("まずは人物を登録してください。")
+    else:
+        # Select Person
+        person_id = person_picker(db, "人物を選択", "log_person", default_id=st.session_state.get("selected_person_id"))
+        if person_id is None:
+            return
+
+        questions = get_all_questions(db)
+        question_stats = get_question_stats(db, person_id)
+        answer_counts = {qid: s.answer_count for qid, s in question_stats.items()}
+        ranked_questions = score_questions(questions, question_stats)
+        recommended = ranked_questions[:3]
+
+        if recommended:
+            st.markdown("##### 💡 次に聞くと良い質問")
+            for rec in recommended:
+                reasons = " / ".join(rec["reasons"]) if rec["reasons"] else "確認"
+                st.markdown(f"- {rec['question'].question_text} `{reasons}`")
+
+        with st.form("interaction_form"):
+            col1, col2 = st.columns(2)
+            with col1:
+                i_date = st.date_input("入力日", value=date.today())
+                start_date_str = st.text_input("開始期間 (例: 2024/04/01, 2024年春)")
+                end_date_str = st.text_input("終了期間 (例: 2024/04/05, 現在)")
+
+            with col2:
+                # Extended Categories
+                cat_options = ["会話", "食事", "イベント", "観察", "連絡", "Gift/貸借", "Collaboration", "その他"]
+                category = st.selectbox("カテゴリ", cat_options)
+                category_new = st.text_input("カテゴリ追加 (上記にない場合)")
+                if category_new:
+                    category = category_new
+
+                # Channel
+                channel_options = ["対面 (In Person)", "通話 (Call/Remote)", "メッセージ (Text)", "観測 (Passive)"]
+                channel = st.selectbox("接触手段 (Channel)", channel_options)
+
+                tags = st.text_input("タグ (カンマ区切り)")
+
+            content = st.text_area("内容 / 詳細")
+            user_feeling = st.text_area("自分の感情 / メモ")
+
+            st.divider()
+            st.markdown("### 質問リストからの回答 (任意)")
+
+            recommended_ids = {rec["question"].id for rec in recommended}
+            q_options = {}
+            for rec in ranked_questions:
+                q = rec["question"]
+                mark = "⭐ " if q.id in recommended_ids else ""
+                q_options[q.id] = f"{mark}{q.question_text} (回答数: {answer_counts.get(q.id, 0)})"
+            selected_q_ids = st.multiselect("質問を選択", list(q_options.keys()), format_func=lambda x: q_options[x])
+
+            answers = []
+            for qid in selected_q_ids:
+                q = next(q_ for q_ in questions if q_.id == qid)
+                st.markdown(f"**Q: {q.question_text}**")
+
+                # Check answer_type/input_type
+                # Existing 'scale' or 'numeric' -> Slider
+                # 'text' -> Text Input
+                # 'selection' -> Selectbox
+
+                atype = q.answer_type or "text"
+
+                if atype in ['scale', 'numeric']:
+                     val = st.select_slider(f"回答 ({q.id})", options=["0", "1", "3", "5"], key=f"ans_{qid}")
+                     answers.append({'question_id': qid, 'answer_value': val})
+                elif atype == 'selection':
+                    opts = []
+                    if q.options:
+                        opts = [o.strip() for o in q.options.split(',')]
+                    val = st.selectbox(f"回答 ({q.id})", options=opts, key=f"ans_{qid}")
+                    answers.append({'question_id': qid, 'answer_value': val})
+                else:
+                    val = st.text_input(f"回答 ({q.id})", key=f"ans_{qid}")
+                    answers.append({'question_id': qid, 'answer_value': val})
+
+            submitted_log = st.form_submit_button("ログを保存")
+            if submitted_log:
+                create_interaction(db, person_id, category, content, tags, user_feeling, i_date, start_date_str, end_date_str, answers, channel)
+                st.success("交流ログを保存しました！")
@@ -0,0 +1,303 @@
+import os
+from datetime import date
+
+import altair as alt
+import streamlit as st
+
+from contact_cadence import get_cadence, get_overdue_people, monthly_contact_counts
+from crud import get_people_summary, delete_person
+from profiling import start_section, end_section
+from jobs import get_daily_digest
+from name_index import get_name_index
+from views.common import navigate_to, calculate_age, page_fragment
+
+HEATMAP_PEOPLE = 30
+
+def render_cadence_overview(db, names):
+    overdue = get_overdue_people(db, limit=HEATMAP_PEOPLE)
+    if overdue.empty:
+        st.caption("いつものペースより連絡が空いている人はいません。")
+        return
+    st.caption("いつもの連絡間隔（直近重視の平均）の1.5倍以上空いている人。履歴が少ない人は90日で判定します。")
+    st.dataframe(
+        {
+            "名前": [names.get(pid, str(pid)) for pid in overdue.index],
+            "最終接触": [d.strftime('%Y-%m-%d') for d in overdue["last_contact"]],
+            "経過日数": overdue["days_since"].tolist(),
+            "いつもの間隔(日)": overdue["expected_gap"].round().astype(int).tolist(),
+            "連絡目安": [d.strftime('%Y-%m-%d') for d in overdue["next_contact"]],
+        },
+        hide_index=True,
+    )
+    counts = monthly_contact_counts(db, person_ids=list(overdue.index))
+    heat = counts.rename(index=lambda pid: names.get(pid, str(pid))).reset_index(names="名前")
+    heat = heat.melt(id_vars="名前", var_name="月", value_name="接触日数")
+    chart = alt.Chart(heat).mark_rect().encode(
+        x=alt.X("月:O"),
+        y=alt.Y("名前:N", sort=None),
+        color=alt.Color("接触日数:Q", scale=alt.Scale(scheme="greens")),
+        tooltip=["名前", "月", "接触日数"],
+    )
+    st.altair_chart(chart, width="stretch")
+
+# Picking a column/condition or typing a value reruns only this editor;
+# adding or removing a filter reruns the page so the table applies it
+@st.fragment
+def render_filter_editor():
+    f_col1, f_col2, f_col3, f_col4 = st.columns([2, 2, 2, 1])
+    with f_col1:
+        f_column = st.selectbox("カラム", ["名前", "グループ", "ステータス", "性別", "年齢", "最終接触日"], key="f_col_select")
+    with f_col2:
+        f_op = st.selectbox("条件", ["含む", "一致する", "以上", "以下"], key="f_op_select")
+    with f_col3:
+        f_val = st.text_input("値", key="f_val_input")
+    with f_col4:
+        if st.button("追加", key="add_filter_btn"):
+            st.session_state["person_list_filters"].append({"col": f_column, "op": f_op, "val": f_val})
+            st.rerun()
+
+    if st.session_state["person_list_filters"]:
+        st.write("適用中のフィルタ:")
+        for i, f in enumerate(st.session_state["person_list_filters"]):
+            c1, c2 = st.columns([4, 1])
+            with c1: st.write(f"- {f['col']} が '{f['val']}' {f['op']}")
+            with c2:
+                if st.button("削除", key=f"del_filter_{i}"):
+                    st.session_state["person_list_filters"].pop(i)
+                    st.rerun()
+
+# The table with its search, sort and filter widgets reruns on its own
+# (page_fragment); the cadence overview above it is not rebuilt
+@page_fragment("人物テーブル")
+def render_people_table(db):
+    people = get_people_summary(db)
+
+    col_search, col_sort = st.columns([3, 1])
+    with col_search:
+        search_query = st.text_input("一覧内フィルタ (名前・タグ・ステータス)", "")
+    with col_sort:
+        sort_option = st.selectbox("並び替え", ["名前順", "グループ順", "ステータス順"])
+
+    # Sorting logic
+    sorted_people = people
+    if sort_option == "グループ順":
+        sorted_people = sorted(people, key=lambda x: x.tags if x.tags else "zzz")
+    elif sort_option == "ステータス順":
+        sorted_people = sorted(people, key=lambda x: x.status if x.status else "zzz")
+
+    # Filter Logic (Multiple Filters)
+    if "person_list_filters" not in st.session_state:
+        st.session_state["person_list_filters"] = []
+    with st.expander("フィルタ設定"):
+        render_filter_editor()
+
+    if st.button("検索実行"):
+        pass # Just triggers rerun to apply filters
+
+    # Last contact and overdue flag for everyone from one cached pass
+    cadence = get_cadence(db)
+    last_contacts = dict(zip(cadence.index, cadence["last_contact"].dt.date))
+    overdue_ids = set(cadence.index[cadence["status"] == "overdue"])
+
+    # Display Mode Toggle
+    view_mode = st.radio("表示形式", ["テーブル", "カード"], horizontal=True)
+
+    # Apply Filters & Sort
+    filter_timer = start_section("フィルタ評価")
+    filtered_people = []
+    today = date.today()
+
+    for p in sorted_people:
+        # Global Search Filter
+        search_target = f"{p.last_name} {p.first_name} {p.nickname} {p.tags} {p.status}"
+        if search_query and search_query.lower() not in search_target.lower():
+            continue
+
+        # Custom Filters
+        match = True
+        age = calculate_age(p.birth_date, p.birth_year, p.birth_month, p.birth_day)
+        last_contact = last_contacts.get(p.id)
+
+        for f in st.session_state["person_list_filters"]:
+            val_to_check = ""
+            if f["col"] == "名前": val_to_check = f"{p.last_name} {p.first_name}"
+            elif f["col"] == "グループ": val_to_check = p.tags or ""
+            elif f["col"] == "ステータス": val_to_check = p.status or ""
+            elif f["col"] == "性別": val_to_check = p.gender or ""
+            elif f["col"] == "年齢": val_to_check = str(age)
+            elif f["col"] == "最終接触日": val_to_check = last_contact.strftime('%Y-%m-%d') if last_contact else ""
+
+            target_val = f["val"]
+
+            if f["op"] == "含む":
+                if target_val.lower() not in val_to_check.lower(): match = False
+            elif f["op"] == "一致する":
+                if target_val.lower() != val_to_check.lower(): match = False
+            elif f["op"] == "以上": # Numeric compare if possible
+                 try:
+                     if float(val_to_check) < float(target_val): match = False
+                 except: match = False
+            elif f["op"] == "以下":
+                 try:
+                     if float(val_to_check) > float(target_val): match = False
+                 except: match = False
+
+        if match:
+            filtered_people.append(p)
+
+    end_section(filter_timer)
+
+    if not filtered_people:
+        st.warning("該当する人物が見つかりませんでした。")
+    else:
+        if view_mode == "テーブル":
+            # Header
+            h1, h2, h3, h4, h5, h6, h7 = st.columns([2, 1, 2, 1, 1, 2, 3])
+            h1.markdown("**名前**")
+            h2.markdown("**性別**")
+            h3.markdown("**グループ**")
+            h4.markdown("**年齢**")
+            h5.markdown("**誕生日**")
+            h6.markdown("**最終接触**")
+            h7.markdown("**操作**")
+            st.divider()
+
+            for p in filtered_people:
+                with st.container():
+                    last_contact = last_contacts.get(p.id)
+                    last_contact_str = last_contact.strftime('%Y-%m-%d') if last_contact else "なし"
+                    age = calculate_age(p.birth_date, p.birth_year, p.birth_month, p.birth_day)
+
+                    # Birthday Flag (1 month)
+                    birthday_flag = ""
+                    # Logic: if birth_month/day exists
+                    if p.birth_month and p.birth_day:
+                        # Simple check: is it within next 30 days?
+                        b_date = date(today.year, p.birth_month, p.birth_day)
+                        if b_date < today:
+                            b_date = date(today.year + 1, p.birth_month, p.birth_day)
+
+                        delta = (b_date - today).days
+                        if 0 <= delta <= 30:
+                            birthday_flag = "🎂"
+                    elif p.birth_date:
+                         # Legacy
+                         b_date = date(today.year, p.birth_date.month, p.birth_date.day)
+                         if b_date < today:
+                            b_date = date(today.year + 1, p.birth_date.month, p.birth_date.day)
+                         delta = (b_date - today).days
+                         if 0 <= delta <= 30:
+                            birthday_flag = "🎂"
+
+                    # Overdue relative to this person's own rhythm (contact_cadence)
+                    contact_flag = "⚠️" if p.id in overdue_ids else ""
+
+                    birthday_display = ""
+                    if p.birth_year: birthday_display += f"{p.birth_year}年"
+                    if p.birth_month: birthday_display += f"{p.birth_month}月"
+                    if p.birth_day: birthday_display += f"{p.birth_day}日"
+                    if not birthday_display and p.birth_date: birthday_display = p.birth_date.strftime('%Y/%m/%d')
+                    if birthday_flag: birthday_display += f" {birthday_flag}"
+
+                    c1, c2, c3, c4, c5, c6, c7 = st.columns([2, 1, 2, 1, 1, 2, 3])
+
+                    c1.write(f"{p.last_name} {p.first_name}")
+                    c2.write(p.gender or "-")
+                    c3.write(p.tags or "-")
+                    c4.write(str(age))
+                    c5.write(birthday_display or "-")
+                    c6.write(f"{last_contact_str} {contact_flag}")
+
+                    with c7:
+                        b1, b2, b3 = st.columns(3)
+                        with b1:
+                            if st.button("詳細", key=f"det_{p.id}"):
+                                st.session_state["selected_person_id"] = p.id
+                                navigate_to("ダッシュボード")
+                                st.rerun()
+                        with b2:
+                            if st.button("編集", key=f"edit_{p.id}"):
+                                st.session_state["edit_person_id"] = p.id
+                                navigate_to("人物登録")
+                                st.rerun()
+                        with b3:
+                            if st.button("削除", key=f"del_{p.id}", type="primary"):
+                                delete_person(db, p.id)
+                                st.rerun()
+
+        elif view_mode == "カード":
+            cols = st.columns(4)
+            for i, p in enumerate(filtered_people):
+                with cols[i % 4]:
+                    with st.container(border=True):
+                        # Icon
+                        if p.avatar_path and os.path.exists(p.avatar_path):
+                            st.image(p.avatar_path, width=100)
+                        else:
+                            st.write("👤") # Placeholder
+
+                        # Name Button (Click to Dashboard)
+                        if st.button(f"{p.last_name} {p.first_name}", key=f"card_btn_{p.id}"):
+                             st.session_state["selected_person_id"] = p.id
+                             navigate_to("ダッシュボード")
+                             st.rerun()
+
+                        st.caption(f"{p.nickname or ''}")
+                        st.write(f"**性別:** {p.gender or '-'}")
+
+                        # Age & Birthday
+                        age = calculate_age(p.birth_date, p.birth_year, p.birth_month, p.birth_day)
+                        st.write(f"**年齢:** {age}")
+
+                        # Last Contact
+                        last_contact = last_contacts.get(p.id)
+                        lc_str = last_contact.strftime('%Y-%m-%d') if last_contact else "なし"
+
+                        # Flags
+                        contact_flag = "⚠️ 疎遠" if p.id in overdue_ids else ""
+
+                        st.write(f"**最終:** {lc_str}")
+                        if contact_flag:
+                            st.error(contact_flag)
+
+                        # Birthday Flag logic check again for display
+                        if p.birth_month and p.birth_day:
+                            b_date = date(today.year, p.birth_month, p.birth_day)
+                            if b_date < today: b_date = date(today.year + 1, p.birth_month, p.birth_day)
+                            delta = (b_date - today).days
+                            if 0 <= delta <= 30:
+                                st.success("🎂 誕生日近し")
+
+def render_digest(db):
+    # Precomputed by the daily_digest background job (jobs.py)
+    digest = get_daily_digest(db)
+    if digest is None:
+        st.caption("集計中です。しばらくすると表示されます。")
+        return
+    birthdays = [d for d in digest if d["kind"] == "birthday"]
+    overdue = [d for d in digest if d["kind"] == "overdue"]
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown(f"**🎂 誕生日が近い人 ({len(birthdays)})**")
+        for d in birthdays:
+            when = "今日" if d["days"] == 0 else f"あと{d['days']}日"
+            st.caption(f"{d['name']} — {d['detail']} ({when})")
+    with col2:
+        st.markdown(f"**⚠️ 連絡が空いている人 ({len(overdue)})**")
+        for d in overdue:
+            st.caption(f"{d['name']} — {d['days']}日 ({d['detail']})")
+
+# --- 人物一覧 ---
+def render(db):
+    st.title("📂 人物一覧")
+
+    name_index = get_name_index(db)
+    if not len(name_index):
+        st.info("人物が登録されていません。「人物登録」から追加してください。")
+    else:
+        with st.expander("📰 今日のダイジェスト"):
+            render_digest(db)
+        with st.expander("📅 接触リズム（連絡が空いている人）"):
+            render_cadence_overview(db, name_index.labels)
+
+        render_people_table(db)
@@ -0,0 +1,137 @@
+import streamlit as st
+
+from crud import get_all_questions, create_question, update_question, delete_question
+from views.common import page_fragment
+
+# Adding, editing and deleting questions reruns only the editor (page_fragment)
+@page_fragment("質問エディタ")
+def render_question_editor(db):
+    with st.form("add_question"):
+        st.subheader("新規質問追加")
+        q_text = st.text_input("質問文")
+        q_cat = st.text_input("カテゴリ (例: MBTI, 価値観, 個人情報, NG項目)")
+        q_criteria = st.text_area("判断基準")
+
+        # New Input Types
+        type_map = {"数値 (Scale)": "numeric", "自由記述 (Text)": "text", "選択式 (Selection)": "selection"}
+        q_type_label = st.selectbox("回答タイプ", list(type_map.keys()))
+        q_type = type_map[q_type_label]
+
+        q_options = st.text_input("選択肢 (カンマ区切り, 選択式のみ有効)")
+
+        if st.form_submit_button("追加"):
+            create_question(db, q_cat, q_text, q_criteria, q_type, options=q_options)
+            st.success("追加しました")
+            st.rerun(scope="fragment")
+
+    st.divider()
+    st.subheader("既存の質問を編集/削除")
+    questions = get_all_questions(db)
+    for q in questions:
+        with st.expander(f"ID:{q.id} {q.question_text[:20]}..."):
+            with st.form(f"edit_q_{q.id}"):
+                e_text = st.text_input("質問文", value=q.question_text)
+                e_cat = st.text_input("カテゴリ", value=q.category)
+                e_crit = st.text_area("基準", value=q.judgment_criteria)
+
+                # Reverse Map
+                rev_map = {v: k for k, v in type_map.items()}
+                current_label = rev_map.get(q.answer_type, "自由記述 (Text)")
+
+                # Find index
+                try:
+                    idx = list(type_map.keys()).index(current_label)
+                except:
+                    idx = 1 # text
+
+                e_type_label = st.selectbox("タイプ", list(type_map.keys()), index=idx)
+                e_type = type_map[e_type_label]
+
+                e_options = st.text_input("選択肢", value=q.options or "")
+
+                c1, c2 = st.columns(2)
+                with c1:
+                    if st.form_submit_button("更新"):
+                        update_question(db, q.id, question_text=e_text, category=e_cat, judgment_criteria=e_crit, answer_type=e_type, options=e_options)
+                        st.success("更新しました")
+                        st.rerun(scope="fragment")
+                with c2:
+                    if st.form_submit_button("削除", type="primary", help="この質問への回答もすべて削除されます"):
+                        delete_question(db, q.id)
+                        st.rerun(scope="fragment")
+
+# --- 質問リスト ---
+def render(db):
+    st.title("❓ プロファイリング質問リスト")
+
+    mode = st.radio("モード", ["回答入力用リスト表示", "質問管理(追加・編集)", "CSVインポート/エクスポート"], horizontal=True)
+
+    if mode == "回答入力用リスト表示":
+        questions = get_all_questions(db)
+        grouped_qs = {}
+        for q in questions:
+            if q.category not in grouped_qs:
+                grouped_qs[q.category] = []
+            grouped_qs[q.category].append(q)
+
+        for cat, qs in grouped_qs.items():
+            with st.expander(f"{cat}", expanded=True):
+                for q in qs:
+                    st.markdown(f"**Q:** {q.question_text}")
+                    st.caption(f"判断基準: {q.judgment_criteria} | タイプ: {q.answer_type}")
+                    if q.options:
+                        st.caption(f"選択肢: {q.options}")
+                    st.divider()
+
+    elif mode == "質問管理(追加・編集)":
+        render_question_editor(db)
+
+    elif mode == "CSVインポート/エクスポート":
+        st.subheader("エクスポート")
+        questions = get_all_questions(db)
+        if st.button("CSVダウンロード準備"):
+            data = []
+            for q in questions:
+                data.append({
+                    "category": q.category,
+                    "question_text": q.question_text,
+                    "judgment_criteria": q.judgment_criteria,
+                    "answer_type": q.answer_type,
+                    "options": q.options,
+                    "target_trait": q.target_trait
+                })
+            import pandas as pd # Loaded only when exporting
+            df = pd.DataFrame(data)
+            csv = df.to_csv(index=False).encode('utf-8')
+            st.download_button(
+                label="CSVをダウンロード",
+                data=csv,
+                file_name='questions.csv',
+                mime='text/csv',
+            )
+
+        st.divider()
+        st.subheader("インポート")
+        uploaded_file = st.file_uploader("CSVファイルをアップロード", type="csv")
+        if uploaded_file is not None:
+            try:
+                import pandas as pd
+                df = pd.read_csv(uploaded_file)
+                st.dataframe(df.head())
+                if st.button("データベースに取り込み"):
+                    count = 0
+                    for index, row in df.iterrows():
+                        if "question_text" in row and "category" in row:
+                            create_question(
+                                db,
+                                category=row["category"],
+                                question_text=row["question_text"],
+                                judgment_criteria=row.get("judgment_criteria", ""),
+                                answer_type=row.get("answer_type", "text"),
+                                options=row.get("options", ""),
+                                target_trait=row.get("target_trait", "")
+                            )
+                            count += 1
+                    st.success(f"{count} 件の質問を取り込みました。")
+            except Exception as e:
+                st.error(f"エラーが発生しました: {e}")
@@ -0,0 +1,374 @@
+import os
+import uuid
+from datetime import date
+
+import streamlit as st
+
+from avatar_images import get_working_image, make_avatar
+from crud import get_people_summary, get_person, save_person
+from profiling import start_section, end_section
+from shards import person_media_dir
+from upload_spool import SpoolFullError, get_spool
+
+# --- 人物登録 ---
+def render(db):
+    st.title("👤 人物登録・編集")
+
+    # Initialize uploader key
+    if "uploader_key" not in st.session_state:
+        st.session_state["uploader_key"] = 0
+
+    existing_people = get_people_summary(db)
+    existing_self = next((p for p in existing_people if p.is_self), None)
+
+    # Check for Edit Mode
+    edit_mode_id = st.session_state.get("edit_person_id", None)
+    edit_person_obj = None
+
+    # Initialize defaults
+    default_last = ""
+    default_first = ""
+    default_y_last = ""
+    default_y_first = ""
+    default_nick = ""
+    default_gender = "不明"
+    default_blood = "不明"
+    default_is_self = False
+
+    default_by = None
+    default_bm = None
+    default_bd = None
+    default_fy = date.today().year
+    default_fm = date.today().month
+    default_fd = date.today().day
+
+    default_notes = ""
+    default_strategy = ""
+    default_tags = []
+
+    if edit_mode_id:
+        edit_person_obj = get_person(db, edit_mode_id)
+        if edit_person_obj:
+            st.info(f"編集中: {edit_person_obj.last_name} {edit_person_obj.first_name}")
+            default_last = edit_person_obj.last_name
+            default_first = edit_person_obj.first_name
+            default_y_last = edit_person_obj.yomigana_last or ""
+            default_y_first = edit_person_obj.yomigana_first or ""
+            default_nick = edit_person_obj.nickname or ""
+            default_gender = edit_person_obj.gender or "不明"
+            default_blood = edit_person_obj.blood_type or "不明"
+            default_is_self = edit_person_obj.is_self
+
+            default_by = edit_person_obj.birth_year
+            default_bm = edit_person_obj.birth_month
+            default_bd = edit_person_obj.birth_day
+
+            default_fy = edit_person_obj.first_met_year
+            default_fm = edit_person_obj.first_met_month
+            default_fd = edit_person_obj.first_met_day
+
+            default_notes = edit_person_obj.notes or ""
+            default_strategy = edit_person_obj.strategy or ""
+            if edit_person_obj.tags:
+                default_tags = [t.strip() for t in edit_person_obj.tags.split(',')]
+
+            # Avatar?
+            # Handling existing avatar selection in session state is complex.
+            # We will show current avatar.
+
+    # Initialize session state for temporary tags
+    if "reg_temp_tags" not in st.session_state:
+        st.session_state["reg_temp_tags"] = []
+
+    # Initialize session state for uploaded avatars (handles into the upload
+    # spool; the image bytes stay on disk)
+    if "reg_uploaded_avatars" not in st.session_state:
+        st.session_state["reg_uploaded_avatars"] = []
+    if "reg_spool_id" not in st.session_state:
+        st.session_state["reg_spool_id"] = uuid.uuid4().hex
+    spool = get_spool()
+    spool_id = st.session_state["reg_spool_id"]
+
+    # Initialize session state for selected avatar
+    if "reg_selected_avatar_index" not in st.session_state:
+        st.session_state["reg_selected_avatar_index"] = None
+
+
+    # Header with Is Self Checkbox
+    c_head_1, c_head_2 = st.columns([3, 1])
+    with c_head_1:
+        st.subheader("基本情報")
+    with c_head_2:
+        # Is Self Check logic
+        if existing_self and not (edit_person_obj and edit_person_obj.is_self):
+            is_self = st.checkbox("自分の情報を登録する", value=False, disabled=True, help="既に自分が登録されています")
+        else:
+            is_self = st.checkbox("自分の情報を登録する", value=default_is_self)
+
+
+    col_main_l, col_main_r = st.columns(2)
+
+    # -- LEFT COLUMN (Basic Info) --
+    with col_main_l:
+        # Grouped Name Inputs: [Last Name Col] [First Name Col]
+        c_n_last, c_n_first = st.columns(2)
+
+        with c_n_last:
+            last_name = st.text_input("姓", value=default_last, label_visibility="collapsed", placeholder="姓")
+            yomigana_last = st.text_input("せい", value=default_y_last, label_visibility="collapsed", placeholder="せい")
+
+        with c_n_first:
+            first_name = st.text_input("名", value=default_first, label_visibility="collapsed", placeholder="名")
+            yomigana_first = st.text_input("めい", value=default_y_first, label_visibility="collapsed", placeholder="めい")
+
+        st.write("") # Spacer
+
+        # Nick, Gender, Blood
+        nickname = st.text_input("ニックネーム", value=default_nick, label_visibility="collapsed", placeholder="ニックネーム")
+
+        c_l5, c_l6 = st.columns(2)
+        with c_l5:
+            g_opts = ["男性", "女性", "ノンバイナリー", "その他", "性別不明"]
+            g_default_val = default_gender
+            if g_default_val == "不明": g_default_val = "性別不明"
+
+            g_idx = g_opts.index(g_default_val) if g_default_val in g_opts else 4
+            # For selectbox, label_visibility="collapsed" is risky if not clear.
+            # But requested.
+            gender = st.selectbox("性別", g_opts, index=g_idx, label_visibility="collapsed")
+
+        with c_l6:
+            b_opts = ["A", "B", "O", "AB", "血液型不明"]
+            b_default_val = default_blood
+            if b_default_val == "不明": b_default_val = "血液型不明"
+
+            b_idx = b_opts.index(b_default_val) if b_default_val in b_opts else 4
+            blood_type = st.selectbox("血液型", b_opts, index=b_idx, label_visibility="collapsed")
+
+
+    # -- RIGHT COLUMN (Group & Dates) --
+    with col_main_r:
+        # Group Logic
+        all_tags = set()
+        for p in existing_people:
+            if p.tags:
+                for t in p.tags.split(','):
+                    all_tags.add(t.strip())
+        for t in st.session_state["reg_temp_tags"]:
+            all_tags.add(t)
+        for t in default_tags:
+            all_tags.add(t)
+        tag_options = sorted(list(all_tags))
+
+        selected_tags = st.multiselect("グループ", tag_options, default=default_tags, label_visibility="collapsed")
+
+        # New Group Input & Button (Below)
+        c_g_in, c_g_btn = st.columns([3, 1])
+        with c_g_in:
+            new_tag_input = st.text_input("グループ追加", label_visibility="collapsed", placeholder="新規グループ")
+        with c_g_btn:
+             if st.button("追加"):
+                if new_tag_input and new_tag_input not in tag_options:
+                    st.session_state["reg_temp_tags"].append(new_tag_input)
+                    st.rerun()
+
+        st.write("") # Spacer
+
+        # Dates (Rows)
+        # Row 1: Birth Date
+        d_row1_1, d_row1_2 = st.columns([1, 4])
+        with d_row1_1:
+             st.write("生年月日")
+
+        with d_row1_2:
+             by_col, bm_col, bd_col = st.columns(3)
+             with by_col:
+                birth_year = st.number_input("年", min_value=1900, max_value=date.today().year, value=default_by, placeholder="不明", key="reg_by", label_visibility="collapsed")
+             with bm_col:
+                bm_idx = default_bm if default_bm else 0
+                birth_month = st.selectbox("月", [None] + list(range(1, 13)), index=bm_idx, format_func=lambda x: f"{x}月" if x else "月", key="reg_bm", label_visibility="collapsed")
+             with bd_col:
+                bd_idx = default_bd if default_bd else 0
+                birth_day = st.selectbox("日", [None] + list(range(1, 32)), index=bd_idx, format_func=lambda x: f"{x}日" if x else "日", key="reg_bd", label_visibility="collapsed")
+
+        # Row 2: First Met
+        d_row2_1, d_row2_2 = st.columns([1, 4])
+        with d_row2_1:
+             st.write("初対面日")
+
+        with d_row2_2:
+            if is_self:
+                st.info("設定不要")
+                first_met_year = None
+                first_met_month = None
+                first_met_day = None
+            else:
+                fy_col, fm_col, fd_col = st.columns(3)
+                with fy_col:
+                    first_met_year = st.number_input("年", min_value=1900, max_value=date.today().year, value=default_fy, placeholder="不明", key="reg_fy", label_visibility="collapsed")
+                with fm_col:
+                    fm_idx = default_fm if default_fm else 0
+                    first_met_month = st.selectbox("月", [None] + list(range(1, 13)), index=fm_idx, format_func=lambda x: f"{x}月" if x else "月", key="reg_fm", label_visibility="collapsed")
+                with fd_col:
+                    fd_idx = default_fd if default_fd else 0
+                    first_met_day = st.selectbox("日", [None] + list(range(1, 32)), index=fd_idx, format_func=lambda x: f"{x}日" if x else "日", key="reg_fd", label_visibility="collapsed")
+
+    st.markdown("---")
+
+    # -- ICON SECTION --
+    st.subheader("アイコン設定")
+
+    # Uploader with dynamic key to clear
+    uploaded_avatar_file = st.file_uploader("画像をアップロード", type=["jpg", "png", "jpeg"], key=f"avatar_uploader_{st.session_state['uploader_key']}")
+
+    image_timer = start_section("画像処理")
+    if uploaded_avatar_file:
+        # Decoded, EXIF-rotated and downscaled once in a worker process;
+        # reruns reuse the cached working image for this upload
+        _, img = get_working_image(uploaded_avatar_file.getvalue())
+        w, h = img.size
+
+        # Check Aspect Ratio (Allow small tolerance)
+        # If not square, show cropper
+        if abs(w - h) > 2:
+            st.info("アスペクト比が1:1ではありません。切り抜き範囲を指定してください。")
+            from streamlit_cropper import st_cropper
+            crop_box = st_cropper(img, aspect_ratio=(1, 1), box_color='#FF0000', return_type="box")
+            if st.button("切り抜きを確定して追加"):
+                try:
+                    handle = spool.put(spool_id, f"crop_{uploaded_avatar_file.name}", make_avatar(img, crop_box))
+                except SpoolFullError as e:
+                    st.error(str(e))
+                else:
+                    st.session_state["reg_uploaded_avatars"].append(handle)
+                    # Clear uploader
+                    st.session_state["uploader_key"] += 1
+                    st.rerun()
+        else:
+            # Already square. Resize and confirm?
+            # User said "Image name should be hidden after upload".
+            # So we should process it.
+            # But to hide it, we must clear uploader, which requires rerun.
+            # So we can auto-add it.
+            try:
+                handle = spool.put(spool_id, uploaded_avatar_file.name, make_avatar(img))
+            except SpoolFullError as e:
+                st.error(str(e))
+            else:
+                st.session_state["reg_uploaded_avatars"].append(handle)
+                st.session_state["uploader_key"] += 1
+                st.rerun()
+
+
+    end_section(image_timer)
+
+    # Drop handles whose files the spool expired (idle session)
+    avatars = st.session_state["reg_uploaded_avatars"]
+    if avatars and not all(spool.exists(spool_id, h) for h in avatars):
+        avatars[:] = [h for h in avatars if spool.exists(spool_id, h)]
+        st.session_state["reg_selected_avatar_index"] = None
+
+    # Display Images in Grid (8 per row)
+    if avatars:
+        spool.touch(spool_id)
+        st.write("画像を選択してください:")
+        # Use simple iteration for grid
+        cols = st.columns(8)
+        for i, handle in enumerate(avatars):
+            with cols[i % 8]:
+                st.image(spool.thumbnail_path(spool_id, handle), width=80) # Slightly smaller for 8 cols
+                # Selection button
+                label = "✔" if st.session_state["reg_selected_avatar_index"] == i else "〇"
+                if st.button(label, key=f"sel_img_{handle['id']}", type="primary" if st.session_state["reg_selected_avatar_index"] == i else "secondary"):
+                    st.session_state["reg_selected_avatar_index"] = i
+                    st.rerun()
+                if st.button("🗑️", key=f"del_img_{handle['id']}"):
+                    spool.remove(spool_id, handle)
+                    avatars.pop(i)
+                    st.session_state["reg_selected_avatar_index"] = None
+                    st.rerun()
+
+    st.markdown("---")
+
+    # -- BOTTOM SECTION --
+    notes = st.text_area("人物詳細 (旧: メモ)", value=default_notes)
+    strategy = st.text_area("攻略方法", value=default_strategy)
+
+    btn_label = "更新" if edit_mode_id else "登録"
+    submitted = st.button(btn_label, type="primary")
+
+    cancel_edit = False
+    if edit_mode_id:
+        if st.button("編集をキャンセル"):
+            cancel_edit = True
+
+    if cancel_edit:
+        st.session_state["edit_person_id"] = None
+        st.rerun()
+
+    if submitted:
+        if not last_name and not first_name:
+            st.error("姓または名のどちらかは必須です。")
+        else:
+            # Handle tags
+            final_tags = ", ".join(selected_tags)
+
+            # Handle status
+            status = "自分" if is_self else (edit_person_obj.status if edit_person_obj else "未設定")
+
+            # Prepare Dates
+            b_y = int(birth_year) if birth_year else None
+            b_m = birth_month
+            b_d = birth_day
+
+            f_y = int(first_met_year) if first_met_year else None
+            f_m = first_met_month
+            f_d = first_met_day
+
+            # Legacy Date Calc
+            legacy_b_date = None
+            if b_y and b_m and b_d:
+                try: legacy_b_date = date(b_y, b_m, b_d)
+                except: pass
+
+            legacy_f_date = None
+            if f_y and f_m and f_d:
+                try: legacy_f_date = date(f_y, f_m, f_d)
+                except: pass
+
+            fields = dict(last_name=last_name, first_name=first_name,
+                          yomigana_last=yomigana_last, yomigana_first=yomigana_first,
+                          nickname=nickname, gender=gender, blood_type=blood_type,
+                          status=status, notes=notes, tags=final_tags, is_self=is_self, strategy=strategy,
+                          birth_year=b_y, birth_month=b_m, birth_day=b_d,
+                          first_met_year=f_y, first_met_month=f_m, first_met_day=f_d,
+                          birth_date=legacy_b_date, first_met_date=legacy_f_date) # Update legacy too
+
+            # Avatar: written to account/{id}/icon_imag/ (per-account shards:
+            # account/{account}/people/{id}/icon_imag/) when the save commits
+            avatar, avatar_name = None, "icon.png"
+            if st.session_state["reg_selected_avatar_index"] is not None:
+                selected_handle = avatars[st.session_state["reg_selected_avatar_index"]]
+                avatar = spool.read(spool_id, selected_handle)
+                avatar_name = f"icon{os.path.splitext(selected_handle['name'])[1]}"
+            account_id = st.session_state.get("account_id")
+
+            # Person, avatar and legacy dates in one transaction
+            try:
+                save_person(db, fields, person_id=edit_mode_id, avatar=avatar, avatar_name=avatar_name,
+                            avatar_dir=lambda pid: person_media_dir(account_id, pid))
+            except Exception as e:
+                st.error(f"保存に失敗しました: {e}")
+                return
+
+            if edit_mode_id:
+                st.success(f"{last_name} {first_name} さんの情報を更新しました！")
+                st.session_state["edit_person_id"] = None # Exit edit mode
+            else:
+                st.success(f"{last_name} {first_name} さんを登録しました！")
+
+            # Reset temporary states
+            st.session_state["reg_temp_tags"] = []
+            spool.clear_session(spool_id)
+            st.session_state["reg_uploaded_avatars"] = []
+            st.session_state["reg_selected_avatar_index"] = None
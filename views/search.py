@@ -0,0 +1,53 @@
+import streamlit as st
+
+from crud import get_people_summary, search_interactions, search_people, SEARCH_LIMIT
+from name_index import get_name_index
+from views.common import navigate_to
+
+def find_people(db, keyword, limit=SEARCH_LIMIT):
+    # Name / reading hits from the name index first (kana and romaji
+    # normalised), then tag, status and notes matches in SQL
+    ids = get_name_index(db).search(keyword, limit)
+    if len(ids) < limit:
+        seen = set(ids)
+        ids += [p.id for p in search_people(db, keyword, limit) if p.id not in seen][:limit - len(ids)]
+    if not ids:
+        return []
+    by_id = {p.id: p for p in get_people_summary(db, person_ids=ids)}
+    return [by_id[pid] for pid in ids if pid in by_id]
+
+# --- 全文検索 ---
+def render(db, search_keyword):
+    st.title("🔍 検索結果")
+    st.write(f"検索キーワード: **{search_keyword}**")
+
+    matched_people = find_people(db, search_keyword)
+    if matched_people:
+        st.subheader("👤 人物")
+        for p in matched_people:
+            with st.expander(f"{p.last_name} {p.first_name}"):
+                st.write(f"ステータス: {p.status} | タグ: {p.tags}")
+                if st.button("詳細へ", key=f"search_p_{p.id}"):
+                    st.session_state["selected_person_id"] = p.id
+                    navigate_to("ダッシュボード")
+                    st.rerun()
+
+    # Newest matches first, through the FTS index (LIKE for short keywords)
+    matched_interactions = search_interactions(db, search_keyword, limit=SEARCH_LIMIT)
+    if matched_interactions:
+        st.subheader("📝 交流ログ")
+        name_index = get_name_index(db)
+        for i in matched_interactions:
+            with st.expander(f"{i.entry_date} - {name_index.label(i.person_id)} ({i.category})"):
+                st.write(i.content)
+                if st.button("人物ダッシュボードへ", key=f"search_i_{i.id}"):
+                    st.session_state["selected_person_id"] = i.person_id
+                    navigate_to("ダッシュボード")
+                    st.rerun()
+
+    if len(matched_people) == SEARCH_LIMIT or len(matched_interactions) == SEARCH_LIMIT:
+        st.caption(f"上位{SEARCH_LIMIT}件まで表示しています。キーワードを絞り込んでください。")
+    if not matched_people and not matched_interactions:
+        st.warning("見つかりませんでした。")
+
+    st.divider()